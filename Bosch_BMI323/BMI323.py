@@ -1,13 +1,35 @@
-import sys
-import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".")))
-from BMI323_definitions import *
-from ctypes import *
+import struct
+from supernova_tools.conversion import ACCEL_FIRST_LAYOUT, as_matrix, compile_plan
+from .BMI323_definitions import (
+    CALIBRATION_SAMPLES, MAX_ACCEL_BIAS, MIN_ACCEL_BIAS,
+    BMI323_ACCEL_CONFIG_REG, BMI323_ACCEL_DATA_X, BMI323_ACCEL_RES_VALUES,
+    BMI323_ACCEL_OP_MODES, BMI323_ACCEL_AVG_NUM, BMI323_ACCEL_FILTER_BW, BMI323_ACCEL_FS, BMI323_ACCEL_ODR,
+    BMI323_TEMP_DATA, BMI323_TEMP_SENSITIVITY, BMI323_TEMP_OFFSET,
+    BMI323_SENSOR_TIME, BMI323_SENSOR_TIME_RESOLUTION,
+    BMI323_STATUS, BMI323_STATUS_DRDY_ACC, BMI323_STATUS_DRDY_GYR,
+    BMI323_GYRO_CONFIG_REG, BMI323_GYRO_RES_VALUES,
+    BMI323_GYRO_OP_MODES, BMI323_GYRO_AVG_NUM, BMI323_GYRO_FILTER_BW, BMI323_GYRO_FS, BMI323_GYRO_ODR,
+)
 
 # The read method needs to read two dummy bytes before the actual data
 # as specified in the BMI323 datasheet
 OFFSET_FOR_DUMMY_BYTES = 2
 
+# Accelerometer and gyroscope X, Y and Z as little-endian signed 16-bit integers
+IMU_DATA_FORMAT = struct.Struct("<6h")
+
+# Temperature as a little-endian signed 16-bit integer
+TEMP_DATA_FORMAT = struct.Struct("<h")
+
+# Sensor time as a little-endian unsigned 32-bit integer
+SENSOR_TIME_FORMAT = struct.Struct("<I")
+
+# Status register, accelerometer, gyroscope, temperature and sensor time, contiguous from the status register
+STATUS_TIMED_DATA_FORMAT = struct.Struct("<H6hhI")
+
+# Status register followed by the accelerometer and gyroscope data
+STATUS_DATA_FORMAT = struct.Struct("<H6h")
+
 def find_matching_item(data, target_pid):
     for item in data:
         if item.get('pid') == target_pid:
@@ -35,6 +57,17 @@ class BMI323:
     # Calibration
     accel_bias = None
     gyro_bias = None
+    accel_matrix = None
+    gyro_matrix = None
+
+    # Position of accel X, Y, Z and gyro X, Y, Z in the raw samples
+    raw_layout = ACCEL_FIRST_LAYOUT
+
+    # Duration of a sensor time tick in seconds
+    sensor_time_resolution = BMI323_SENSOR_TIME_RESOLUTION
+
+    # Conversion plan of the current configuration, compiled on the first read
+    plan = None
 
     def __init__(self, i3c):
         self.i3c = i3c
@@ -52,10 +85,11 @@ class BMI323:
     def __calculate_resolutions(self):
         '''
         Calculate the resolutions of the sensor based on the current configuration.
-        Use the respective full scale values and the number of bits (16) to calculate the resolutions.
+        The resolutions of every full scale are precomputed in the definitions from the full scale
+        values and the number of bits (16).
         '''
-        a_res = BMI323_ACCEL_FS_VALUES[self.accel_fs] / BMI323_ACCEL_RESOLUTION
-        g_res = BMI323_GYRO_FS_VALUES[self.gyro_fs] / BMI323_GYRO_RESOLUTION
+        a_res = BMI323_ACCEL_RES_VALUES[self.accel_fs]
+        g_res = BMI323_GYRO_RES_VALUES[self.gyro_fs]
         return (a_res, g_res)
 
     def __read_data(self):
@@ -67,15 +101,21 @@ class BMI323:
         READ_LEN = 12
 
         # Read data
-        (_, raw_data) = self.i3c.read(self.address, self.i3c.TransferMode.I3C_SDR, [BMI323_ACCEL_DATA_X], OFFSET_FOR_DUMMY_BYTES + READ_LEN)
+        (success, raw_data) = self.i3c.read(self.address, self.i3c.TransferMode.I3C_SDR, [BMI323_ACCEL_DATA_X], OFFSET_FOR_DUMMY_BYTES + READ_LEN)
+        if not success:
+            raise IOError(f"BMI323 read failed: {raw_data}")
         
         # Convert data to signed 16-bit integers
-        imu_data = [0, 0, 0, 0, 0, 0]
-        for i in range(len(imu_data)):
-            imu_data[i] = c_int16((raw_data[OFFSET_FOR_DUMMY_BYTES + 2*i + 1] << 8) | raw_data[OFFSET_FOR_DUMMY_BYTES + 2*i]).value
-        
-        return imu_data
+        return list(IMU_DATA_FORMAT.unpack_from(bytes(raw_data), OFFSET_FOR_DUMMY_BYTES))
     
+    def __write_register(self, register, data):
+        '''
+        Write a configuration register and make sure the sensor acknowledged it.
+        '''
+        (success, result) = self.i3c.write(self.address, self.i3c.TransferMode.I3C_SDR, [register], data)
+        if not success:
+            raise IOError(f"BMI323 write to register 0x{register:02x} failed: {result}")
+
     def init_device(self):
         '''
         Initialize the sensor with the current configuration. Uses two words of 16 bits to write the
@@ -85,16 +125,17 @@ class BMI323:
         BMI323_ACCEL_CONFIG_LB = self.accel_filter_bw | self.accel_fs | self.accel_odr
         BMI323_ACCEL_CONFIG_HB = self.accel_mode | self.accel_avg_num
         BMI323_ACCEL_CONFIG = [BMI323_ACCEL_CONFIG_LB, BMI323_ACCEL_CONFIG_HB]
-        self.i3c.write(self.address, self.i3c.TransferMode.I3C_SDR, [BMI323_ACCEL_CONFIG_REG], BMI323_ACCEL_CONFIG)
+        self.__write_register(BMI323_ACCEL_CONFIG_REG, BMI323_ACCEL_CONFIG)
         
         # Set gyroscope configuration
         BMI323_GYRO_CONFIG_LB = self.gyro_filter_bw | self.gyro_fs | self.gyro_odr
         BMI323_GYRO_CONFIG_HB = self.gyro_mode | self.gyro_avg_num
         BMI323_GYRO_CONFIG = [BMI323_GYRO_CONFIG_LB, BMI323_GYRO_CONFIG_HB]
-        self.i3c.write(self.address, self.i3c.TransferMode.I3C_SDR, [BMI323_GYRO_CONFIG_REG], BMI323_GYRO_CONFIG)
+        self.__write_register(BMI323_GYRO_CONFIG_REG, BMI323_GYRO_CONFIG)
         
         # Calculate resolutions
         self.accel_res, self.gyro_res = self.__calculate_resolutions()
+        self.plan = None
 
     def calibrate(self):
         '''
@@ -132,23 +173,86 @@ class BMI323:
         if accel_bias[2] < MIN_ACCEL_BIAS:
             accel_bias[2] += 1.0  # Remove gravity from the z-axis accelerometer bias calculation 
 
-        self.accel_bias = accel_bias
-        self.gyro_bias = gyro_bias
+        self.set_calibration(accel_bias, gyro_bias)
 
-    def read(self):
+    def set_calibration(self, accel_bias, gyro_bias, accel_matrix=None, gyro_matrix=None):
         '''
-        Read the data from the sensor and convert it to the correct units.
+        Set the biases and the optional 3x3 accelerometer and gyroscope correction matrices
+        applied by read(). The conversion plan is recompiled on the next read.
         '''
-        # Read imu data
-        imu_data = self.__read_data()
-        
-        # Convert data to correct units
-        ax = imu_data[0]*self.accel_res - self.accel_bias[0]
-        ay = imu_data[1]*self.accel_res - self.accel_bias[1]
-        az = imu_data[2]*self.accel_res - self.accel_bias[2]
+        self.accel_bias = list(accel_bias)
+        self.gyro_bias = list(gyro_bias)
+        self.accel_matrix = as_matrix(accel_matrix)
+        self.gyro_matrix = as_matrix(gyro_matrix)
+        self.plan = None
+
+    def conversion_plan(self):
+        '''
+        Return the conversion plan of the current resolutions and calibration. Plans are cached
+        per configuration, so switching back to a previous configuration does not recompile it.
+        '''
+        if self.plan is None:
+            self.plan = compile_plan(self.raw_layout, self.accel_res, self.gyro_res, tuple(self.accel_bias),
+                                     tuple(self.gyro_bias), self.accel_matrix, self.gyro_matrix)
+        return self.plan
+
+    def read_raw(self):
+        '''
+        Read one sample as signed 16-bit integers in the register order of the sensor, without
+        any conversion. Batches of raw samples are converted with conversion_plan().convert_batch().
+        '''
+        return self.__read_data()
+
+    def read_temperature(self):
+        '''
+        Read the internal temperature of the sensor in degrees Celsius.
+        '''
+        (success, raw_data) = self.i3c.read(self.address, self.i3c.TransferMode.I3C_SDR, [BMI323_TEMP_DATA], OFFSET_FOR_DUMMY_BYTES + 2)
+        if not success:
+            raise IOError(f"BMI323 temperature read failed: {raw_data}")
+
+        (raw_temperature,) = TEMP_DATA_FORMAT.unpack_from(bytes(raw_data), OFFSET_FOR_DUMMY_BYTES)
+        return raw_temperature / BMI323_TEMP_SENSITIVITY + BMI323_TEMP_OFFSET
+
+    def read_sensor_time(self):
+        '''
+        Read the sensor time counter, in ticks of sensor_time_resolution seconds.
+        '''
+        (success, raw_data) = self.i3c.read(self.address, self.i3c.TransferMode.I3C_SDR, [BMI323_SENSOR_TIME], OFFSET_FOR_DUMMY_BYTES + 4)
+        if not success:
+            raise IOError(f"BMI323 sensor time read failed: {raw_data}")
+
+        return SENSOR_TIME_FORMAT.unpack_from(bytes(raw_data), OFFSET_FOR_DUMMY_BYTES)[0]
+
+    def read_raw_ready_timed(self):
+        '''
+        Like read_raw_ready, plus the sensor time in ticks. The status, data, temperature and
+        sensor time registers are contiguous, so all come in a single transaction. Returns
+        (ready, raw, ticks). The sensor time counter is free-running: it tells when the read
+        happened on the sensor clock, not when the sample was produced.
+        '''
+        (success, raw_data) = self.i3c.read(self.address, self.i3c.TransferMode.I3C_SDR, [BMI323_STATUS], OFFSET_FOR_DUMMY_BYTES + STATUS_TIMED_DATA_FORMAT.size)
+        if not success:
+            raise IOError(f"BMI323 read failed: {raw_data}")
+
+        values = STATUS_TIMED_DATA_FORMAT.unpack_from(bytes(raw_data), OFFSET_FOR_DUMMY_BYTES)
+        return (bool(values[0] & (BMI323_STATUS_DRDY_ACC | BMI323_STATUS_DRDY_GYR)), list(values[1:7]), values[8])
+
+    def read_raw_ready(self):
+        '''
+        Read the status register and one raw sample in a single transaction. Returns (ready, raw),
+        `ready` being True when the accelerometer or gyroscope produced new data since the last
+        read; otherwise `raw` repeats the previous sample.
+        '''
+        (success, raw_data) = self.i3c.read(self.address, self.i3c.TransferMode.I3C_SDR, [BMI323_STATUS], OFFSET_FOR_DUMMY_BYTES + STATUS_DATA_FORMAT.size)
+        if not success:
+            raise IOError(f"BMI323 read failed: {raw_data}")
 
-        gx = imu_data[3]*self.gyro_res - self.gyro_bias[0]
-        gy = imu_data[4]*self.gyro_res - self.gyro_bias[1]
-        gz = imu_data[5]*self.gyro_res - self.gyro_bias[2]
+        values = STATUS_DATA_FORMAT.unpack_from(bytes(raw_data), OFFSET_FOR_DUMMY_BYTES)
+        return (bool(values[0] & (BMI323_STATUS_DRDY_ACC | BMI323_STATUS_DRDY_GYR)), list(values[1:]))
 
-        return ((ax, ay, az), (gx, gy, gz))
\ No newline at end of file
+    def read(self):
+        '''
+        Read the data from the sensor and convert it to the correct units.
+        '''
+        return self.conversion_plan().convert(self.__read_data())
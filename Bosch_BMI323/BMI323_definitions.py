@@ -60,16 +60,57 @@ class BMI323_ACCEL_ODR(Enum):
     AODR_3_2kHz     = 0x0D
     AODR_6_4kHz     = 0x0E
 
+# Accelerometer output data rates in Hz
+BMI323_ACCEL_ODR_VALUES = {
+    BMI323_ACCEL_ODR.AODR_0_78125Hz.value: 0.78125,
+    BMI323_ACCEL_ODR.AODR_1_5625Hz.value:  1.5625,
+    BMI323_ACCEL_ODR.AODR_3_125Hz.value:   3.125,
+    BMI323_ACCEL_ODR.AODR_6_25Hz.value:    6.25,
+    BMI323_ACCEL_ODR.AODR_12_5Hz.value:    12.5,
+    BMI323_ACCEL_ODR.AODR_25Hz.value:      25.0,
+    BMI323_ACCEL_ODR.AODR_50Hz.value:      50.0,
+    BMI323_ACCEL_ODR.AODR_100Hz.value:     100.0,
+    BMI323_ACCEL_ODR.AODR_200Hz.value:     200.0,
+    BMI323_ACCEL_ODR.AODR_400Hz.value:     400.0,
+    BMI323_ACCEL_ODR.AODR_800Hz.value:     800.0,
+    BMI323_ACCEL_ODR.AODR_1_6kHz.value:    1600.0,
+    BMI323_ACCEL_ODR.AODR_3_2kHz.value:    3200.0,
+    BMI323_ACCEL_ODR.AODR_6_4kHz.value:    6400.0
+}
+
 # Accelerometer 16 bits symmetric resolution
 BMI323_ACCEL_RESOLUTION = 32768.0
 
+# Accelerometer resolutions in g/LSB, precomputed for every full scale
+BMI323_ACCEL_RES_VALUES = {fs: value / BMI323_ACCEL_RESOLUTION for (fs, value) in BMI323_ACCEL_FS_VALUES.items()}
+
 # Accelerometer bias limits in g
 MAX_ACCEL_BIAS = 0.8
 MIN_ACCEL_BIAS = -0.8
 
+# Status register address, right before the accelerometer data X register
+BMI323_STATUS = 0x02
+
+# Data ready flags of the status register, cleared when the data is read
+BMI323_STATUS_DRDY_ACC = 0x80
+BMI323_STATUS_DRDY_GYR = 0x40
+
 # Accelerometer data X register address
 BMI323_ACCEL_DATA_X = 0x03
 
+# Temperature data register address
+BMI323_TEMP_DATA = 0x09
+
+# Temperature conversion: T = raw / BMI323_TEMP_SENSITIVITY + BMI323_TEMP_OFFSET in degrees Celsius
+BMI323_TEMP_SENSITIVITY = 512.0
+BMI323_TEMP_OFFSET = 23.0
+
+# Sensor time registers address (32-bit counter in two 16-bit registers, right after the temperature)
+BMI323_SENSOR_TIME = 0x0A
+
+# Sensor time resolution in seconds, nominal value of the internal oscillator
+BMI323_SENSOR_TIME_RESOLUTION = 39.0625e-6
+
 # Address of the BMI323 Gyroscope Configuration Register
 BMI323_GYRO_CONFIG_REG = 0x21
 
@@ -130,5 +171,26 @@ class BMI323_GYRO_ODR(Enum):
     GODR_3_2kHz     = 0x0D
     GODR_6_4kHz     = 0x0E
 
+# Gyroscope output data rates in Hz
+BMI323_GYRO_ODR_VALUES = {
+    BMI323_GYRO_ODR.GODR_0_78125Hz.value: 0.78125,
+    BMI323_GYRO_ODR.GODR_1_5625Hz.value:  1.5625,
+    BMI323_GYRO_ODR.GODR_3_125Hz.value:   3.125,
+    BMI323_GYRO_ODR.GODR_6_25Hz.value:    6.25,
+    BMI323_GYRO_ODR.GODR_12_5Hz.value:    12.5,
+    BMI323_GYRO_ODR.GODR_25Hz.value:      25.0,
+    BMI323_GYRO_ODR.GODR_50Hz.value:      50.0,
+    BMI323_GYRO_ODR.GODR_100Hz.value:     100.0,
+    BMI323_GYRO_ODR.GODR_200Hz.value:     200.0,
+    BMI323_GYRO_ODR.GODR_400Hz.value:     400.0,
+    BMI323_GYRO_ODR.GODR_800Hz.value:     800.0,
+    BMI323_GYRO_ODR.GODR_1_6kHz.value:    1600.0,
+    BMI323_GYRO_ODR.GODR_3_2kHz.value:    3200.0,
+    BMI323_GYRO_ODR.GODR_6_4kHz.value:    6400.0
+}
+
 # Gyroscope 16 bits symmetric resolution
-BMI323_GYRO_RESOLUTION = 32768.0
\ No newline at end of file
+BMI323_GYRO_RESOLUTION = 32768.0
+
+# Gyroscope resolutions in dps/LSB, precomputed for every full scale
+BMI323_GYRO_RES_VALUES = {fs: value / BMI323_GYRO_RESOLUTION for (fs, value) in BMI323_GYRO_FS_VALUES.items()}
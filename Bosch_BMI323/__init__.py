@@ -0,0 +1,6 @@
+'''
+Bosch BMI323 driver for the Supernova I3C controller.
+
+Nothing is imported here, so `import Bosch_BMI323.BMI323_definitions` only loads the register
+definitions. The driver is imported with `from Bosch_BMI323.BMI323 import BMI323`.
+'''
@@ -0,0 +1,122 @@
+'''
+Full calibration of a BMI323 or LSM6DSV sensor.
+
+Example:
+    python imu_calibration.py --sensor bmi323 --out bmi323_calibration.json
+    python imu_calibration.py --sensor bmi323 --out bmi323_calibration.json --method ellipsoid --sweep 1800
+    python imu_calibration.py --sensor bmi323 --out bmi323_chamber.json --accel-from bmi323_calibration.json --sweep 3600
+
+The script asks to rest the sensor in six orientations (or in any number of arbitrary
+orientations with `--method ellipsoid`), fits the accelerometer offset, scale and
+misalignment and the gyroscope bias against temperature, and saves the result as JSON.
+With `--sweep`, stationary windows are first collected at regular intervals while the
+sensor warms up, so the gyroscope bias can follow the temperature. With `--accel-from`,
+the accelerometer of an existing calibration is kept and only the sweep is run.
+
+The calibration can be loaded with `ImuCalibration.load()` and applied to the driver, e.g. by
+`imu_capture.py --calibration bmi323_calibration.json`.
+'''
+import argparse
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Bosch_BMI323.BMI323 import BMI323
+from STMicroelectronics_LSM6DSV.LSM6DSV import LSM6DSV
+from supernova_tools.calibration import (DEFAULT_ELLIPSOID_ORIENTATIONS, DEFAULT_SWEEP_INTERVAL, DEFAULT_WINDOW_SAMPLES,
+                                         MIN_ELLIPSOID_ORIENTATIONS, MIN_TEMPERATURE_SPAN, ImuCalibration,
+                                         ellipsoid_calibration, fit_gyro_temperature, six_position_calibration,
+                                         temperature_span, temperature_sweep)
+from supernova_tools.transport import RetryingI3C
+from supernovacontroller.sequential import SupernovaDevice
+
+SENSORS = {
+    "bmi323": BMI323,
+    "lsm6dsv": LSM6DSV,
+}
+
+def wait_for_position(name):
+    input(f"Rest the sensor with the {name} and press Enter...")
+
+def wait_for_orientation(name):
+    input(f"Rest the sensor in {name}, different from the previous ones, and press Enter...")
+
+def print_window(window):
+    print(f"{window.temperature:.2f} degC, gyroscope {window.gyro.mean(axis=0)} dps")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="IMU calibration through a Supernova host adapter")
+    parser.add_argument("--sensor", choices=sorted(SENSORS), required=True, help="sensor to calibrate")
+    parser.add_argument("--out", required=True, help="JSON file where the calibration is saved")
+    parser.add_argument("--samples", type=int, default=DEFAULT_WINDOW_SAMPLES, help="samples averaged in each orientation")
+    parser.add_argument("--method", choices=("six-position", "ellipsoid"), default="six-position",
+                        help="six known orientations, or arbitrary orientations fitted with an ellipsoid")
+    parser.add_argument("--orientations", type=int, default=DEFAULT_ELLIPSOID_ORIENTATIONS,
+                        help=f"orientations of the ellipsoid method, at least {MIN_ELLIPSOID_ORIENTATIONS}")
+    parser.add_argument("--sweep", type=float, default=0.0, help="seconds of temperature sweep before the orientations")
+    parser.add_argument("--sweep-interval", type=float, default=DEFAULT_SWEEP_INTERVAL, help="seconds between the windows of the sweep")
+    parser.add_argument("--gyro-degree", type=int, default=1, help="degree of the gyroscope bias polynomial of the temperature")
+    parser.add_argument("--accel-from", help="keep the accelerometer of this calibration and only run the sweep")
+    args = parser.parse_args(argv)
+
+    if args.method == "ellipsoid" and args.orientations < MIN_ELLIPSOID_ORIENTATIONS:
+        parser.error(f"--orientations must be at least {MIN_ELLIPSOID_ORIENTATIONS}")
+    if args.accel_from and args.sweep <= 0:
+        parser.error("--accel-from needs a temperature sweep, use --sweep")
+    return args
+
+def main():
+    args = parse_args()
+
+    device = SupernovaDevice()
+
+    info = device.open()
+
+    print(info)
+
+    i3c = RetryingI3C(device.create_interface("i3c.controller"))
+
+    # Configure Supernova device as an I3C controller.
+    i3c.controller_init()
+
+    i3c.set_parameters(i3c.I3cPushPullTransferRate.PUSH_PULL_12_5_MHZ, i3c.I3cOpenDrainTransferRate.OPEN_DRAIN_4_17_MHZ)
+    (success, _) = i3c.init_bus(3300)
+
+    if not success:
+        print("I couldn't initialize the bus. Are you sure there's any target connected?")
+        exit(1)
+
+    sensor = SENSORS[args.sensor](i3c)
+
+    sensor.init_device()
+
+    sweep = []
+    if args.sweep > 0:
+        print(f"Temperature sweep: keep the sensor still for {args.sweep:g} s while its temperature changes")
+        sweep = temperature_sweep(sensor, args.sweep, args.sweep_interval, args.samples, print_window)
+
+    if args.accel_from:
+        previous = ImuCalibration.load(args.accel_from)
+        calibration = ImuCalibration(previous.accel_bias, previous.accel_matrix,
+                                     fit_gyro_temperature(sweep, args.gyro_degree), previous.accel_residual)
+    elif args.method == "ellipsoid":
+        calibration = ellipsoid_calibration(sensor, wait_for_orientation, args.orientations, args.samples,
+                                            args.gyro_degree, sweep)
+    else:
+        calibration = six_position_calibration(sensor, wait_for_position, args.samples, args.gyro_degree, sweep)
+
+    device.close()
+
+    calibration.save(args.out)
+
+    print(f"Accelerometer bias (g): {calibration.accel_bias}")
+    print(f"Accelerometer correction matrix:\n{calibration.accel_matrix}")
+    if calibration.accel_residual is not None:
+        print(f"Accelerometer fit residual: {calibration.accel_residual * 1000:.2f} mg RMS")
+    print(f"Gyroscope bias model coefficients (dps, highest power of the temperature first):\n{calibration.gyro_model.coefficients}")
+    if len(calibration.gyro_model.coefficients) <= args.gyro_degree:
+        span = f" ({temperature_span(sweep):.2f} degC during the sweep)" if sweep else ", use --sweep"
+        print(f"The temperature changed less than {MIN_TEMPERATURE_SPAN:g} degC{span}, the gyroscope bias is constant")
+    print(f"Calibration saved to {args.out}")
+
+if __name__ == "__main__":
+    main()
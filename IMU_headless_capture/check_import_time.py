@@ -0,0 +1,71 @@
+'''
+Check the import time of the sensor drivers and of the capture tool against a budget.
+
+Every module is imported in a fresh interpreter, several times, and the median import time
+is compared with its budget. The check also fails if importing a module loads one of the
+heavy dependencies that must only be imported when actually needed.
+
+Example:
+    python check_import_time.py
+'''
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Module to import and its budget in milliseconds
+IMPORT_BUDGETS_MS = {
+    "Bosch_BMI323.BMI323": 15.0,
+    "STMicroelectronics_LSM6DSV.LSM6DSV": 15.0,
+    "IMU_headless_capture.imu_capture": 15.0,
+    "IMU_headless_capture.imu_fused_capture": 15.0,
+    "IMU_headless_capture.imu_segments": 15.0,
+}
+
+# Dependencies that must not be loaded just by importing the modules above
+HEAVY_MODULES = ("matplotlib", "numpy", "supernovacontroller", "pyarrow")
+
+# Number of fresh interpreters used for each measurement
+RUNS = 5
+
+MEASURE_SCRIPT = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"elapsed_ms": elapsed * 1000.0, "heavy": heavy}}))
+'''
+
+def measure(module):
+    '''
+    Import `module` in a fresh interpreter. Returns the import time in milliseconds and the
+    heavy dependencies it loaded.
+    '''
+    script = MEASURE_SCRIPT.format(root=ROOT, module=module, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    result = json.loads(output)
+    return (result["elapsed_ms"], result["heavy"])
+
+def main():
+    failed = False
+    for (module, budget) in IMPORT_BUDGETS_MS.items():
+        results = [measure(module) for _ in range(RUNS)]
+        median = sorted(elapsed for (elapsed, _) in results)[RUNS // 2]
+        heavy = sorted(set(name for (_, names) in results for name in names))
+
+        status = "OK"
+        if median > budget or heavy:
+            status = "FAIL"
+            failed = True
+        print(f"{status:4} {module}: {median:.1f} ms (budget {budget:.0f} ms)")
+        if heavy:
+            print(f"     loads heavy dependencies: {', '.join(heavy)}")
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
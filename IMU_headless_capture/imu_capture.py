@@ -0,0 +1,402 @@
+'''
+Headless high-rate acquisition from a BMI323 or LSM6DSV sensor.
+
+Example:
+    python imu_capture.py --sensor bmi323 --odr 1600 --duration 60 --out run.parquet
+    python imu_capture.py --sensor bmi323 --odr 6400 --duration 600 --out shocks.bin --trigger accel:4
+
+Only the standard library is imported at startup. The sensor driver and the Supernova
+controller package are imported once the arguments are validated, NumPy by the writer
+thread when it converts the first batch (or with the triggers), and pyarrow only when Parquet output is
+requested. matplotlib is never imported.
+'''
+import argparse
+import importlib
+import math
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Driver module, class name, definitions module and constant prefix of each sensor
+SENSORS = {
+    "bmi323": ("Bosch_BMI323.BMI323", "BMI323", "Bosch_BMI323.BMI323_definitions", "BMI323"),
+    "lsm6dsv": ("STMicroelectronics_LSM6DSV.LSM6DSV", "LSM6DSV", "STMicroelectronics_LSM6DSV.LSM6DSV_definitions", "LSM6DSV"),
+}
+
+# Number of samples handed to the writer thread at once
+DEFAULT_BATCH_SIZE = 1024
+
+# Pre-trigger buffer size relative to the samples expected at the ODR, for drift and jitter
+PENDING_MARGIN = 2.0
+
+# Seconds between temperature checks when a full calibration is applied
+TEMPERATURE_CHECK_INTERVAL = 1.0
+
+def find_register_value(values, requested, description):
+    '''
+    Return the register value whose physical value (Hz, g or dps) matches the requested one.
+    Zero values (power-down) are not selectable.
+    '''
+    for (register_value, physical_value) in values.items():
+        if physical_value > 0 and physical_value == requested:
+            return register_value
+    supported = ", ".join(f"{value:g}" for value in sorted(values.values()) if value > 0)
+    raise ValueError(f"Unsupported {description} {requested:g}, supported values: {supported}")
+
+def sensor_configuration(args):
+    '''
+    Translate the command line options into register values using the definitions enums.
+    Raises ValueError for values the sensor does not support.
+    '''
+    (_, _, definitions_module, prefix) = SENSORS[args.sensor]
+    definitions = importlib.import_module(definitions_module)
+
+    def values(name):
+        return getattr(definitions, f"{prefix}_{name}_VALUES")
+
+    configuration = {
+        "accel_odr": find_register_value(values("ACCEL_ODR"), args.odr, "accelerometer ODR"),
+        "gyro_odr": find_register_value(values("GYRO_ODR"), args.odr, "gyroscope ODR"),
+    }
+    if args.accel_fs is not None:
+        configuration["accel_fs"] = find_register_value(values("ACCEL_FS"), args.accel_fs, "accelerometer full scale")
+    if args.gyro_fs is not None:
+        configuration["gyro_fs"] = find_register_value(values("GYRO_FS"), args.gyro_fs, "gyroscope full scale")
+    return configuration
+
+def open_sensor(args, configuration):
+    '''
+    Open the Supernova, initialize the I3C bus and configure the requested sensor.
+    Returns the device, the sensor and the loaded calibration, None without --calibration.
+    '''
+    from supernova_tools.transport import RetryingI3C
+
+    (driver_module, class_name, _, _) = SENSORS[args.sensor]
+    sensor_class = getattr(importlib.import_module(driver_module), class_name)
+
+    if args.simulate:
+        from supernova_tools.simulated import SimulatedSupernovaDevice
+        device = SimulatedSupernovaDevice()
+    else:
+        from supernovacontroller.sequential import SupernovaDevice
+        device = SupernovaDevice()
+    device.open()
+
+    i3c = RetryingI3C(device.create_interface("i3c.controller"))
+    i3c.controller_init()
+    i3c.set_parameters(i3c.I3cPushPullTransferRate.PUSH_PULL_12_5_MHZ, i3c.I3cOpenDrainTransferRate.OPEN_DRAIN_4_17_MHZ)
+    (success, _) = i3c.init_bus(3300)
+    if not success:
+        device.close()
+        raise IOError("I couldn't initialize the bus. Are you sure there's any target connected?")
+
+    sensor = sensor_class(i3c)
+    if sensor.address is None:
+        device.close()
+        raise IOError(f"{class_name} device not found in the I3C bus")
+
+    for (name, value) in configuration.items():
+        setattr(sensor, name, value)
+    sensor.init_device()
+
+    calibration = None
+    if args.calibration is not None:
+        from supernova_tools.calibration import ImuCalibration
+        calibration = ImuCalibration.load(args.calibration)
+        calibration.apply(sensor)
+    elif args.skip_calibration:
+        sensor.set_calibration([0.0, 0.0, 0.0], [0.0, 0.0, 0.0])
+    else:
+        sensor.calibrate()
+
+    return (device, sensor, calibration)
+
+class ConversionPlans:
+    '''
+    Conversion plans of a capture, each with the row time after which it applies. The
+    capture loop adds a plan when the calibration follows the temperature while the writer
+    thread converts earlier batches, so every row is converted with the plan of its read.
+    '''
+    def __init__(self, plan):
+        self.plans = [plan]
+        self.times = [-math.inf]
+
+    def add(self, time, plan):
+        # The plan goes first, so the writer thread never sees a time without its plan
+        self.plans.append(plan)
+        self.times.append(time)
+
+    def convert_batch(self, times, raw):
+        count = len(self.times)
+        if count == 1:
+            return self.plans[0].convert_batch(raw)
+
+        import numpy as np
+
+        bounds = [0, *np.searchsorted(times, self.times[1:count], side="right"), len(raw)]
+        values = np.empty((len(raw), 6))
+        for (plan, begin, end) in zip(self.plans, bounds[:-1], bounds[1:]):
+            if end > begin:
+                values[begin:end] = plan.convert_batch(raw[begin:end])
+        return values
+
+class TemperatureTracker:
+    '''
+    Re-applies a full calibration during the capture when the sensor temperature moved,
+    checking at most every `interval` seconds, and records the new conversion plans.
+    '''
+    def __init__(self, sensor, calibration, plans, interval=TEMPERATURE_CHECK_INTERVAL):
+        self.sensor = sensor
+        self.calibration = calibration
+        self.plans = plans
+        self.interval = interval
+        self.updates = 0
+
+    def update(self, elapsed):
+        '''
+        Check the temperature after the row read at `elapsed` seconds. Returns the elapsed
+        time of the next check.
+        '''
+        if self.calibration.update_temperature(self.sensor):
+            self.plans.add(elapsed, self.sensor.conversion_plan())
+            self.updates += 1
+        return elapsed + self.interval
+
+def converted_rows(plans, engine=None):
+    '''
+    Batch transform replacing the raw sensor values of each row with the values converted
+    by the conversion plans, in a single vectorized operation per batch and plan. With a
+    trigger engine, only the rows around triggers are kept.
+    '''
+    convert = converted_array(plans, engine)
+
+    def transform(rows):
+        import numpy as np
+
+        return convert(np.asarray(rows, dtype=np.float64)).tolist()
+    return transform
+
+def converted_array(plans, engine=None):
+    '''
+    Same as converted_rows for the (N, columns) buffers of a DoubleBufferedWriterThread,
+    converted in place.
+    '''
+    def transform(data):
+        data[:, 1:] = plans.convert_batch(data[:, 0], data[:, 1:])
+        return data if engine is None else engine.process(data)
+    return transform
+
+def trigger_engine(args):
+    '''
+    Trigger engine of the --trigger options, None without triggers. Raises ValueError for
+    invalid trigger specifications.
+    '''
+    if not args.trigger:
+        return None
+
+    from supernova_tools.triggers import Trigger, TriggerEngine
+    triggers = [Trigger.parse(specification) for specification in args.trigger]
+    # The pre-trigger buffer holds twice the samples expected in --pre seconds
+    return TriggerEngine(triggers, args.pre, args.post, math.ceil(PENDING_MARGIN * args.pre * args.odr))
+
+def write_events(path, engine):
+    import csv
+
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(("time", "trigger", "value"))
+        writer.writerows((event.time, str(event.trigger), event.value) for event in engine.events)
+
+def segmented(args):
+    return args.segment_size is not None or args.segment_duration is not None
+
+def open_writer(args):
+    '''
+    Open the capture writer: a single file, or a directory of segments when a segment size
+    or duration is requested.
+    '''
+    if not segmented(args):
+        from supernova_tools.writers import open_capture_writer
+        return open_capture_writer(args.out, args.format)
+
+    from supernova_tools.segments import SegmentedCaptureWriter
+    max_segment_bytes = None if args.segment_size is None else int(args.segment_size * 1024 * 1024)
+    return SegmentedCaptureWriter(args.out, args.format or "bin", max_segment_bytes=max_segment_bytes,
+                                  max_segment_seconds=args.segment_duration)
+
+def open_writer_thread(args, writer, plans, engine):
+    '''
+    Segmented captures are written from double buffers, single files in batches.
+    '''
+    if segmented(args):
+        from supernova_tools.segments import DoubleBufferedWriterThread
+        return DoubleBufferedWriterThread(writer, transform=converted_array(plans, engine))
+
+    from supernova_tools.writers import BatchWriterThread
+    return BatchWriterThread(writer, transform=converted_rows(plans, engine))
+
+def capture(sensor, writer_thread, duration, batch_size, tracker=None):
+    '''
+    Read raw samples as fast as possible for `duration` seconds, handing full batches to
+    the writer thread, which converts them. Reading faster than the ODR returns the same
+    sample several times: a read identical to the previous one is dropped, so every row is
+    the first read of a sample. With a TemperatureTracker, the calibration follows the
+    temperature. Returns the number of samples, the number of reads and the elapsed time.
+    '''
+    read = sensor.read_raw
+    clock = time.perf_counter
+    batch = []
+    samples = 0
+    reads = 0
+    last = None
+    next_check = math.inf if tracker is None else tracker.interval
+
+    start = clock()
+    end = start + duration
+    now = start
+    while now < end:
+        raw = read()
+        now = clock()
+        reads += 1
+        if raw == last:
+            continue
+        last = raw
+        elapsed = now - start
+        batch.append((elapsed, *raw))
+        if len(batch) >= batch_size:
+            writer_thread.submit(batch)
+            samples += len(batch)
+            batch = []
+        if elapsed >= next_check:
+            next_check = tracker.update(elapsed)
+
+    if batch:
+        writer_thread.submit(batch)
+        samples += len(batch)
+
+    return (samples, reads, clock() - start)
+
+def capture_data_ready(poller, writer_thread, duration, batch_size, tracker=None):
+    '''
+    Like capture(), but reads every new sample once, when the data-ready flags of the sensor
+    report it, with an AdaptivePoller. Stops at the end of `duration` even if the sensor
+    stops reporting new samples.
+    '''
+    poll = poller.poll
+    clock = time.perf_counter
+    batch = []
+    samples = 0
+    next_check = math.inf if tracker is None else tracker.interval
+
+    start = clock()
+    end = start + duration
+    now = start
+    while now < end:
+        sample = poll(end)
+        if sample is None:
+            break
+        (now, raw) = sample
+        elapsed = now - start
+        batch.append((elapsed, *raw))
+        if len(batch) >= batch_size:
+            writer_thread.submit(batch)
+            samples += len(batch)
+            batch = []
+        if elapsed >= next_check:
+            next_check = tracker.update(elapsed)
+
+    if batch:
+        writer_thread.submit(batch)
+        samples += len(batch)
+
+    return (samples, poller.stats.transactions, clock() - start)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="imu-capture", description="Headless IMU capture through a Supernova host adapter")
+    parser.add_argument("--sensor", choices=sorted(SENSORS), required=True, help="sensor to capture from")
+    parser.add_argument("--odr", type=float, required=True, help="accelerometer and gyroscope output data rate in Hz")
+    parser.add_argument("--duration", type=float, required=True, help="capture duration in seconds")
+    parser.add_argument("--out", required=True, help="output file (.csv, .parquet or .bin), or output directory with --segment-size or --segment-duration")
+    parser.add_argument("--format", choices=("csv", "parquet", "bin"), help="output format, taken from the file extension by default, bin for segmented captures")
+    parser.add_argument("--segment-size", type=float, help="split the capture into segments of this many MiB")
+    parser.add_argument("--segment-duration", type=float, help="split the capture into segments of this many seconds")
+    parser.add_argument("--accel-fs", type=float, help="accelerometer full scale in g")
+    parser.add_argument("--gyro-fs", type=float, help="gyroscope full scale in dps")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="samples per batch handed to the writer thread")
+    parser.add_argument("--skip-calibration", action="store_true", help="do not estimate the sensor biases before capturing")
+    parser.add_argument("--calibration", help="JSON calibration saved by IMU_calibration/imu_calibration.py, used instead of estimating the biases "
+                             "and re-applied when the sensor temperature changes")
+    parser.add_argument("--poll", choices=("continuous", "data-ready"), default="data-ready",
+                        help="read each new sample once using the data-ready flags (default), or as fast as possible dropping repeated reads")
+    parser.add_argument("--trigger", action="append", metavar="METRIC:THRESHOLD",
+                        help="only save the data around rows where accel (g), jerk (g/s) or gyro (dps) magnitude exceeds the threshold, e.g. accel:4; can be repeated")
+    parser.add_argument("--pre", type=float, default=0.1, help="seconds saved before a trigger")
+    parser.add_argument("--post", type=float, default=0.5, help="seconds saved after a trigger")
+    parser.add_argument("--events", help="CSV file listing the time, trigger and value of every trigger event")
+    parser.add_argument("--simulate", action="store_true", help="use a simulated Supernova and sensor")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        configuration = sensor_configuration(args)
+        engine = trigger_engine(args)
+    except ValueError as error:
+        print(error)
+        return 2
+
+    try:
+        writer = open_writer(args)
+    except (ValueError, ImportError) as error:
+        print(error)
+        return 2
+
+    try:
+        (device, sensor, calibration) = open_sensor(args, configuration)
+    except IOError as error:
+        writer.close()
+        print(error)
+        return 1
+
+    poller = None
+    if args.poll == "data-ready":
+        from supernova_tools.polling import AdaptivePoller
+        poller = AdaptivePoller.for_sensor(sensor, args.odr)
+
+    plans = ConversionPlans(sensor.conversion_plan())
+    tracker = None if calibration is None else TemperatureTracker(sensor, calibration, plans)
+    writer_thread = open_writer_thread(args, writer, plans, engine)
+    try:
+        if poller is None:
+            (samples, reads, elapsed) = capture(sensor, writer_thread, args.duration, args.batch_size, tracker)
+        else:
+            (samples, reads, elapsed) = capture_data_ready(poller, writer_thread, args.duration, args.batch_size, tracker)
+    finally:
+        writer_thread.close()
+        device.close()
+
+    print(f"Captured {samples} samples from {reads} reads in {elapsed:.2f} s ({samples / elapsed:.1f} samples/s, "
+          f"requested ODR {args.odr:g} Hz)")
+    if tracker is not None:
+        print(f"Calibration re-applied {tracker.updates} times for temperature changes, "
+              f"last at {calibration.applied_temperature:.2f} degC")
+    if poller is not None:
+        print(f"Data-ready polling: {poller.stats}, estimated ODR {poller.odr:.2f} Hz")
+    if engine is not None:
+        print(engine.summary())
+        if args.events:
+            write_events(args.events, engine)
+            print(f"Wrote {len(engine.events)} trigger events to {args.events}")
+    if segmented(args):
+        size = writer.total_bytes()
+        print(f"Wrote {size} bytes in {len(writer.segments)} segments to {args.out} ({size / elapsed / 1024:.1f} KiB/s), "
+              f"index in {writer.index_path}, {writer_thread.stalls} writer stalls")
+    else:
+        size = os.path.getsize(args.out)
+        print(f"Wrote {size} bytes to {args.out} ({size / elapsed / 1024:.1f} KiB/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+'''
+Headless capture of a BMI323 and an LSM6DSV merged on a common timebase.
+
+Example:
+    python imu_fused_capture.py --rate 200 --method cubic --duration 60 --out fused.parquet
+
+Both sensors keep their own ODR. Every read returns the data-ready flags, the sample and
+the free-running sensor time; the writer thread drops the reads without new data, maps the
+sensor times to host time, estimating the clock drift of each sensor, and resamples both
+streams at `--rate` Hz with linear or cubic interpolation. Each output row holds the host time and the accelerometer and gyroscope
+data of both sensors. Memory stays bounded for captures of any length.
+'''
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+SENSOR_NAMES = ("bmi323", "lsm6dsv")
+
+# Columns of a fused row: host time, then accelerometer and gyroscope of every sensor
+FUSED_COLUMNS = ("time",) + tuple(f"{sensor}_{quantity}_{axis}" for sensor in SENSOR_NAMES
+                                  for quantity in ("accel", "gyro") for axis in "xyz")
+
+# Number of reads of each sensor handed to the writer thread at once
+DEFAULT_BATCH_SIZE = 512
+
+def open_sensors(args):
+    '''
+    Open the Supernova (or the simulated one), initialize the I3C bus and both sensors.
+    Returns the device and the sensors.
+    '''
+    from Bosch_BMI323.BMI323 import BMI323
+    from STMicroelectronics_LSM6DSV.LSM6DSV import LSM6DSV
+    from supernova_tools.transport import RetryingI3C
+
+    if args.simulate:
+        from supernova_tools.simulated import SimulatedSupernovaDevice
+        device = SimulatedSupernovaDevice()
+    else:
+        from supernovacontroller.sequential import SupernovaDevice
+        device = SupernovaDevice()
+    device.open()
+
+    i3c = RetryingI3C(device.create_interface("i3c.controller"))
+    i3c.controller_init()
+    i3c.set_parameters(i3c.I3cPushPullTransferRate.PUSH_PULL_12_5_MHZ, i3c.I3cOpenDrainTransferRate.OPEN_DRAIN_4_17_MHZ)
+    (success, _) = i3c.init_bus(3300)
+    if not success:
+        device.close()
+        raise IOError("I couldn't initialize the bus. Are you sure there's any target connected?")
+
+    sensors = (BMI323(i3c), LSM6DSV(i3c))
+    for sensor in sensors:
+        if sensor.address is None:
+            device.close()
+            raise IOError(f"{type(sensor).__name__} device not found in the I3C bus")
+        sensor.init_device()
+        if args.skip_calibration:
+            sensor.set_calibration([0.0, 0.0, 0.0], [0.0, 0.0, 0.0])
+        else:
+            sensor.calibrate()
+
+    return (device, sensors)
+
+def aligned_rows(sensors, aligner):
+    '''
+    Batch transform converting the raw samples of both sensors with their conversion plans,
+    in accel then gyro order, and returning the aligned rows that became available, often
+    none.
+    '''
+    plans = [sensor.conversion_plan() for sensor in sensors]
+
+    def transform(batches):
+        import numpy as np
+
+        for (stream, (plan, batch)) in enumerate(zip(plans, batches)):
+            if not batch:
+                continue
+            data = np.asarray(batch, dtype=np.float64)
+            aligner.push(stream, data[:, 1].astype(np.int64), plan.convert_batch(data[:, 3:]), data[:, 0], data[:, 2] != 0)
+        return aligner.pop().tolist()
+    return transform
+
+def capture(sensors, writer_thread, duration, batch_size):
+    '''
+    Read both sensors in turn for `duration` seconds. Every read is stored with its host time,
+    sensor time and data-ready flag; full batches go to the writer thread. Returns the
+    number of reads and the elapsed time.
+    '''
+    reads = [sensor.read_raw_ready_timed for sensor in sensors]
+    clock = time.perf_counter
+    batches = tuple([] for _ in sensors)
+    count = 0
+
+    start = clock()
+    end = start + duration
+    now = start
+    while now < end:
+        for (read, batch) in zip(reads, batches):
+            (ready, raw, ticks) = read()
+            now = clock()
+            batch.append((now - start, ticks, ready, *raw))
+        if len(batches[0]) >= batch_size:
+            writer_thread.submit(batches)
+            count += sum(len(batch) for batch in batches)
+            batches = tuple([] for _ in sensors)
+
+    if batches[0]:
+        writer_thread.submit(batches)
+        count += sum(len(batch) for batch in batches)
+
+    return (count, clock() - start)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="imu-fused-capture", description="Capture a BMI323 and an LSM6DSV resampled on a common timebase")
+    parser.add_argument("--rate", type=float, required=True, help="output rate in Hz")
+    parser.add_argument("--method", choices=("linear", "cubic"), default="linear", help="interpolation method")
+    parser.add_argument("--duration", type=float, required=True, help="capture duration in seconds")
+    parser.add_argument("--out", required=True, help="output file (.csv, .parquet or .bin)")
+    parser.add_argument("--format", choices=("csv", "parquet", "bin"), help="output format, taken from the file extension by default")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="reads of each sensor per batch handed to the writer thread")
+    parser.add_argument("--skip-calibration", action="store_true", help="do not estimate the sensor biases before capturing")
+    parser.add_argument("--simulate", action="store_true", help="use a simulated Supernova and sensors")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from supernova_tools.writers import BatchWriterThread, open_capture_writer
+
+    try:
+        writer = open_capture_writer(args.out, args.format, FUSED_COLUMNS)
+    except (ValueError, ImportError) as error:
+        print(error)
+        return 2
+
+    try:
+        (device, sensors) = open_sensors(args)
+    except IOError as error:
+        writer.close()
+        print(error)
+        return 1
+
+    from supernova_tools.alignment import StreamAligner
+
+    aligner = StreamAligner([sensor.sensor_time_resolution for sensor in sensors], args.rate, args.method)
+    writer_thread = BatchWriterThread(writer, transform=aligned_rows(sensors, aligner))
+    try:
+        (reads, elapsed) = capture(sensors, writer_thread, args.duration, args.batch_size)
+    finally:
+        writer_thread.close()
+        device.close()
+
+    print(f"{reads} reads in {elapsed:.2f} s, {sum(aligner.duplicates())} of them returned a sample already read")
+    for (name, drift) in zip(SENSOR_NAMES, aligner.drift_ppm()):
+        print(f"{name} clock drift: {drift:+.0f} ppm")
+    print(f"Wrote {writer_thread.rows_written} rows at {args.rate:g} Hz to {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+'''
+List the segments of a segmented capture and export a time range of it.
+
+Example:
+    python imu_segments.py run
+    python imu_segments.py run --start 3600 --end 3660 --out minute.csv
+
+Only the segments overlapping the requested range are read.
+'''
+import argparse
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="imu-segments", description="Inspect and export segmented IMU captures")
+    parser.add_argument("directory", help="directory written by imu_capture.py with --segment-size or --segment-duration")
+    parser.add_argument("--start", type=float, help="first time to export, in seconds since the start of the capture")
+    parser.add_argument("--end", type=float, help="last time to export, in seconds since the start of the capture")
+    parser.add_argument("--out", help="output file (.csv, .parquet or .bin) for the exported range")
+    parser.add_argument("--format", choices=("csv", "parquet", "bin"), help="output format, taken from the file extension by default")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from supernova_tools.segments import SegmentIndex
+
+    try:
+        index = SegmentIndex(args.directory)
+    except (OSError, ValueError) as error:
+        print(error)
+        return 1
+
+    if args.out is None:
+        for segment in index.segments_between(args.start, args.end):
+            print(f"{segment['file']}: {segment['start']:.3f} s to {segment['end']:.3f} s, "
+                  f"{segment['rows']} rows, {segment['bytes']} bytes")
+        state = "complete" if index.complete else "still being written"
+        print(f"{len(index.segments)} segments, {sum(segment['rows'] for segment in index.segments)} rows, capture {state}")
+        return 0
+
+    from supernova_tools.writers import open_capture_writer
+
+    try:
+        writer = open_capture_writer(args.out, args.format, index.columns)
+    except (ValueError, ImportError) as error:
+        print(error)
+        return 2
+
+    data = index.read_range(args.start, args.end)
+    writer.write_array(data)
+    writer.close()
+    print(f"Exported {len(data)} rows from {len(index.segments_between(args.start, args.end))} segments to {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
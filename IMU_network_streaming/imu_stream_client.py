@@ -0,0 +1,53 @@
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from supernova_tools.stream_server import ImuStreamClient, convert_frame
+
+STREAM_NAMES = {1: "BMI323", 2: "LSM6DSV"}
+
+# Time between two status lines in seconds
+REPORT_PERIOD = 1.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive the IMU stream and print rates, gaps and the last sample")
+    parser.add_argument("--host", default="127.0.0.1", help="server address")
+    parser.add_argument("--port", type=int, default=9470, help="server TCP port")
+    args = parser.parse_args()
+
+    client = ImuStreamClient(args.host, args.port)
+
+    # Per stream: next expected sequence number, samples received and samples missed
+    streams = {}
+    last_report = time.perf_counter()
+
+    try:
+        while True:
+            frame = client.receive()
+            if frame is None:
+                print("Server closed the connection")
+                break
+
+            stream = streams.setdefault(frame["stream_id"], {"next": frame["sequence"], "received": 0, "missed": 0, "last": None})
+            stream["missed"] += frame["sequence"] - stream["next"]
+            stream["next"] = frame["sequence"] + len(frame["raw"])
+            stream["received"] += len(frame["raw"])
+            stream["last"] = convert_frame(frame)[-1]
+
+            now = time.perf_counter()
+            if now - last_report >= REPORT_PERIOD:
+                for (stream_id, stream) in sorted(streams.items()):
+                    rate = stream["received"] / (now - last_report)
+                    (ax, ay, az, gx, gy, gz) = stream["last"]
+                    print(f"{STREAM_NAMES.get(stream_id, stream_id)}: {rate:.0f} samples/s, {stream['missed']} missed, "
+                          f"accel ({ax:.3f}, {ay:.3f}, {az:.3f}) g, gyro ({gx:.2f}, {gy:.2f}, {gz:.2f}) dps")
+                    stream["received"] = 0
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+
+    client.close()
+
+if __name__ == "__main__":
+    main()
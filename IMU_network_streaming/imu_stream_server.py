@@ -0,0 +1,88 @@
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Bosch_BMI323.BMI323 import BMI323
+from STMicroelectronics_LSM6DSV.LSM6DSV import LSM6DSV
+from supernova_tools.stream_server import ImuStreamServer, StreamingSensor, FLAG_DELTA, FLAG_ZLIB, DEFAULT_MAX_QUEUED_FRAMES
+from supernova_tools.transport import ReaderThreads, RetryingI3C
+
+# Stream ids sent in every frame
+BMI323_STREAM = 1
+LSM6DSV_STREAM = 2
+
+def open_device(simulate):
+    if simulate:
+        from supernova_tools.simulated import SimulatedSupernovaDevice
+        return SimulatedSupernovaDevice()
+    from supernovacontroller.sequential import SupernovaDevice
+    return SupernovaDevice()
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream BMI323 and LSM6DSV samples to TCP and WebSocket clients")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=9470, help="TCP port")
+    parser.add_argument("--websocket-port", type=int, default=9471, help="WebSocket port, 0 to pick a free one")
+    parser.add_argument("--batch-size", type=int, default=32, help="samples per frame")
+    parser.add_argument("--max-queued-frames", type=int, default=DEFAULT_MAX_QUEUED_FRAMES,
+                        help="frames queued per client before dropping the oldest ones")
+    parser.add_argument("--delta", action="store_true", help="delta-encode the samples")
+    parser.add_argument("--zlib", action="store_true", help="compress the frame payloads")
+    parser.add_argument("--simulate", action="store_true", help="use a simulated Supernova and sensors")
+    args = parser.parse_args()
+
+    device = open_device(args.simulate)
+
+    info = device.open()
+
+    print(info)
+
+    i3c = RetryingI3C(device.create_interface("i3c.controller"))
+
+    # Configure Supernova device as an I3C controller.
+    i3c.controller_init()
+
+    i3c.set_parameters(i3c.I3cPushPullTransferRate.PUSH_PULL_12_5_MHZ, i3c.I3cOpenDrainTransferRate.OPEN_DRAIN_4_17_MHZ)
+    (success, _) = i3c.init_bus(3300)
+
+    if not success:
+        print("I couldn't initialize the bus. Are you sure there's any target connected?")
+        exit(1)
+
+    sensor_bmi323 = BMI323(i3c)
+
+    sensor_lsm6dsv = LSM6DSV(i3c)
+
+    sensor_bmi323.init_device()
+
+    sensor_lsm6dsv.init_device()
+
+    sensor_bmi323.calibrate()
+
+    sensor_lsm6dsv.calibrate()
+
+    flags = (FLAG_DELTA if args.delta else 0) | (FLAG_ZLIB if args.zlib else 0)
+    server = ImuStreamServer(args.host, args.port, args.websocket_port, args.max_queued_frames, flags).start()
+
+    sensor_bmi323 = StreamingSensor(sensor_bmi323, server, BMI323_STREAM, time.perf_counter, args.batch_size)
+    sensor_lsm6dsv = StreamingSensor(sensor_lsm6dsv, server, LSM6DSV_STREAM, time.perf_counter, args.batch_size)
+
+    print(f"Streaming on tcp://{args.host}:{server.port} and ws://{args.host}:{server.websocket_port}, press Ctrl+C to stop")
+
+    # Each sensor is read from its own thread, so the retries of a failing sensor do not
+    # delay the other one
+    readers = ReaderThreads([sensor_bmi323.read, sensor_lsm6dsv.read]).start()
+    readers.wait()
+    try:
+        readers.stop()
+    finally:
+        server.stop()
+
+        for client in server.clients:
+            print(f"Client: {client.sent} frames sent, {client.dropped} dropped")
+
+        device.close()
+
+if __name__ == "__main__":
+    main()
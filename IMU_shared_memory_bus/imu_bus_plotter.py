@@ -0,0 +1,65 @@
+import sys
+import os
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from supernova_tools.shm_bus import ImuSubscriber
+import matplotlib.pyplot as plt
+import numpy as np
+
+# Number of records shown in the plots
+WINDOW = 500
+
+def main():
+    parser = argparse.ArgumentParser(description="Plot the samples published on a shared memory IMU bus")
+    parser.add_argument("bus", help="bus name, e.g. supernova_bmi323")
+    args = parser.parse_args()
+
+    subscriber = ImuSubscriber(args.bus)
+
+    # Setup the matplotlib figure and axes
+    plt.ion()
+    fig, (ax1, ax2) = plt.subplots(2, 1)
+    fig.subplots_adjust(hspace=0.5)
+    fig.suptitle(f'Supernova IMU bus {args.bus}', fontsize=16)
+    plt.get_current_fig_manager().set_window_title("Sensor Data Visualization")
+
+    # Last WINDOW records, copied out of the shared memory
+    history = np.empty((0, subscriber.ring.columns))
+
+    keep_running = True
+
+    def on_key(event):
+        nonlocal keep_running
+        if event.key == 'q':
+            keep_running = False
+
+    fig.canvas.mpl_connect('key_press_event', on_key)
+
+    while keep_running:
+        (records, dropped) = subscriber.read()
+        history = np.concatenate((history, records))[-WINDOW:]
+
+        # Plot accelerometer data
+        ax1.cla()
+        ax1.plot(history[:, 0], history[:, 1:4], label=['X', 'Y', 'Z'])
+        ax1.legend()
+        ax1.set_title('Accelerometer Data')
+        ax1.set_ylabel('Acceleration (g)')
+
+        # Plot gyroscope data
+        ax2.cla()
+        ax2.plot(history[:, 0], history[:, 4:7], label=['X', 'Y', 'Z'])
+        ax2.legend()
+        ax2.set_title('Gyroscope Data')
+        ax2.set_ylabel('Angular Velocity (dps)')
+
+        plt.pause(0.1)
+
+    plt.close(fig)
+
+    # Drop the last reference to the shared memory before closing it
+    records = None
+    subscriber.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Bosch_BMI323.BMI323 import BMI323
+from STMicroelectronics_LSM6DSV.LSM6DSV import LSM6DSV
+from supernova_tools.shm_bus import ImuPublisher, PublishingSensor
+from supernova_tools.transport import ReaderThreads, RetryingI3C
+from supernovacontroller.sequential import SupernovaDevice
+
+# Shared memory bus names, one per sensor
+BMI323_BUS = "supernova_bmi323"
+LSM6DSV_BUS = "supernova_lsm6dsv"
+
+def main():
+    device = SupernovaDevice()
+
+    info = device.open()
+
+    print(info)
+
+    i3c = RetryingI3C(device.create_interface("i3c.controller"))
+
+    # Configure Supernova device as an I3C controller.
+    i3c.controller_init()
+
+    i3c.set_parameters(i3c.I3cPushPullTransferRate.PUSH_PULL_12_5_MHZ, i3c.I3cOpenDrainTransferRate.OPEN_DRAIN_4_17_MHZ)
+    (success, _) = i3c.init_bus(3300)
+
+    if not success:
+        print("I couldn't initialize the bus. Are you sure there's any target connected?")
+        exit(1)
+
+    sensor_bmi323 = BMI323(i3c)
+
+    sensor_lsm6dsv = LSM6DSV(i3c)
+
+    sensor_bmi323.init_device()
+
+    sensor_lsm6dsv.init_device()
+
+    sensor_bmi323.calibrate()
+
+    sensor_lsm6dsv.calibrate()
+
+    # Every sample read is published for the subscribers
+    publisher_bmi323 = ImuPublisher(BMI323_BUS)
+    publisher_lsm6dsv = ImuPublisher(LSM6DSV_BUS)
+    sensor_bmi323 = PublishingSensor(sensor_bmi323, publisher_bmi323, time.perf_counter)
+    sensor_lsm6dsv = PublishingSensor(sensor_lsm6dsv, publisher_lsm6dsv, time.perf_counter)
+
+    print(f"Publishing on the '{BMI323_BUS}' and '{LSM6DSV_BUS}' buses, press Ctrl+C to stop")
+
+    # Each sensor is read from its own thread, so the retries of a failing sensor do not
+    # delay the other one
+    readers = ReaderThreads([sensor_bmi323.read, sensor_lsm6dsv.read]).start()
+    readers.wait()
+    try:
+        readers.stop()
+    finally:
+        publisher_bmi323.close()
+        publisher_lsm6dsv.close()
+
+        device.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from supernova_tools.shm_bus import ImuSubscriber
+from supernova_tools.writers import open_capture_writer
+
+# Time between two reads of the bus in seconds
+POLL_PERIOD = 0.05
+
+def main():
+    parser = argparse.ArgumentParser(description="Record the samples published on a shared memory IMU bus")
+    parser.add_argument("bus", help="bus name, e.g. supernova_bmi323")
+    parser.add_argument("--out", required=True, help="output file (.csv, .parquet or .bin)")
+    args = parser.parse_args()
+
+    subscriber = ImuSubscriber(args.bus)
+    writer = open_capture_writer(args.out)
+
+    print(f"Recording '{args.bus}' to {args.out}, press Ctrl+C to stop")
+
+    recorded = 0
+    try:
+        while True:
+            (records, dropped) = subscriber.read()
+            if len(records):
+                recorded += len(records)
+                writer.write_batch(records.tolist())
+            if dropped:
+                print(f"Recorder too slow, {dropped} samples lost")
+            time.sleep(POLL_PERIOD)
+    except KeyboardInterrupt:
+        pass
+
+    writer.close()
+    records = None
+    subscriber.close()
+
+    print(f"Recorded {recorded} samples, {subscriber.dropped} lost")
+
+if __name__ == "__main__":
+    main()
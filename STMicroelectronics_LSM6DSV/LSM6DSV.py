@@ -1,8 +1,28 @@
-import sys
-import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".")))
-from LSM6DSV_definitions import *
-from ctypes import *
+import struct
+from supernova_tools.conversion import GYRO_FIRST_LAYOUT, as_matrix, compile_plan
+from .LSM6DSV_definitions import (
+    CALIBRATION_SAMPLES, MAX_ACCEL_BIAS, MIN_ACCEL_BIAS,
+    LSM6DSV_ACCEL_CONFIG_1_REG, LSM6DSV_ACCEL_CONFIG_2_REG, LSM6DSV_ACCEL_RES_VALUES,
+    LSM6DSV_ACCEL_OP_MODES, LSM6DSV_ACCEL_ODR, LSM6DSV_ACCEL_FS,
+    LSM6DSV_TEMP_DATA, LSM6DSV_TEMP_SENSITIVITY, LSM6DSV_TEMP_OFFSET,
+    LSM6DSV_TIMESTAMP, LSM6DSV_TIMESTAMP_RESOLUTION, LSM6DSV_FUNCTIONS_ENABLE_REG, LSM6DSV_TIMESTAMP_EN,
+    LSM6DSV_STATUS_REG, LSM6DSV_STATUS_XLDA, LSM6DSV_STATUS_GDA,
+    LSM6DSV_GYRO_CONFIG_1_REG, LSM6DSV_GYRO_CONFIG_2_REG, LSM6DSV_GYRO_DATA_X, LSM6DSV_GYRO_RES_VALUES,
+    LSM6DSV_GYRO_OP_MODES, LSM6DSV_GYRO_ODR, LSM6DSV_GYRO_FS,
+)
+
+# Gyroscope and accelerometer X, Y and Z as little-endian signed 16-bit integers
+IMU_DATA_FORMAT = struct.Struct("<6h")
+
+# Temperature as a little-endian signed 16-bit integer
+TEMP_DATA_FORMAT = struct.Struct("<h")
+
+# Timestamp as a little-endian unsigned 32-bit integer
+SENSOR_TIME_FORMAT = struct.Struct("<I")
+
+# Status register, one unused register and the temperature, followed by the gyroscope and
+# accelerometer data
+STATUS_DATA_FORMAT = struct.Struct("<B1xh6h")
 
 def find_matching_item(data, target_pid):
     for item in data:
@@ -27,6 +47,17 @@ class LSM6DSV:
     # Calibration
     accel_bias = None
     gyro_bias = None
+    accel_matrix = None
+    gyro_matrix = None
+
+    # Position of accel X, Y, Z and gyro X, Y, Z in the raw samples
+    raw_layout = GYRO_FIRST_LAYOUT
+
+    # Duration of a timestamp tick in seconds
+    sensor_time_resolution = LSM6DSV_TIMESTAMP_RESOLUTION
+
+    # Conversion plan of the current configuration, compiled on the first read
+    plan = None
 
     def __init__(self, i3c):
         self.i3c = i3c
@@ -44,10 +75,11 @@ class LSM6DSV:
     def __calculate_resolution(self):
         '''
         Calculate the resolutions of the sensor based on the current configuration.
-        Use the respective full scale values and the number of bits (16) to calculate the resolutions.
+        The resolutions of every full scale are precomputed in the definitions from the full scale
+        values and the number of bits (16).
         '''
-        a_res = LSM6DSV_ACCEL_FS_VALUES[self.accel_fs] / LSM6DSV_ACCEL_RESOLUTION
-        g_res = LSM6DSV_GYRO_FS_VALUES[self.gyro_fs] / LSM6DSV_GYRO_RESOLUTION
+        a_res = LSM6DSV_ACCEL_RES_VALUES[self.accel_fs]
+        g_res = LSM6DSV_GYRO_RES_VALUES[self.gyro_fs]
 
         return (a_res, g_res)
     
@@ -60,15 +92,21 @@ class LSM6DSV:
         READ_LEN = 12
 
         # Read data
-        (_, raw_data) = self.i3c.read(self.address, self.i3c.TransferMode.I3C_SDR, [LSM6DSV_GYRO_DATA_X], READ_LEN)
+        (success, raw_data) = self.i3c.read(self.address, self.i3c.TransferMode.I3C_SDR, [LSM6DSV_GYRO_DATA_X], READ_LEN)
+        if not success:
+            raise IOError(f"LSM6DSV read failed: {raw_data}")
 
         # Convert data to signed 16-bit integers
-        imu_data = [0, 0, 0, 0, 0, 0]
-        for i in range(len(imu_data)):
-            imu_data[i] = c_int16((raw_data[2*i + 1] << 8) | raw_data[2*i]).value
-        
-        return imu_data
+        return list(IMU_DATA_FORMAT.unpack_from(bytes(raw_data)))
     
+    def __write_register(self, register, data):
+        '''
+        Write a configuration register and make sure the sensor acknowledged it.
+        '''
+        (success, result) = self.i3c.write(self.address, self.i3c.TransferMode.I3C_SDR, [register], data)
+        if not success:
+            raise IOError(f"LSM6DSV write to register 0x{register:02x} failed: {result}")
+
     def init_device(self):
         '''
         Initialize the sensor with the current configuration. Uses two configuration registers of
@@ -77,17 +115,21 @@ class LSM6DSV:
         # Set accelerometer configuration
         LSM6DSV_ACCEL_CONFIG_1 = [self.accel_mode | self.accel_odr]
         LSM6DSV_ACCEL_CONFIG_2 = [self.accel_fs]
-        self.i3c.write(self.address, self.i3c.TransferMode.I3C_SDR, [LSM6DSV_ACCEL_CONFIG_1_REG], LSM6DSV_ACCEL_CONFIG_1)
-        self.i3c.write(self.address, self.i3c.TransferMode.I3C_SDR, [LSM6DSV_ACCEL_CONFIG_2_REG], LSM6DSV_ACCEL_CONFIG_2)
+        self.__write_register(LSM6DSV_ACCEL_CONFIG_1_REG, LSM6DSV_ACCEL_CONFIG_1)
+        self.__write_register(LSM6DSV_ACCEL_CONFIG_2_REG, LSM6DSV_ACCEL_CONFIG_2)
 
         # Set gyroscope configuration
         LSM6DSV_GYRO_CONFIG_1 = [self.gyro_mode | self.gyro_odr]
         LSM6DSV_GYRO_CONFIG_2 = [self.gyro_fs]
-        self.i3c.write(self.address, self.i3c.TransferMode.I3C_SDR, [LSM6DSV_GYRO_CONFIG_1_REG], LSM6DSV_GYRO_CONFIG_1)
-        self.i3c.write(self.address, self.i3c.TransferMode.I3C_SDR, [LSM6DSV_GYRO_CONFIG_2_REG], LSM6DSV_GYRO_CONFIG_2)
+        self.__write_register(LSM6DSV_GYRO_CONFIG_1_REG, LSM6DSV_GYRO_CONFIG_1)
+        self.__write_register(LSM6DSV_GYRO_CONFIG_2_REG, LSM6DSV_GYRO_CONFIG_2)
+
+        # Enable the timestamp counter
+        self.__write_register(LSM6DSV_FUNCTIONS_ENABLE_REG, [LSM6DSV_TIMESTAMP_EN])
 
         # Calculate resolutions
         self.accel_res, self.gyro_res = self.__calculate_resolution()
+        self.plan = None
 
     def calibrate(self):
         '''
@@ -125,23 +167,82 @@ class LSM6DSV:
         if accel_bias[2] < MIN_ACCEL_BIAS:
             accel_bias[2] += 1.0  # Remove gravity from the z-axis accelerometer bias calculation 
 
-        self.accel_bias = accel_bias
-        self.gyro_bias = gyro_bias
+        self.set_calibration(accel_bias, gyro_bias)
 
-    def read(self):
+    def set_calibration(self, accel_bias, gyro_bias, accel_matrix=None, gyro_matrix=None):
         '''
-        Read the data from the sensor and convert it to the correct units.
+        Set the biases and the optional 3x3 accelerometer and gyroscope correction matrices
+        applied by read(). The conversion plan is recompiled on the next read.
+        '''
+        self.accel_bias = list(accel_bias)
+        self.gyro_bias = list(gyro_bias)
+        self.accel_matrix = as_matrix(accel_matrix)
+        self.gyro_matrix = as_matrix(gyro_matrix)
+        self.plan = None
+
+    def conversion_plan(self):
+        '''
+        Return the conversion plan of the current resolutions and calibration. Plans are cached
+        per configuration, so switching back to a previous configuration does not recompile it.
         '''
-        # Read imu data
-        imu_data = self.__read_data()
+        if self.plan is None:
+            self.plan = compile_plan(self.raw_layout, self.accel_res, self.gyro_res, tuple(self.accel_bias),
+                                     tuple(self.gyro_bias), self.accel_matrix, self.gyro_matrix)
+        return self.plan
 
-        # Convert data to correct units   
-        gx = imu_data[0]*self.gyro_res - self.gyro_bias[0]
-        gy = imu_data[1]*self.gyro_res - self.gyro_bias[1]
-        gz = imu_data[2]*self.gyro_res - self.gyro_bias[2]
+    def read_raw(self):
+        '''
+        Read one sample as signed 16-bit integers in the register order of the sensor, without
+        any conversion. Batches of raw samples are converted with conversion_plan().convert_batch().
+        '''
+        return self.__read_data()
 
-        ax = imu_data[3]*self.accel_res - self.accel_bias[0]
-        ay = imu_data[4]*self.accel_res - self.accel_bias[1]
-        az = imu_data[5]*self.accel_res - self.accel_bias[2]
+    def read_temperature(self):
+        '''
+        Read the internal temperature of the sensor in degrees Celsius.
+        '''
+        (success, raw_data) = self.i3c.read(self.address, self.i3c.TransferMode.I3C_SDR, [LSM6DSV_TEMP_DATA], 2)
+        if not success:
+            raise IOError(f"LSM6DSV temperature read failed: {raw_data}")
 
-        return ((ax, ay, az), (gx, gy, gz))
\ No newline at end of file
+        (raw_temperature,) = TEMP_DATA_FORMAT.unpack_from(bytes(raw_data))
+        return raw_temperature / LSM6DSV_TEMP_SENSITIVITY + LSM6DSV_TEMP_OFFSET
+
+    def read_sensor_time(self):
+        '''
+        Read the timestamp counter, in ticks of sensor_time_resolution seconds.
+        '''
+        (success, raw_data) = self.i3c.read(self.address, self.i3c.TransferMode.I3C_SDR, [LSM6DSV_TIMESTAMP], 4)
+        if not success:
+            raise IOError(f"LSM6DSV timestamp read failed: {raw_data}")
+
+        return SENSOR_TIME_FORMAT.unpack_from(bytes(raw_data))[0]
+
+    def read_raw_ready_timed(self):
+        '''
+        Like read_raw_ready, plus the timestamp in ticks. The timestamp registers are not next
+        to the data registers, so they are read in a second transaction right after the data.
+        Returns (ready, raw, ticks). The timestamp counter is free-running: it tells when the
+        read happened on the sensor clock, not when the sample was produced.
+        '''
+        (ready, raw) = self.read_raw_ready()
+        return (ready, raw, self.read_sensor_time())
+
+    def read_raw_ready(self):
+        '''
+        Read the status register and one raw sample in a single transaction. Returns (ready, raw),
+        `ready` being True when the accelerometer or gyroscope produced new data since the last
+        read; otherwise `raw` repeats the previous sample.
+        '''
+        (success, raw_data) = self.i3c.read(self.address, self.i3c.TransferMode.I3C_SDR, [LSM6DSV_STATUS_REG], STATUS_DATA_FORMAT.size)
+        if not success:
+            raise IOError(f"LSM6DSV read failed: {raw_data}")
+
+        values = STATUS_DATA_FORMAT.unpack_from(bytes(raw_data))
+        return (bool(values[0] & (LSM6DSV_STATUS_XLDA | LSM6DSV_STATUS_GDA)), list(values[2:]))
+
+    def read(self):
+        '''
+        Read the data from the sensor and convert it to the correct units.
+        '''
+        return self.conversion_plan().convert(self.__read_data())
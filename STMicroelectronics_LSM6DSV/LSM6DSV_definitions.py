@@ -32,6 +32,23 @@ class LSM6DSV_ACCEL_ODR(Enum):
     AODR_3_84kHz    = 0x0B
     AODR_7_68kHz    = 0x0C
 
+# Accelerometer output data rates in Hz
+LSM6DSV_ACCEL_ODR_VALUES = {
+    LSM6DSV_ACCEL_ODR.POWER_DOWN.value:   0.0,
+    LSM6DSV_ACCEL_ODR.AODR_1_875Hz.value: 1.875,
+    LSM6DSV_ACCEL_ODR.AODR_7_5Hz.value:   7.5,
+    LSM6DSV_ACCEL_ODR.AODR_15Hz.value:    15.0,
+    LSM6DSV_ACCEL_ODR.AODR_30Hz.value:    30.0,
+    LSM6DSV_ACCEL_ODR.AODR_60Hz.value:    60.0,
+    LSM6DSV_ACCEL_ODR.AODR_120Hz.value:   120.0,
+    LSM6DSV_ACCEL_ODR.AODR_240Hz.value:   240.0,
+    LSM6DSV_ACCEL_ODR.AODR_480Hz.value:   480.0,
+    LSM6DSV_ACCEL_ODR.AODR_960Hz.value:   960.0,
+    LSM6DSV_ACCEL_ODR.AODR_1_92kHz.value: 1920.0,
+    LSM6DSV_ACCEL_ODR.AODR_3_84kHz.value: 3840.0,
+    LSM6DSV_ACCEL_ODR.AODR_7_68kHz.value: 7680.0
+}
+
 # Address of the LSM6DSV Accelerometer Configuration 2 Register
 LSM6DSV_ACCEL_CONFIG_2_REG = 0x17
 
@@ -53,10 +70,37 @@ LSM6DSV_ACCEL_FS_VALUES = {
 # Accelerometer 16 bits symmetric resolution
 LSM6DSV_ACCEL_RESOLUTION = 32768.0
 
+# Accelerometer resolutions in g/LSB, precomputed for every full scale
+LSM6DSV_ACCEL_RES_VALUES = {fs: value / LSM6DSV_ACCEL_RESOLUTION for (fs, value) in LSM6DSV_ACCEL_FS_VALUES.items()}
+
 # Accelerometer bias limits in g
 MAX_ACCEL_BIAS = 0.8
 MIN_ACCEL_BIAS = -0.8
 
+# Status register address
+LSM6DSV_STATUS_REG = 0x1E
+
+# Data ready flags of the status register, cleared when the data is read
+LSM6DSV_STATUS_XLDA = 0x01
+LSM6DSV_STATUS_GDA = 0x02
+
+# Temperature data register address
+LSM6DSV_TEMP_DATA = 0x20
+
+# Temperature conversion: T = raw / LSM6DSV_TEMP_SENSITIVITY + LSM6DSV_TEMP_OFFSET in degrees Celsius
+LSM6DSV_TEMP_SENSITIVITY = 256.0
+LSM6DSV_TEMP_OFFSET = 25.0
+
+# Timestamp registers address (32-bit counter)
+LSM6DSV_TIMESTAMP = 0x40
+
+# Timestamp resolution in seconds, nominal value of the internal oscillator
+LSM6DSV_TIMESTAMP_RESOLUTION = 21.75e-6
+
+# Address of the LSM6DSV Functions Enable Register and its timestamp enable bit
+LSM6DSV_FUNCTIONS_ENABLE_REG = 0x50
+LSM6DSV_TIMESTAMP_EN = 0x40
+
 # Address of the LSM6DSV Gyroscope Configuration 1 Register
 LSM6DSV_GYRO_CONFIG_1_REG = 0x11
 
@@ -83,6 +127,22 @@ class LSM6DSV_GYRO_ODR(Enum):
     GODR_3_84kHz    = 0x0B
     GODR_7_68kHz    = 0x0C
 
+# Gyroscope output data rates in Hz
+LSM6DSV_GYRO_ODR_VALUES = {
+    LSM6DSV_GYRO_ODR.POWER_DOWN.value:   0.0,
+    LSM6DSV_GYRO_ODR.GODR_7_5Hz.value:   7.5,
+    LSM6DSV_GYRO_ODR.GODR_15Hz.value:    15.0,
+    LSM6DSV_GYRO_ODR.GODR_30Hz.value:    30.0,
+    LSM6DSV_GYRO_ODR.GODR_60Hz.value:    60.0,
+    LSM6DSV_GYRO_ODR.GODR_120Hz.value:   120.0,
+    LSM6DSV_GYRO_ODR.GODR_240Hz.value:   240.0,
+    LSM6DSV_GYRO_ODR.GODR_480Hz.value:   480.0,
+    LSM6DSV_GYRO_ODR.GODR_960Hz.value:   960.0,
+    LSM6DSV_GYRO_ODR.GODR_1_92kHz.value: 1920.0,
+    LSM6DSV_GYRO_ODR.GODR_3_84kHz.value: 3840.0,
+    LSM6DSV_GYRO_ODR.GODR_7_68kHz.value: 7680.0
+}
+
 # Address of the LSM6DSV Gyroscope Configuration 2 Register
 LSM6DSV_GYRO_CONFIG_2_REG = 0x15
 
@@ -109,4 +169,7 @@ LSM6DSV_GYRO_FS_VALUES = {
 LSM6DSV_GYRO_DATA_X = 0x22
 
 # Gyroscope 16 bits symmetric resolution
-LSM6DSV_GYRO_RESOLUTION = 32768.0
\ No newline at end of file
+LSM6DSV_GYRO_RESOLUTION = 32768.0
+
+# Gyroscope resolutions in dps/LSB, precomputed for every full scale
+LSM6DSV_GYRO_RES_VALUES = {fs: value / LSM6DSV_GYRO_RESOLUTION for (fs, value) in LSM6DSV_GYRO_FS_VALUES.items()}
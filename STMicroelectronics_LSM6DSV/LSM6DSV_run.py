@@ -1,7 +1,9 @@
-import matplotlib.pyplot as plt
+import sys
+import os
 import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from STMicroelectronics_LSM6DSV.LSM6DSV import LSM6DSV
 from supernovacontroller.sequential import SupernovaDevice
-from LSM6DSV import LSM6DSV
 
 def main():
     device = SupernovaDevice()
@@ -30,6 +32,9 @@ def main():
 
     sensor.calibrate()
 
+    # matplotlib is only loaded once the sensor is ready to be plotted
+    import matplotlib.pyplot as plt
+
     # Setup the matplotlib figure and axes
     plt.ion()
     fig, (ax1, ax2) = plt.subplots(2, 1)
@@ -0,0 +1,6 @@
+'''
+STMicroelectronics LSM6DSV driver for the Supernova I3C controller.
+
+Nothing is imported here, so `import STMicroelectronics_LSM6DSV.LSM6DSV_definitions` only loads
+the register definitions. The driver is imported with `from STMicroelectronics_LSM6DSV.LSM6DSV import LSM6DSV`.
+'''
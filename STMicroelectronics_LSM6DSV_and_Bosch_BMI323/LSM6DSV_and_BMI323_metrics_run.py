@@ -0,0 +1,70 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Bosch_BMI323.BMI323 import BMI323
+from Bosch_BMI323.BMI323_definitions import BMI323_ACCEL_ODR_VALUES
+from STMicroelectronics_LSM6DSV.LSM6DSV import LSM6DSV
+from STMicroelectronics_LSM6DSV.LSM6DSV_definitions import LSM6DSV_ACCEL_ODR_VALUES
+from supernova_tools.metrics import MetricsRegistry, MetricsExporter, InstrumentedI3C, InstrumentedSensor
+from supernova_tools.transport import ReaderThreads, RetryingI3C
+from supernovacontroller.sequential import SupernovaDevice
+
+# Local port of the Prometheus endpoint
+METRICS_PORT = 9464
+
+def main():
+    device = SupernovaDevice()
+
+    info = device.open()
+
+    print(info)
+
+    registry = MetricsRegistry()
+
+    # Count every bus transaction issued by the drivers, including retried ones
+    i3c = RetryingI3C(InstrumentedI3C(device.create_interface("i3c.controller"), registry))
+
+    # Configure Supernova device as an I3C controller.
+    i3c.controller_init()
+
+    i3c.set_parameters(i3c.I3cPushPullTransferRate.PUSH_PULL_12_5_MHZ, i3c.I3cOpenDrainTransferRate.OPEN_DRAIN_4_17_MHZ)
+    (success, _) = i3c.init_bus(3300)
+
+    if not success:
+        print("I couldn't initialize the bus. Are you sure there's any target connected?")
+        exit(1)
+
+    bmi323 = BMI323(i3c)
+
+    lsm6dsv = LSM6DSV(i3c)
+
+    # The ODRs tell how many samples were missed between two reads
+    sensor_bmi323 = InstrumentedSensor(bmi323, registry, odr=BMI323_ACCEL_ODR_VALUES[bmi323.accel_odr])
+
+    sensor_lsm6dsv = InstrumentedSensor(lsm6dsv, registry, odr=LSM6DSV_ACCEL_ODR_VALUES[lsm6dsv.accel_odr])
+
+    sensor_bmi323.init_device()
+
+    sensor_lsm6dsv.init_device()
+
+    sensor_bmi323.calibrate()
+
+    sensor_lsm6dsv.calibrate()
+
+    exporter = MetricsExporter(registry, port=METRICS_PORT).start()
+    print(f"Serving metrics on http://{exporter.host}:{exporter.port}/metrics, press Ctrl+C to stop")
+
+    # Each sensor is read from its own thread, so the retries of a failing sensor do not
+    # delay the other one. Once the retries are exhausted the failure is already counted,
+    # print it and keep acquiring. The data-ready flags are read with every sample to
+    # count stale reads and missed samples.
+    readers = ReaderThreads([sensor_bmi323.poll, sensor_lsm6dsv.poll], on_error=print).start()
+    readers.wait()
+    readers.stop()
+
+    exporter.stop()
+
+    device.close()
+
+if __name__ == "__main__":
+    main()
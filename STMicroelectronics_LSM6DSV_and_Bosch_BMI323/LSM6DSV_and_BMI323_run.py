@@ -4,7 +4,6 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from Bosch_BMI323.BMI323 import BMI323
 from STMicroelectronics_LSM6DSV.LSM6DSV import LSM6DSV
 from supernovacontroller.sequential import SupernovaDevice
-import matplotlib.pyplot as plt
 import time
 
 def main():
@@ -40,6 +39,9 @@ def main():
 
     sensor_lsm6dsv.calibrate()
 
+    # matplotlib is only loaded once the sensors are ready to be plotted
+    import matplotlib.pyplot as plt
+
     # Setup the matplotlib figure and axes
     plt.ion()
     fig, (ax1, ax2) = plt.subplots(2, 1)
@@ -0,0 +1,61 @@
+import sys
+import os
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from supernova_tools.batch_programmer import BatchProgrammer
+from supernova_tools.memory_device import MemoryDevice, PROFILES, FRAM_MB85RC256V, open_supernova, transfer_rates
+from supernova_tools.transport import RetryingI3C
+
+def main():
+    parser = argparse.ArgumentParser(description="Program the same image into several I2C memories and verify them")
+    parser.add_argument("image", help="file to program")
+    parser.add_argument("--addresses", nargs="+", default=["0x50"], help="I2C addresses of the memories, e.g. 0x50 0x51 0x52")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=FRAM_MB85RC256V.name, help="memory part")
+    parser.add_argument("--offset", type=lambda value: int(value, 0), default=0, help="memory offset of the image")
+    parser.add_argument("--no-verify", action="store_true", help="skip the read back")
+    parser.add_argument("--simulate", action="store_true", help="use a simulated Supernova and memories")
+    args = parser.parse_args()
+
+    addresses = [int(address, 0) for address in args.addresses]
+    profile = PROFILES[args.profile]
+
+    with open(args.image, "rb") as file:
+        image = file.read()
+
+    device = open_supernova(args.simulate, addresses, profile)
+
+    info = device.open()
+
+    print(info)
+
+    # The interface is wrapped to retry failed transfers
+    i3c = RetryingI3C(device.create_interface("i3c.controller"), bus_voltage = 3300)
+
+    i3c.set_parameters(*transfer_rates(args.simulate))
+    (success, _) = i3c.init_bus(3300)
+
+    if not success:
+        print("I couldn't initialize the bus. Are you sure there's any target connected?")
+        exit(1)
+
+    memories = [MemoryDevice(i3c, address, profile) for address in addresses]
+
+    print(f"Programming {len(image)} bytes into {len(memories)} {profile.name} at {', '.join(args.addresses)}")
+
+    try:
+        report = BatchProgrammer(memories).program(image, args.offset, verify=not args.no_verify)
+    except ValueError as error:
+        # The image does not fit in the memory at this offset
+        print(f"Programming failed! {error}")
+        device.close()
+        sys.exit(1)
+
+    print(report.summary())
+
+    device.close()
+
+    if not report.ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import sys
+import os
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from supernova_tools.compressed_transfer import ALGORITHMS, write_compressed, read_compressed
+from supernova_tools.memory_device import MemoryDevice, PROFILES, FRAM_MB85RC256V, open_supernova, transfer_rates
+from supernova_tools.transport import RetryingI3C, TransferError
+
+I2C_FRAM_ADDRESS = 0x50
+
+def main():
+    parser = argparse.ArgumentParser(description="Store a file compressed in an I2C memory and read it back")
+    parser.add_argument("file", nargs="?", default="./Binho_Supernova_Demo.txt", help="file to transfer")
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS) + ["all"], default="zlib",
+                        help="compression algorithm, 'all' compares them")
+    parser.add_argument("--address", type=lambda value: int(value, 0), default=I2C_FRAM_ADDRESS, help="I2C address of the memory")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=FRAM_MB85RC256V.name, help="memory part")
+    parser.add_argument("--offset", type=lambda value: int(value, 0), default=0, help="memory offset of the container")
+    parser.add_argument("--out", default="./I2C_Read_Binho_Supernova_Demo.txt", help="file to store the data read back")
+    parser.add_argument("--simulate", action="store_true", help="use a simulated Supernova and memory")
+    args = parser.parse_args()
+
+    with open(args.file, "rb") as file:
+        data = file.read()
+
+    profile = PROFILES[args.profile]
+    device = open_supernova(args.simulate, [args.address], profile)
+
+    info = device.open()
+
+    print(info)
+
+    # The interface is wrapped to retry failed transfers
+    i3c = RetryingI3C(device.create_interface("i3c.controller"), bus_voltage = 3300)
+
+    i3c.set_parameters(*transfer_rates(args.simulate))
+    (success, _) = i3c.init_bus(3300)
+
+    if not success:
+        print("I couldn't initialize the bus. Are you sure there's any target connected?")
+        exit(1)
+
+    memory = MemoryDevice(i3c, args.address, profile)
+
+    algorithms = sorted(ALGORITHMS, key=ALGORITHMS.get) if args.algorithm == "all" else [args.algorithm]
+    failed = False
+    for algorithm in algorithms:
+        try:
+            write_stats = write_compressed(memory, args.offset, data, algorithm)
+            (read_back, read_stats) = read_compressed(memory, args.offset)
+        except (TransferError, ValueError) as error:
+            print(f"{algorithm}: transfer failed! {error}")
+            failed = True
+            continue
+
+        print(f"Write {write_stats}")
+        print(f"Read  {read_stats}")
+        if read_back != data:
+            print(f"{algorithm}: read back data does not match the file!")
+            failed = True
+
+    # Store the data read back for content comparison
+    if not failed:
+        with open(args.out, "wb") as file:
+            file.write(read_back)
+
+    device.close()
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,20 @@
 # Includes
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from supernovacontroller.sequential import SupernovaDevice
 from BinhoSupernova.commands.definitions import *
+from supernova_tools.transport import RetryingI3C, TransferError
+from supernova_tools.memory_device import MemoryDevice, FRAM_MB85RC256V
+from supernova_tools.metrics import MetricsRegistry, MetricsExporter, InstrumentedI3C
+
+parser = argparse.ArgumentParser(description="Transfer a text file to an I2C FRAM over I3C and read it back")
+parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics of the transfer on this local port")
+parser.add_argument("--start-offset", type=int, default=0,
+                    help="offset of the first byte to write, to resume a failed transfer at the offset it reported")
+args = parser.parse_args()
 
 ## Set up Supernova
 # Create an instance of the Supernova class
@@ -21,7 +35,24 @@ file_bytes = file_content.encode('utf-8')
 
 # Create interface to manage the Supernova I3C peripheral as controller
 print("Creating interface to manage the Supernova I3C peripheral as controller")
-i3c = supernova.create_interface("i3c.controller")
+interface = supernova.create_interface("i3c.controller")
+
+# Optionally count the transactions, bytes, errors and latency of every I2C chunk,
+# including retried ones, and serve them to Prometheus
+exporter = None
+if args.metrics_port is not None:
+    registry = MetricsRegistry()
+    interface = InstrumentedI3C(interface, registry)
+    exporter = MetricsExporter(registry, port = args.metrics_port).start()
+    print(f"Serving metrics on http://{exporter.host}:{exporter.port}/metrics")
+
+def close():
+    if exporter is not None:
+        exporter.stop()
+    supernova.close()
+
+# The interface is wrapped to retry failed transfers
+i3c = RetryingI3C(interface, bus_voltage = 3300)
 
 # Setting up I3C bus parameters and initializing the I3C bus
 print("Setting up I3C bus parameters and initializing the I3C bus")
@@ -30,82 +61,47 @@ i3c.set_parameters(I3cPushPullTransferRate.PUSH_PULL_3_75_MHZ, I2cTransferRate._
 
 ## Send the data via I3C
 print("Start the file transfer")
-# Define the value to the 2-byte address auxiliary function
-def number_to_bytes(num):
-    # Ensure the number fits within 2 bytes
-    if num < 0 or num > 0xFFFF:
-        raise ValueError("Number out of range for 2 bytes")
-
-    # Convert the number to a 2-byte array
-    byte1 = (num >> 8) & 0xFF  # MSB
-    byte2 = num & 0xFF         # LSB
+# The FRAM is driven through a memory device: its profile gives the capacity, the 2-byte
+# subaddress and the absence of write pages, so the file is sent in the largest chunks
+# the Supernova accepts (64 bytes), each one starting at its own subaddress.
+I2C_FRAM_ADDRESS = 0x50
 
-    return [byte1, byte2]
+fram = MemoryDevice(i3c, I2C_FRAM_ADDRESS, FRAM_MB85RC256V, TransferMode.I2C_MODE)
 
-# Write the file contents via I3C to the I2C FRAM target
-# Initialize variables
-package_size = 64
 file_length = len(file_bytes)
-total_packages = (file_length + package_size - 1) // package_size  # Total packages needed
-
-I2C_FRAM_ADDRESS = 0x50
 
-# Load and send 64-byte arrays
-for i in range(total_packages):
-    start = i * package_size
-    end = start + package_size
-
-    # Convert the starting position to a 2-byte array
-    subaddress_array = number_to_bytes(start) 
-    
-    # Section the text file into a package_size section list
-    bytes_to_send = list(file_bytes[start:end])
-
-    # Send the bytes_to_send via I3C 
-    (success, _) = i3c.write(target_address = I2C_FRAM_ADDRESS, mode = TransferMode.I2C_MODE, subaddress = subaddress_array, buffer= bytes_to_send)
-    
-    # Handle errors while writing the 
-    if not success:
-        # Handle the write failure (e.g., retry or abort)
-        print("I2C write failed!")
-        break
+# A failed run reports the offset to pass with --start-offset to resume the transfer
+start_offset = args.start_offset
+if not 0 <= start_offset <= file_length:
+    print(f"--start-offset must be between 0 and the file length ({file_length})")
+    close()
+    sys.exit(2)
+
+# Failed chunks are retried with exponential backoff and the bus is re-initialized
+# after repeated failures.
+try:
+    fram.write(start_offset, file_bytes[start_offset:])
+except TransferError as error:
+    print(f"I2C write failed! Run again with --start-offset {error.offset} to resume the transfer")
+    print(error)
+    close()
+    sys.exit(1)
 print("Finished the file transfer")
 
-# Retrieve the FRAM data and store a new text file
-print("Move the I2C FRAM memory pointer to address [0x00, 0x00]")
-# Move the I2C FRAM memory pointer to address [0x00, 0x00], which is the starting address of the previously stored text file data
-(success, _) = i3c.write(target_address = I2C_FRAM_ADDRESS, mode = TransferMode.I2C_MODE,subaddress = [0x00, 0x00], buffer= [])
-
 # Read 30KB worth of data from the I2C FRAM
 print("Start the FRAM read")
-# Initialize variables
-total_bytes_to_read = file_length
-read_size = 250
-bytes_read = 0
-read_data = bytearray()  # To store the data read from  the I2C FRAM
-
-# Loop to read data in 250-byte sections
-while bytes_read < total_bytes_to_read:
-    # Calculate the remaining bytes
-    remaining_bytes = total_bytes_to_read - bytes_read
-
-    # Calculate the amount of bytes to read
-    bytes_to_read = min(read_size, remaining_bytes)  
-    
-    # Read the I2C FRAM memory
-    success, data = i3c.read(target_address = I2C_FRAM_ADDRESS,  mode = TransferMode.I2C_MODE, length = bytes_to_read , subaddress = [])
-    
-    if success:
-        # Append the data to the complete read_data bytearray
-        read_data.extend(data)
-        
-        # Update the count of bytes read
-        bytes_read += len(data)
-    else:
-        # Handle the read failure (e.g., retry or abort)
-        print("I2C read failed!")
-        break
+# Read the I2C FRAM memory in 250-byte sections. Every section sets the memory pointer
+# with its own 2-byte subaddress, so a retried read always starts at the right position.
+# The data just written is in the read cache, read the FRAM itself to check the transfer.
+try:
+    read_data = fram.read_uncached(0, file_length)
+except TransferError as error:
+    print(f"I2C read failed at offset {error.offset}!")
+    print(error)
+    close()
+    sys.exit(1)
 print("Finished the FRAM read")
+print(f"{fram.transactions} I2C transactions")
 
 # Store the read data in the "I2C_Read_Binho_Supernova_Demo.txt" file
 print("Store the read data in the 'I2C_Read_Binho_Supernova_Demo.txt' file")
@@ -113,4 +109,15 @@ print("Store the read data in the 'I2C_Read_Binho_Supernova_Demo.txt' file")
 output_file = "./I2C_Read_Binho_Supernova_Demo.txt"
 with open(output_file, "w") as file:
     # Convert the bytearray to a string and write to the file
-    file.write(read_data.decode('utf-8'))
\ No newline at end of file
+    file.write(read_data.decode('utf-8'))
+
+# Keep serving the final values until the user stops the script
+if exporter is not None:
+    print("Transfer done, press Ctrl+C to stop serving the metrics")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+close()
@@ -0,0 +1,243 @@
+'''
+Throughput benchmarks of the drivers, the decode path and the memory transfers, with a
+regression gate.
+
+Example:
+    python run_benchmarks.py
+    python run_benchmarks.py --baseline 1a2b3c4 --threshold 0.03
+
+Every benchmark runs against the simulated Supernova with a fixed transaction latency, so
+the results only depend on the host side code. The results are stored per commit in a
+SQLite file and compared with a baseline run: by default the latest run of another commit,
+or the latest run of the commit given with `--baseline`. A benchmark flagged as a
+regression is measured again before failing, and the script exits with status 1 when any
+benchmark still regressed.
+'''
+import argparse
+import os
+import random
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from supernova_tools.benchmark import (DEFAULT_NOISE_FACTOR, DEFAULT_NOISE_RUNS, DEFAULT_THRESHOLD, ResultsStore, compare,
+                                       current_commit, rate, run_benchmark)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks.sqlite")
+
+# Fixed latency of every simulated transaction, in seconds
+LATENCY = 50e-6
+
+# Minimum duration of one measurement, in seconds
+DEFAULT_MIN_TIME = 0.2
+
+DEFAULT_REPEATS = 7
+
+# Times a benchmark flagged as a regression is measured again before failing
+DEFAULT_REMEASURE = 1
+
+# Size of the images written to and read from the simulated memories
+FRAM_IMAGE_SIZE = 8 * 1024
+EEPROM_IMAGE_SIZE = 2 * 1024
+EEPROM_ADDRESSES = (0x50, 0x51, 0x52, 0x53)
+
+# Number of raw samples converted per measurement of the decode benchmarks
+DECODE_SAMPLES = 4096
+
+def open_bus(memories=()):
+    '''
+    Simulated Supernova with the default sensors plus `memories`, (address, profile) pairs.
+    Returns the wrapped I3C interface.
+    '''
+    from supernova_tools.simulated import SimulatedMemory, SimulatedSupernovaDevice
+    from supernova_tools.transport import RetryingI3C
+
+    device = SimulatedSupernovaDevice(LATENCY)
+    for (address, profile) in memories:
+        device.i3c.add_device(SimulatedMemory(address, profile))
+    device.open()
+    i3c = RetryingI3C(device.create_interface("i3c.controller"))
+    i3c.init_bus(3300)
+    return i3c
+
+def open_sensor(name):
+    i3c = open_bus()
+    if name == "bmi323":
+        from Bosch_BMI323.BMI323 import BMI323
+        sensor = BMI323(i3c)
+    else:
+        from STMicroelectronics_LSM6DSV.LSM6DSV import LSM6DSV
+        sensor = LSM6DSV(i3c)
+    sensor.init_device()
+    sensor.set_calibration([0.01, -0.02, 0.03], [0.5, -0.5, 0.25])
+    return sensor
+
+def raw_samples(count):
+    generator = random.Random(0)
+    return [[generator.randint(-32768, 32767) for _ in range(6)] for _ in range(count)]
+
+# Every benchmark: name, unit, higher is better, setup returning the measurement function.
+# Measurement functions take the minimum measurement time.
+
+def sensor_read(name):
+    def setup():
+        sensor = open_sensor(name)
+        return lambda min_time: rate(sensor.read, 1, min_time)
+    return setup
+
+def transaction_time():
+    # read_raw is a single transaction
+    sensor = open_sensor("bmi323")
+    return lambda min_time: 1e6 / rate(sensor.read_raw, 1, min_time)
+
+def decode_single():
+    plan = open_sensor("bmi323").conversion_plan()
+    samples = raw_samples(DECODE_SAMPLES)
+    def convert_all():
+        for sample in samples:
+            plan.convert(sample)
+    return lambda min_time: rate(convert_all, len(samples), min_time)
+
+def decode_batch():
+    import numpy as np
+
+    plan = open_sensor("bmi323").conversion_plan()
+    samples = np.array(raw_samples(DECODE_SAMPLES), dtype=np.int16)
+    return lambda min_time: rate(lambda: plan.convert_batch(samples), len(samples), min_time)
+
+def fram_memory(cache):
+    from supernova_tools.memory_device import FRAM_MB85RC256V, MemoryDevice
+
+    i3c = open_bus([(0x50, FRAM_MB85RC256V)])
+    return MemoryDevice(i3c, 0x50, FRAM_MB85RC256V, cache=cache)
+
+def fram_write():
+    memory = fram_memory(cache=False)
+    image = random.Random(1).randbytes(FRAM_IMAGE_SIZE)
+    return lambda min_time: rate(lambda: memory.write(0, image), len(image), min_time)
+
+def fram_read():
+    memory = fram_memory(cache=False)
+    memory.write(0, random.Random(1).randbytes(FRAM_IMAGE_SIZE))
+    return lambda min_time: rate(lambda: memory.read_uncached(0, FRAM_IMAGE_SIZE), FRAM_IMAGE_SIZE, min_time)
+
+def eeprom_batch_program():
+    from supernova_tools.batch_programmer import BatchProgrammer
+    from supernova_tools.memory_device import EEPROM_24LC256, MemoryDevice
+
+    i3c = open_bus([(address, EEPROM_24LC256) for address in EEPROM_ADDRESSES])
+    programmer = BatchProgrammer([MemoryDevice(i3c, address, EEPROM_24LC256, cache=False) for address in EEPROM_ADDRESSES])
+    image = random.Random(2).randbytes(EEPROM_IMAGE_SIZE)
+    amount = len(image) * len(EEPROM_ADDRESSES)
+    return lambda min_time: rate(lambda: programmer.program(image, verify=False), amount, min_time)
+
+BENCHMARKS = (
+    ("bmi323_read", "samples/s", True, sensor_read("bmi323")),
+    ("lsm6dsv_read", "samples/s", True, sensor_read("lsm6dsv")),
+    ("i3c_transaction", "us/transaction", False, transaction_time),
+    ("decode_single", "samples/s", True, decode_single),
+    ("decode_batch", "samples/s", True, decode_batch),
+    ("fram_write", "bytes/s", True, fram_write),
+    ("fram_read", "bytes/s", True, fram_read),
+    ("eeprom_batch_program", "bytes/s", True, eeprom_batch_program),
+)
+
+def format_value(value):
+    return f"{value:,.1f}" if value < 1000 else f"{value:,.0f}"
+
+def run(benchmarks, repeats, min_time):
+    results = []
+    for (name, unit, higher_is_better, setup) in benchmarks:
+        measure = setup()
+        result = run_benchmark(name, lambda: measure(min_time), unit, higher_is_better, repeats)
+        print(f"{name:<22} {format_value(result.median):>14} {unit:<15} +-{100 * result.relative_noise():.1f}%")
+        results.append(result)
+    return results
+
+def print_comparisons(comparisons, baseline_commit):
+    print(f"\nCompared with {baseline_commit[:12]}:")
+    for comparison in comparisons:
+        status = "REGRESSION" if comparison.regression else "ok"
+        print(f"{comparison.name:<22} {format_value(comparison.baseline):>14} -> {format_value(comparison.current):>14} "
+              f"{comparison.unit:<15} {100 * comparison.change:+6.1f}% (noise {100 * comparison.noise:.1f}%) {status}")
+
+def print_history(store, name):
+    for (commit_id, created, median) in store.history(name):
+        print(f"{commit_id[:12]}  {created}  {format_value(median)}")
+
+def parse_args(argv=None):
+    names = [benchmark[0] for benchmark in BENCHMARKS]
+    parser = argparse.ArgumentParser(prog="run-benchmarks", description="Run the throughput benchmarks and fail on regressions")
+    parser.add_argument("--db", default=DEFAULT_DATABASE, help="SQLite file storing the results")
+    parser.add_argument("--baseline", help="commit to compare with (a prefix is enough), the latest run of another commit by default")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="relative change of the median considered a regression")
+    parser.add_argument("--noise-factor", type=float, default=DEFAULT_NOISE_FACTOR, help="a regression must also exceed this many times the measurement noise")
+    parser.add_argument("--noise-runs", type=int, default=DEFAULT_NOISE_RUNS, help="stored runs used to estimate the run-to-run noise")
+    parser.add_argument("--remeasure", type=int, default=DEFAULT_REMEASURE, help="times a benchmark flagged as a regression is measured again before failing")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="measurements per benchmark")
+    parser.add_argument("--min-time", type=float, default=DEFAULT_MIN_TIME, help="minimum duration of one measurement in seconds")
+    parser.add_argument("--only", nargs="+", choices=names, metavar="NAME", help="run only these benchmarks")
+    parser.add_argument("--no-store", action="store_true", help="do not store the results")
+    parser.add_argument("--history", choices=names, metavar="NAME", help="print the stored medians of a benchmark and exit")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = ResultsStore(args.db)
+
+    try:
+        if args.history:
+            print_history(store, args.history)
+            return 0
+
+        (commit_id, dirty) = current_commit(ROOT)
+        benchmarks = [benchmark for benchmark in BENCHMARKS if not args.only or benchmark[0] in args.only]
+        print(f"Commit {commit_id[:12]}{' (uncommitted changes)' if dirty else ''}, {LATENCY * 1e6:g} us simulated latency\n")
+        results = {result.name: result for result in run(benchmarks, args.repeats, args.min_time)}
+
+        # Look the baseline up before storing this run, which could otherwise become its own baseline
+        if args.baseline:
+            baseline_run = store.latest_run(commit_id=args.baseline)
+        else:
+            baseline_run = store.latest_run(exclude_commit=commit_id)
+
+        comparisons = []
+        if baseline_run is not None:
+            baseline = store.load(baseline_run)
+            run_noise = store.run_noise(results, args.noise_runs)
+            comparisons = compare(baseline, results, args.threshold, args.noise_factor, run_noise)
+            for _ in range(args.remeasure):
+                flagged = [benchmark for benchmark in benchmarks if benchmark[0] in
+                           {comparison.name for comparison in comparisons if comparison.regression}]
+                if not flagged:
+                    break
+                print(f"\nMeasuring again: {', '.join(benchmark[0] for benchmark in flagged)}")
+                results.update((result.name, result) for result in run(flagged, args.repeats, args.min_time))
+                comparisons = compare(baseline, results, args.threshold, args.noise_factor, run_noise)
+
+        if not args.no_store:
+            store.save(commit_id, dirty, results.values())
+            if dirty:
+                print("\nResults stored, but runs with uncommitted changes are never used as baseline")
+
+        if baseline_run is None:
+            if args.baseline:
+                print(f"\nNo stored run of commit {args.baseline}")
+                return 2
+            print("\nNo baseline run stored yet, nothing to compare with")
+            return 0
+
+        print_comparisons(comparisons, store.run_commit(baseline_run))
+    finally:
+        store.close()
+
+    regressions = [comparison for comparison in comparisons if comparison.regression]
+    if regressions:
+        print(f"\nPERFORMANCE REGRESSION in {len(regressions)} benchmark(s): "
+              f"{', '.join(comparison.name for comparison in regressions)}", file=sys.stderr)
+        return 1
+    print("\nNo regression")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+'''
+Shared helpers for the Supernova examples.
+
+The example folders import this package by adding the repository root to
+`sys.path`, the same way the combined LSM6DSV and BMI323 demo imports the drivers.
+'''
@@ -0,0 +1,247 @@
+'''
+Timestamp alignment and resampling of several IMU streams onto a common timebase.
+
+Every read carries two times: the host time of the read and the sensor time counter read
+with the sample (`read_raw_ready_timed()` of the drivers). Host times include the bus and
+USB latency; the counters are free-running and count on the sensor oscillator, which
+drifts from the host clock by up to a few hundred ppm. `SensorClock` maps sensor times to
+the host timebase:
+- the rate ratio (drift) is a least squares fit of host time against sensor time over a
+  sliding window,
+- the offset is the lower envelope of host minus mapped sensor time, i.e. the reads with
+  the least latency.
+Reading faster than the ODR returns the same sample again, with a later sensor time.
+Repeated reads are recognized by the data-ready flags read with the sample (or, without
+them, by values identical to the previous read) and dropped, so every sample is timed by
+its first read, the closest to the instant it was produced.
+
+`StreamAligner` keeps a short buffer per stream, resamples all the streams at a common
+rate with vectorized linear or cubic interpolation and returns merged rows as soon as
+every stream covers them. Consumed samples are discarded, so memory stays bounded
+whatever the length of the capture.
+'''
+from collections import deque
+
+import numpy as np
+
+# Number of (sensor time, host time) pairs kept to estimate each sensor clock
+DEFAULT_CLOCK_WINDOW = 2048
+
+# Sensor time counters of the BMI323 and LSM6DSV are 32-bit
+SENSOR_TIME_BITS = 32
+
+INTERPOLATION_METHODS = ("linear", "cubic")
+
+def unwrap_ticks(ticks, last=None, bits=SENSOR_TIME_BITS):
+    '''
+    Unwrap a sequence of sensor time counters into a monotonic int64 array. `last` is the
+    last unwrapped value of the previous call, to continue across batches.
+    '''
+    ticks = np.asarray(ticks, dtype=np.int64)
+    if not len(ticks):
+        return ticks
+    period = 1 << bits
+    base = 0 if last is None else last - last % period
+    previous = ticks[0] if last is None else last % period
+    # Every step backwards in the counter is a wrap around
+    wraps = np.cumsum(np.diff(ticks, prepend=previous) < 0)
+    return ticks + base + wraps * period
+
+class SensorClock:
+    '''
+    Mapping from the sensor time counter of one sensor to host time in seconds.
+    '''
+    def __init__(self, resolution, window=DEFAULT_CLOCK_WINDOW, bits=SENSOR_TIME_BITS):
+        self.resolution = resolution
+        self.bits = bits
+        self.sensor_times = deque(maxlen=window)
+        self.host_times = deque(maxlen=window)
+        self.last_ticks = None
+        # host = offset + scale * sensor_seconds
+        self.scale = 1.0
+        self.offset = None
+
+    def unwrap(self, ticks):
+        '''
+        Unwrapped sensor times in seconds of a batch of counters, in read order.
+        '''
+        ticks = unwrap_ticks(ticks, self.last_ticks, self.bits)
+        if len(ticks):
+            self.last_ticks = int(ticks[-1])
+        return ticks * self.resolution
+
+    def update(self, sensor_seconds, host_times):
+        '''
+        Add pairs of unwrapped sensor time and host time of the same reads, and refit the mapping.
+        '''
+        self.sensor_times.extend(np.asarray(sensor_seconds, dtype=np.float64).tolist())
+        self.host_times.extend(np.asarray(host_times, dtype=np.float64).tolist())
+
+        sensor = np.fromiter(self.sensor_times, dtype=np.float64, count=len(self.sensor_times))
+        host = np.fromiter(self.host_times, dtype=np.float64, count=len(self.host_times))
+        sensor_mean = sensor.mean()
+        spread = np.sum((sensor - sensor_mean) ** 2)
+        if spread > 0:
+            # Centered fit, the absolute times are too large for a direct one
+            self.scale = float(np.sum((sensor - sensor_mean) * (host - host.mean())) / spread)
+        self.offset = float(np.min(host - self.scale * sensor))
+
+    @property
+    def drift_ppm(self):
+        '''
+        How much faster the sensor clock runs than the host clock, in ppm.
+        '''
+        return (1.0 / self.scale - 1.0) * 1e6
+
+    def to_host(self, sensor_seconds):
+        return self.offset + self.scale * np.asarray(sensor_seconds, dtype=np.float64)
+
+def interpolate_linear(times, values, grid):
+    '''
+    Linear interpolation of the (N, C) `values` sampled at increasing `times` on `grid`.
+    '''
+    index = np.clip(np.searchsorted(times, grid, side="right") - 1, 0, len(times) - 2)
+    t0 = times[index]
+    u = ((grid - t0) / (times[index + 1] - t0))[:, None]
+    return values[index] * (1.0 - u) + values[index + 1] * u
+
+def interpolate_cubic(times, values, grid):
+    '''
+    Cubic Hermite interpolation with finite difference slopes, which handles the irregular
+    sample times left by jitter or missed samples.
+    '''
+    slopes = np.empty_like(values)
+    slopes[1:-1] = (values[2:] - values[:-2]) / (times[2:] - times[:-2])[:, None]
+    slopes[0] = (values[1] - values[0]) / (times[1] - times[0])
+    slopes[-1] = (values[-1] - values[-2]) / (times[-1] - times[-2])
+
+    index = np.clip(np.searchsorted(times, grid, side="right") - 1, 0, len(times) - 2)
+    t0 = times[index]
+    step = (times[index + 1] - t0)[:, None]
+    u = (grid[:, None] - t0[:, None]) / step
+    u2 = u * u
+    u3 = u2 * u
+    return ((2 * u3 - 3 * u2 + 1) * values[index] + (u3 - 2 * u2 + u) * step * slopes[index]
+            + (-2 * u3 + 3 * u2) * values[index + 1] + (u3 - u2) * step * slopes[index + 1])
+
+def interpolate(times, values, grid, method="linear"):
+    if method == "linear":
+        return interpolate_linear(times, values, grid)
+    if method == "cubic":
+        return interpolate_cubic(times, values, grid)
+    raise ValueError(f"Unknown interpolation method '{method}', use one of: {', '.join(INTERPOLATION_METHODS)}")
+
+class StreamBuffer:
+    '''
+    Pending samples of one stream: unwrapped sensor times in seconds and (N, C) values.
+    '''
+    def __init__(self, clock, columns):
+        self.clock = clock
+        self.sensor_times = np.empty(0)
+        self.values = np.empty((0, columns))
+        self.duplicates = 0
+        # Values of the last read, to detect repeats without data-ready flags
+        self.last_values = None
+
+    def new_samples(self, values, ready=None):
+        '''
+        Mask of the reads that returned a new sample: the data-ready flags of the reads, or
+        the reads whose values differ from the previous read when `ready` is None.
+        '''
+        if ready is not None:
+            keep = np.asarray(ready, dtype=bool)
+        else:
+            previous = values[:1] + 1.0 if self.last_values is None else self.last_values[None, :]
+            keep = np.any(np.diff(values, axis=0, prepend=previous) != 0, axis=1)
+        self.last_values = values[-1].copy()
+        self.duplicates += int(len(keep) - np.count_nonzero(keep))
+        return keep
+
+    def append(self, sensor_times, values):
+        self.sensor_times = np.concatenate((self.sensor_times, sensor_times))
+        self.values = np.concatenate((self.values, values))
+
+    def host_times(self):
+        return self.clock.to_host(self.sensor_times)
+
+    def discard_before(self, index):
+        self.sensor_times = self.sensor_times[index:]
+        self.values = self.values[index:]
+
+class StreamAligner:
+    '''
+    Resample `len(resolutions)` streams at `rate` Hz on the host timebase. `resolutions`
+    are the sensor time resolutions in seconds (`sensor.sensor_time_resolution`) and every
+    stream has `columns` values per sample. Output rows are the host time followed by the
+    values of every stream, in stream order.
+    '''
+    def __init__(self, resolutions, rate, method="linear", columns=6, clock_window=DEFAULT_CLOCK_WINDOW):
+        if method not in INTERPOLATION_METHODS:
+            raise ValueError(f"Unknown interpolation method '{method}', use one of: {', '.join(INTERPOLATION_METHODS)}")
+        self.period = 1.0 / rate
+        self.method = method
+        self.columns = columns
+        self.clocks = [SensorClock(resolution, clock_window) for resolution in resolutions]
+        self.streams = [StreamBuffer(clock, columns) for clock in self.clocks]
+        self.next_time = None
+        self.rows_emitted = 0
+
+    def push(self, stream, ticks, values, host_times, ready=None):
+        '''
+        Add reads of stream number `stream`: sensor time counters, (N, columns) values, the
+        host times of the reads and optionally their data-ready flags.
+        '''
+        if not len(ticks):
+            return
+        clock = self.clocks[stream]
+        buffer = self.streams[stream]
+        sensor_times = clock.unwrap(ticks)
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.columns)
+        keep = buffer.new_samples(values, ready)
+        if not keep.any():
+            return
+        # The first read of a sample is the closest to the instant it was taken
+        clock.update(sensor_times[keep], np.asarray(host_times, dtype=np.float64)[keep])
+        buffer.append(sensor_times[keep], values[keep])
+
+    def pop(self):
+        '''
+        Return the merged rows, as an (M, 1 + streams x columns) array, of every output time
+        that all the streams cover, and discard the samples no longer needed.
+        '''
+        # Cubic interpolation also needs the sample after the interval for its slope
+        margin = 2 if self.method == "cubic" else 1
+        if any(len(stream.sensor_times) < margin + 1 for stream in self.streams):
+            return np.empty((0, 1 + len(self.streams) * self.columns))
+
+        times = [stream.host_times() for stream in self.streams]
+        if self.next_time is None:
+            self.next_time = max(stream_times[0] for stream_times in times)
+        end = min(stream_times[-margin] for stream_times in times)
+
+        count = int(np.floor((end - self.next_time) / self.period)) + 1 if end >= self.next_time else 0
+        if count <= 0:
+            return np.empty((0, 1 + len(self.streams) * self.columns))
+        grid = self.next_time + self.period * np.arange(count)
+
+        merged = [grid[:, None]]
+        for (stream, stream_times) in zip(self.streams, times):
+            merged.append(interpolate(stream_times, stream.values, grid, self.method))
+            # Keep the samples that the next output times may still interpolate from
+            stream.discard_before(max(0, int(np.searchsorted(stream_times, grid[-1], side="right")) - margin))
+
+        self.next_time = grid[-1] + self.period
+        self.rows_emitted += count
+        return np.hstack(merged)
+
+    def drift_ppm(self):
+        '''
+        Estimated drift of every sensor clock against the host clock, in ppm.
+        '''
+        return [clock.drift_ppm for clock in self.clocks]
+
+    def duplicates(self):
+        '''
+        Number of repeated samples dropped per stream (reads faster than the ODR).
+        '''
+        return [stream.duplicates for stream in self.streams]
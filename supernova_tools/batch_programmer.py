@@ -0,0 +1,142 @@
+'''
+Programming the same image into several I2C memories behind one Supernova.
+
+Writing the devices one after the other leaves the bus idle during every write cycle of
+an EEPROM (about 5 ms per page). `BatchProgrammer` interleaves the page writes instead:
+it issues the next page to every device that is ready and only waits when all of them
+are busy, so the write cycles of the devices overlap. FRAMs have no write cycle and are
+simply written round-robin.
+
+Every device is then verified by reading it back, bypassing the read cache. A device
+that fails is reported with the offset where it stopped and does not stop the others.
+'''
+import time
+
+from supernova_tools.memory_device import write_segments
+from supernova_tools.transport import TransferError
+
+class DeviceReport:
+    '''
+    Outcome of programming one device. `error_offset` is the offset of the first byte not
+    written or not matching the image, None when the device was programmed correctly.
+    '''
+    def __init__(self, address):
+        self.address = address
+        self.bytes_written = 0
+        self.write_time = 0.0
+        self.verify_time = 0.0
+        self.error = None
+        self.error_offset = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def throughput(self):
+        '''
+        Bytes written per second, from the start of the batch to the last write of the device.
+        '''
+        return self.bytes_written / self.write_time if self.write_time else 0.0
+
+class BatchReport:
+    def __init__(self, devices, image_size):
+        self.devices = devices
+        self.image_size = image_size
+        self.write_time = 0.0
+        self.verify_time = 0.0
+
+    @property
+    def ok(self):
+        return all(device.ok for device in self.devices)
+
+    def throughput(self):
+        '''
+        Aggregate bytes written per second over all the devices.
+        '''
+        written = sum(device.bytes_written for device in self.devices)
+        return written / self.write_time if self.write_time else 0.0
+
+    def summary(self):
+        lines = []
+        for device in self.devices:
+            status = "OK" if device.ok else f"FAILED at offset {device.error_offset}: {device.error}"
+            lines.append(f"0x{device.address:02x}: {device.bytes_written} bytes in {device.write_time:.3f} s "
+                         f"({device.throughput() / 1024:.1f} KB/s), verified in {device.verify_time:.3f} s, {status}")
+        lines.append(f"Total: {len(self.devices)} devices x {self.image_size} bytes in {self.write_time:.3f} s "
+                     f"({self.throughput() / 1024:.1f} KB/s), verified in {self.verify_time:.3f} s")
+        return "\n".join(lines)
+
+class BatchProgrammer:
+    '''
+    Programs `devices`, a list of MemoryDevice on the same bus.
+    '''
+    def __init__(self, devices, clock=time.perf_counter):
+        self.devices = devices
+        self.clock = clock
+
+    def program(self, image, offset=0, verify=True):
+        '''
+        Write `image` at `offset` into every device, then verify them. Returns a BatchReport.
+        '''
+        image = bytes(image)
+        view = memoryview(image)
+        reports = [DeviceReport(device.address) for device in self.devices]
+        report = BatchReport(reports, len(image))
+
+        # Segments still to write for every device, consumed front to back
+        pending = []
+        for device in self.devices:
+            device.check_range(offset, len(image))
+            segments = write_segments(offset, len(image), device.profile.page_size, device.max_write_transfer)
+            pending.append(list(reversed(segments)))
+
+        start = self.clock()
+        active = [index for (index, segments) in enumerate(pending) if segments]
+        while active:
+            issued = False
+            for index in active:
+                device = self.devices[index]
+                if device.busy():
+                    continue
+                (segment_offset, size) = pending[index].pop()
+                try:
+                    device.write_segment(segment_offset, view[segment_offset - offset:segment_offset - offset + size])
+                except TransferError as error:
+                    reports[index].error = error
+                    reports[index].error_offset = segment_offset
+                    pending[index] = []
+                    continue
+                reports[index].bytes_written += size
+                reports[index].write_time = self.clock() - start
+                issued = True
+
+            active = [index for index in active if pending[index]]
+            if not issued and active:
+                # Every remaining device is in its write cycle, wait for the first one to finish
+                remaining = min(self.devices[index].ready_at for index in active) - self.clock()
+                if remaining > 0:
+                    time.sleep(remaining)
+
+        for device in self.devices:
+            device.wait_ready()
+        report.write_time = self.clock() - start
+
+        if verify:
+            start = self.clock()
+            for (device, device_report) in zip(self.devices, reports):
+                if not device_report.ok:
+                    continue
+                verify_start = self.clock()
+                try:
+                    mismatch = device.verify(offset, image)
+                except TransferError as error:
+                    device_report.error = error
+                    device_report.error_offset = error.offset
+                else:
+                    if mismatch is not None:
+                        device_report.error = "read back data does not match the image"
+                        device_report.error_offset = mismatch
+                device_report.verify_time = self.clock() - verify_start
+            report.verify_time = self.clock() - start
+
+        return report
@@ -0,0 +1,243 @@
+'''
+Benchmark results store and regression gate.
+
+A benchmark is a function returning one measurement (samples/s, us/transaction, bytes/s).
+`run_benchmark` repeats it and keeps every value, `ResultsStore` saves the values per
+commit in a local SQLite file, and `compare` checks the current run against a baseline
+run.
+
+A benchmark is flagged as a regression when its median got worse than the baseline median
+by more than `threshold` (relative) and by more than `noise_factor` times the measurement
+noise. The noise is the larger of the spread within the two runs (median absolute
+deviation of their repetitions) and the spread of the median from one run to the next,
+estimated over the stored runs: a run can be uniformly slower than the previous one (CPU
+frequency, other processes) while its repetitions agree. The second condition keeps noisy
+benchmarks from failing on random variation, the first one keeps very stable benchmarks
+from failing on insignificant changes.
+'''
+import datetime
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+
+# Default relative change of the median considered a regression
+DEFAULT_THRESHOLD = 0.05
+
+# Default number of noise standard deviations a change must exceed
+DEFAULT_NOISE_FACTOR = 3.0
+
+# Scale from median absolute deviation to standard deviation for normal data
+MAD_TO_SIGMA = 1.4826
+
+# Stored runs used to estimate the run-to-run noise of every benchmark
+DEFAULT_NOISE_RUNS = 10
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    commit_id TEXT NOT NULL,
+    dirty INTEGER NOT NULL,
+    created TEXT NOT NULL,
+    host TEXT NOT NULL,
+    python TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    benchmark TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    higher_is_better INTEGER NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_run ON results(run_id);
+'''
+
+class BenchmarkResult:
+    '''
+    Values of the repetitions of one benchmark.
+    '''
+    def __init__(self, name, unit, higher_is_better, values):
+        self.name = name
+        self.unit = unit
+        self.higher_is_better = higher_is_better
+        self.values = list(values)
+
+    @property
+    def median(self):
+        return statistics.median(self.values)
+
+    def relative_noise(self):
+        '''
+        Standard deviation estimated from the median absolute deviation, relative to the median.
+        '''
+        median = self.median
+        if len(self.values) < 2 or median == 0:
+            return 0.0
+        mad = statistics.median(abs(value - median) for value in self.values)
+        return MAD_TO_SIGMA * mad / abs(median)
+
+def run_to_run_noise(medians):
+    '''
+    Standard deviation of the median of a benchmark between runs, relative to the median,
+    from the median absolute difference between consecutive runs, so a real change between
+    two commits counts as one outlier instead of inflating the estimate. 0 with fewer than
+    three runs.
+    '''
+    if len(medians) < 3:
+        return 0.0
+    center = statistics.median(medians)
+    if center == 0:
+        return 0.0
+    differences = [abs(later - earlier) for (earlier, later) in zip(medians, medians[1:])]
+    # The difference of two runs has sqrt(2) times the noise of one run
+    return MAD_TO_SIGMA * statistics.median(differences) / 2 ** 0.5 / abs(center)
+
+def run_benchmark(name, function, unit, higher_is_better=True, repeats=7, warmup=1):
+    '''
+    Call `function` `warmup` + `repeats` times and keep the last `repeats` measurements.
+    '''
+    for _ in range(warmup):
+        function()
+    return BenchmarkResult(name, unit, higher_is_better, [function() for _ in range(repeats)])
+
+def rate(function, amount, min_time=0.2):
+    '''
+    Call `function()`, which processes `amount` units (samples, bytes, ...), for at least
+    `min_time` seconds and return the units processed per second.
+    '''
+    clock = time.perf_counter
+    count = 0
+    start = clock()
+    elapsed = 0.0
+    while elapsed < min_time:
+        function()
+        count += 1
+        elapsed = clock() - start
+    return count * amount / elapsed
+
+def current_commit(path="."):
+    '''
+    Return (commit id, dirty) of the git checkout at `path`, ("unknown", True) outside git.
+    '''
+    try:
+        commit_id = subprocess.run(["git", "rev-parse", "HEAD"], cwd=path, capture_output=True, text=True,
+                                   check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=path,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return ("unknown", True)
+    return (commit_id, bool(status.strip()))
+
+class ResultsStore:
+    '''
+    Benchmark runs stored in the SQLite file `path`.
+    '''
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+    def save(self, commit_id, dirty, results):
+        '''
+        Store a run and return its id.
+        '''
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (commit_id, dirty, created, host, python) VALUES (?, ?, ?, ?, ?)",
+                (commit_id, int(dirty), datetime.datetime.now().isoformat(timespec="seconds"), platform.node(),
+                 platform.python_version()))
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO results (run_id, benchmark, unit, higher_is_better, value) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, result.name, result.unit, int(result.higher_is_better), value)
+                 for result in results for value in result.values])
+        return run_id
+
+    def latest_run(self, commit_id=None, exclude_commit=None):
+        '''
+        Id of the latest clean run of `commit_id` (a prefix is enough), or of any commit but
+        `exclude_commit`. None when there is no such run.
+        '''
+        query = "SELECT id FROM runs WHERE dirty = 0"
+        parameters = []
+        if commit_id is not None:
+            query += " AND commit_id LIKE ?"
+            parameters.append(commit_id + "%")
+        if exclude_commit is not None:
+            query += " AND commit_id != ?"
+            parameters.append(exclude_commit)
+        row = self.connection.execute(query + " ORDER BY id DESC LIMIT 1", parameters).fetchone()
+        return None if row is None else row[0]
+
+    def run_commit(self, run_id):
+        return self.connection.execute("SELECT commit_id FROM runs WHERE id = ?", (run_id,)).fetchone()[0]
+
+    def load(self, run_id):
+        '''
+        Results of a run, as a dict of BenchmarkResult by benchmark name.
+        '''
+        results = {}
+        rows = self.connection.execute(
+            "SELECT benchmark, unit, higher_is_better, value FROM results WHERE run_id = ? ORDER BY rowid", (run_id,))
+        for (name, unit, higher_is_better, value) in rows:
+            if name not in results:
+                results[name] = BenchmarkResult(name, unit, bool(higher_is_better), [])
+            results[name].values.append(value)
+        return results
+
+    def history(self, benchmark, limit=20, clean_only=False):
+        '''
+        (commit id, created, median) of the last runs of `benchmark`, oldest first. With
+        `clean_only`, runs made with uncommitted changes are left out.
+        '''
+        rows = self.connection.execute(
+            "SELECT runs.id, runs.commit_id, runs.created, results.value FROM runs JOIN results ON results.run_id = runs.id "
+            "WHERE results.benchmark = ?" + (" AND runs.dirty = 0" if clean_only else "") + " ORDER BY runs.id",
+            (benchmark,)).fetchall()
+        runs = {}
+        for (run_id, commit_id, created, value) in rows:
+            runs.setdefault(run_id, (commit_id, created, []))[2].append(value)
+        return [(commit_id, created, statistics.median(values)) for (commit_id, created, values) in list(runs.values())[-limit:]]
+
+    def run_noise(self, benchmarks, runs=DEFAULT_NOISE_RUNS):
+        '''
+        Run-to-run noise of every benchmark over its last `runs` clean runs, as a dict of
+        relative standard deviations by benchmark name.
+        '''
+        return {name: run_to_run_noise([median for (_, _, median) in self.history(name, runs, clean_only=True)])
+                for name in benchmarks}
+
+    def close(self):
+        self.connection.close()
+
+class Comparison:
+    def __init__(self, name, unit, baseline, current, change, noise, regression):
+        self.name = name
+        self.unit = unit
+        self.baseline = baseline
+        self.current = current
+        # Relative change of the median, positive when better
+        self.change = change
+        self.noise = noise
+        self.regression = regression
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, noise_factor=DEFAULT_NOISE_FACTOR, run_noise=None):
+    '''
+    Compare two dicts of BenchmarkResult. Benchmarks missing from the baseline are skipped.
+    `run_noise` is the run-to-run noise by benchmark name, see ResultsStore.run_noise.
+    '''
+    run_noise = run_noise or {}
+    comparisons = []
+    for (name, result) in current.items():
+        reference = baseline.get(name)
+        if reference is None or reference.median == 0:
+            continue
+        change = (result.median - reference.median) / abs(reference.median)
+        if not result.higher_is_better:
+            change = -change
+        noise = (reference.relative_noise() ** 2 + result.relative_noise() ** 2) ** 0.5
+        # Both medians carry the run-to-run noise
+        noise = max(noise, 2 ** 0.5 * run_noise.get(name, 0.0))
+        regression = change < -threshold and -change > noise_factor * noise
+        comparisons.append(Comparison(name, result.unit, reference.median, result.median, change, noise, regression))
+    return comparisons
@@ -0,0 +1,269 @@
+'''
+Full IMU calibration for the BMI323 and LSM6DSV drivers.
+
+The accelerometer model corrects offset, scale and misalignment:
+
+    accel = M @ (measured - bias)
+
+where `measured` is the raw value times the resolution. It is fitted with linear least
+squares either against known orientations (six-position calibration) or, when the mount
+orientation is unknown, with an ellipsoid fit that only assumes the magnitude is 1 g.
+
+The gyroscope bias is modeled as a polynomial of the sensor temperature, fitted on the
+stationary windows collected during the accelerometer calibration plus, optionally, the
+windows of a temperature sweep: the sensor rests while it warms up after power-on or in a
+climate chamber, and a window is collected at regular intervals.
+
+The result is applied through `set_calibration()` of the drivers, so it is folded into the
+conversion plan and costs nothing per sample. It only needs to be re-applied when the
+temperature moves enough to change the gyroscope bias, see `ImuCalibration.update_temperature()`.
+'''
+import json
+import time
+
+import numpy as np
+
+from supernova_tools.conversion import compile_plan
+
+# Number of samples averaged for each orientation
+DEFAULT_WINDOW_SAMPLES = 200
+
+# Orientations of the six-position calibration and the gravity vector each one should measure in g
+SIX_POSITIONS = (
+    ("Z axis up", (0.0, 0.0, 1.0)),
+    ("Z axis down", (0.0, 0.0, -1.0)),
+    ("Y axis up", (0.0, 1.0, 0.0)),
+    ("Y axis down", (0.0, -1.0, 0.0)),
+    ("X axis up", (1.0, 0.0, 0.0)),
+    ("X axis down", (-1.0, 0.0, 0.0)),
+)
+
+# Number of orientations of the ellipsoid calibration, at least nine are needed
+DEFAULT_ELLIPSOID_ORIENTATIONS = 12
+MIN_ELLIPSOID_ORIENTATIONS = 9
+
+# Seconds between the windows of a temperature sweep
+DEFAULT_SWEEP_INTERVAL = 30.0
+
+# Minimum temperature span in degrees Celsius needed to fit a temperature-dependent gyroscope bias
+MIN_TEMPERATURE_SPAN = 2.0
+
+# Temperature change in degrees Celsius after which the gyroscope bias is updated
+TEMPERATURE_UPDATE_THRESHOLD = 0.5
+
+class StationaryWindow:
+    '''
+    Samples collected while the sensor does not move: accelerometer and gyroscope data in g
+    and dps without any calibration, as (N, 3) arrays, and the sensor temperature.
+    '''
+    def __init__(self, accel, gyro, temperature):
+        self.accel = accel
+        self.gyro = gyro
+        self.temperature = temperature
+
+def collect_window(sensor, samples=DEFAULT_WINDOW_SAMPLES):
+    '''
+    Read `samples` raw samples from an initialized sensor and convert them as a single batch,
+    ignoring the current calibration.
+    '''
+    plan = compile_plan(sensor.raw_layout, sensor.accel_res, sensor.gyro_res, (0.0, 0.0, 0.0), (0.0, 0.0, 0.0))
+
+    temperature_start = sensor.read_temperature()
+    raw = [sensor.read_raw() for _ in range(samples)]
+    temperature_end = sensor.read_temperature()
+
+    values = plan.convert_batch(raw)
+    return StationaryWindow(values[:, :3], values[:, 3:], (temperature_start + temperature_end) / 2.0)
+
+def temperature_sweep(sensor, duration, interval=DEFAULT_SWEEP_INTERVAL, samples=DEFAULT_WINDOW_SAMPLES, progress=None):
+    '''
+    Collect a stationary window every `interval` seconds for `duration` seconds while the
+    temperature of the resting sensor changes. `progress(window)` is called after each
+    window. Returns the windows.
+    '''
+    windows = []
+    start = time.monotonic()
+    while True:
+        windows.append(collect_window(sensor, samples))
+        if progress is not None:
+            progress(windows[-1])
+        next_window = start + len(windows) * interval
+        if next_window > start + duration:
+            return windows
+        time.sleep(max(0.0, next_window - time.monotonic()))
+
+def temperature_span(windows):
+    '''
+    Difference in degrees Celsius between the warmest and the coldest window.
+    '''
+    temperatures = [window.temperature for window in windows]
+    return max(temperatures) - min(temperatures)
+
+def fit_accel_six_position(windows, references):
+    '''
+    Fit bias and correction matrix from windows taken in known orientations, `references`
+    being the gravity vector in g expected for each window. At least four non-coplanar
+    orientations are needed; the six positions give a well-conditioned fit.
+
+    Solves references = A @ measured + t over all the samples at once, then M = A and
+    bias = -A^-1 @ t. Returns (bias, matrix, rms_residual_g).
+    '''
+    measured = np.concatenate([window.accel for window in windows])
+    targets = np.concatenate([np.broadcast_to(np.asarray(reference, dtype=np.float64), window.accel.shape)
+                              for (window, reference) in zip(windows, references)])
+
+    design = np.hstack([measured, np.ones((len(measured), 1))])
+    (solution, _, rank, _) = np.linalg.lstsq(design, targets, rcond=None)
+    if rank < 4:
+        raise ValueError("The orientations do not span the three axes, the accelerometer model cannot be fitted")
+
+    matrix = solution[:3].T
+    bias = -np.linalg.solve(matrix, solution[3])
+    residual = np.sqrt(np.mean((design @ solution - targets) ** 2))
+    return (bias, matrix, float(residual))
+
+def fit_accel_ellipsoid(windows):
+    '''
+    Fit bias and a symmetric correction matrix without knowing the orientations, assuming
+    every sample measures 1 g. Useful for tilted mounts; needs at least nine well spread
+    orientations. Returns (bias, matrix, rms_residual_g).
+
+    Solves the ellipsoid a^T Q a + 2 u^T a = 1 with linear least squares, then the center
+    gives the bias and the square root of the normalized Q the matrix.
+    '''
+    measured = np.concatenate([window.accel for window in windows])
+    (x, y, z) = measured.T
+    design = np.column_stack([x * x, y * y, z * z, 2 * x * y, 2 * x * z, 2 * y * z, 2 * x, 2 * y, 2 * z])
+    (p, _, rank, _) = np.linalg.lstsq(design, np.ones(len(measured)), rcond=None)
+    if rank < 9:
+        raise ValueError("Not enough distinct orientations to fit the accelerometer ellipsoid")
+
+    quadratic = np.array([[p[0], p[3], p[4]], [p[3], p[1], p[5]], [p[4], p[5], p[2]]])
+    bias = -np.linalg.solve(quadratic, p[6:9])
+    quadratic = quadratic / (1.0 + bias @ quadratic @ bias)
+
+    (eigenvalues, eigenvectors) = np.linalg.eigh(quadratic)
+    if np.any(eigenvalues <= 0):
+        raise ValueError("The accelerometer samples do not describe an ellipsoid, add more orientations")
+    matrix = eigenvectors @ np.diag(np.sqrt(eigenvalues)) @ eigenvectors.T
+
+    residual = np.sqrt(np.mean((np.linalg.norm((measured - bias) @ matrix.T, axis=1) - 1.0) ** 2))
+    return (bias, matrix, float(residual))
+
+class GyroTemperatureModel:
+    '''
+    Gyroscope bias as a polynomial of the temperature, one per axis. `coefficients` is a
+    (degree + 1, 3) array, highest power first as returned by numpy.polyfit.
+    '''
+    def __init__(self, coefficients):
+        self.coefficients = np.asarray(coefficients, dtype=np.float64).reshape(-1, 3)
+
+    def bias_at(self, temperature):
+        '''
+        Gyroscope bias in dps at `temperature` degrees Celsius.
+        '''
+        powers = temperature ** np.arange(len(self.coefficients) - 1, -1, -1)
+        return tuple(float(value) for value in powers @ self.coefficients)
+
+def fit_gyro_temperature(windows, degree=1):
+    '''
+    Fit the gyroscope bias against temperature over stationary windows. Falls back to a
+    constant bias when the windows do not cover MIN_TEMPERATURE_SPAN or are too few.
+    '''
+    temperatures = np.array([window.temperature for window in windows])
+    means = np.array([window.gyro.mean(axis=0) for window in windows])
+
+    if np.ptp(temperatures) < MIN_TEMPERATURE_SPAN or len(windows) <= degree:
+        degree = 0
+    return GyroTemperatureModel(np.polyfit(temperatures, means, degree))
+
+class ImuCalibration:
+    '''
+    Accelerometer bias and matrix plus gyroscope temperature model of one sensor.
+    '''
+    def __init__(self, accel_bias, accel_matrix, gyro_model, accel_residual=None):
+        self.accel_bias = np.asarray(accel_bias, dtype=np.float64)
+        self.accel_matrix = np.asarray(accel_matrix, dtype=np.float64)
+        self.gyro_model = gyro_model
+        self.accel_residual = accel_residual
+        self.applied_temperature = None
+
+    def apply(self, sensor, temperature=None):
+        '''
+        Load the calibration into the sensor driver, with the gyroscope bias of `temperature`
+        (read from the sensor by default). The driver recompiles its conversion plan once.
+        '''
+        if temperature is None:
+            temperature = sensor.read_temperature()
+        sensor.set_calibration(self.accel_bias.tolist(), self.gyro_model.bias_at(temperature), self.accel_matrix)
+        self.applied_temperature = temperature
+
+    def update_temperature(self, sensor, temperature=None, threshold=TEMPERATURE_UPDATE_THRESHOLD):
+        '''
+        Re-apply the calibration only if the temperature moved more than `threshold` since it
+        was last applied. Returns True when the calibration was updated.
+        '''
+        if temperature is None:
+            temperature = sensor.read_temperature()
+        if self.applied_temperature is not None and abs(temperature - self.applied_temperature) <= threshold:
+            return False
+        self.apply(sensor, temperature)
+        return True
+
+    def to_dict(self):
+        return {
+            "accel_bias": self.accel_bias.tolist(),
+            "accel_matrix": self.accel_matrix.tolist(),
+            "accel_residual": self.accel_residual,
+            "gyro_coefficients": self.gyro_model.coefficients.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["accel_bias"], data["accel_matrix"], GyroTemperatureModel(data["gyro_coefficients"]),
+                   data.get("accel_residual"))
+
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as file:
+            return cls.from_dict(json.load(file))
+
+def collect_orientations(sensor, wait_for_position, names, samples=DEFAULT_WINDOW_SAMPLES):
+    '''
+    One window per orientation; `wait_for_position(name)` is called before each one and
+    must return once the sensor rests in it.
+    '''
+    windows = []
+    for name in names:
+        wait_for_position(name)
+        windows.append(collect_window(sensor, samples))
+    return windows
+
+def six_position_calibration(sensor, wait_for_position, samples=DEFAULT_WINDOW_SAMPLES, gyro_degree=1, gyro_windows=()):
+    '''
+    Run a six-position calibration on an initialized sensor. `wait_for_position(name)` is
+    called before each orientation of SIX_POSITIONS and must return once the sensor rests
+    in it. The gyroscope model is fitted on these windows plus `gyro_windows`, e.g. those of
+    a temperature sweep. Returns an ImuCalibration.
+    '''
+    windows = collect_orientations(sensor, wait_for_position, [name for (name, _) in SIX_POSITIONS], samples)
+    (bias, matrix, residual) = fit_accel_six_position(windows, [reference for (_, reference) in SIX_POSITIONS])
+    return ImuCalibration(bias, matrix, fit_gyro_temperature(windows + list(gyro_windows), gyro_degree), residual)
+
+def ellipsoid_calibration(sensor, wait_for_position, orientations=DEFAULT_ELLIPSOID_ORIENTATIONS,
+                          samples=DEFAULT_WINDOW_SAMPLES, gyro_degree=1, gyro_windows=()):
+    '''
+    Like six_position_calibration, but the sensor rests in `orientations` arbitrary, well
+    spread orientations and the accelerometer is fitted with fit_accel_ellipsoid.
+    `wait_for_position` gets "orientation <n> of <orientations>".
+    '''
+    if orientations < MIN_ELLIPSOID_ORIENTATIONS:
+        raise ValueError(f"The ellipsoid fit needs at least {MIN_ELLIPSOID_ORIENTATIONS} orientations")
+    names = [f"orientation {number} of {orientations}" for number in range(1, orientations + 1)]
+    windows = collect_orientations(sensor, wait_for_position, names, samples)
+    (bias, matrix, residual) = fit_accel_ellipsoid(windows)
+    return ImuCalibration(bias, matrix, fit_gyro_temperature(windows + list(gyro_windows), gyro_degree), residual)
@@ -0,0 +1,177 @@
+'''
+Compressed transfers to I2C memories.
+
+The I2C link is slow compared to a host CPU, so compressible data (text, sparse images)
+moves faster compressed. `write_compressed` streams the data through a standard library
+compressor and writes the output to a `MemoryDevice` as it is produced, followed by a
+small header; `read_compressed` reads the header, then the payload, and returns the
+original data after checking its length and CRC32.
+
+Stored layout, all little-endian:
+    header:  magic, version, algorithm, reserved, original length, payload length, CRC32
+             of the original data (see CONTAINER_HEADER)
+    payload: compressed data
+
+The magic of a previous container is cleared before the payload is written and the header
+is written last, so an interrupted transfer never looks like a valid container, even when
+it overwrites one.
+'''
+import bz2
+import lzma
+import struct
+import time
+import zlib
+
+CONTAINER_MAGIC = b"SNCZ"
+CONTAINER_VERSION = 1
+CONTAINER_HEADER = struct.Struct("<4sBBHIII")
+
+# Algorithm ids stored in the header
+ALGORITHM_NONE = 0
+ALGORITHM_ZLIB = 1
+ALGORITHM_LZMA = 2
+ALGORITHM_BZ2 = 3
+
+ALGORITHMS = {
+    "none": ALGORITHM_NONE,
+    "zlib": ALGORITHM_ZLIB,
+    "lzma": ALGORITHM_LZMA,
+    "bz2": ALGORITHM_BZ2,
+}
+
+# Size of the pieces fed to the compressor and of the writes issued to the memory
+STREAM_CHUNK = 1024
+
+# Written over the magic before the payload, never a valid magic
+INVALID_MAGIC = bytes(len(CONTAINER_MAGIC))
+
+class StoredCompressor:
+    '''
+    Pass-through with the interface of the standard library compressors.
+    '''
+    def compress(self, data):
+        return bytes(data)
+
+    def flush(self):
+        return b""
+
+def compressor(algorithm, level=None):
+    if algorithm == ALGORITHM_NONE:
+        return StoredCompressor()
+    if algorithm == ALGORITHM_ZLIB:
+        return zlib.compressobj(9 if level is None else level)
+    if algorithm == ALGORITHM_LZMA:
+        return lzma.LZMACompressor(format=lzma.FORMAT_XZ, preset=level)
+    if algorithm == ALGORITHM_BZ2:
+        return bz2.BZ2Compressor(9 if level is None else level)
+    raise ValueError(f"Unknown compression algorithm {algorithm}")
+
+def decompress(algorithm, payload):
+    if algorithm == ALGORITHM_NONE:
+        return bytes(payload)
+    if algorithm == ALGORITHM_ZLIB:
+        return zlib.decompress(payload)
+    if algorithm == ALGORITHM_LZMA:
+        return lzma.decompress(payload)
+    if algorithm == ALGORITHM_BZ2:
+        return bz2.decompress(payload)
+    raise ValueError(f"Unknown compression algorithm {algorithm}")
+
+class CompressionStats:
+    '''
+    Cost and benefit of one compressed transfer. `cpu_time` is the process time spent
+    compressing (or decompressing), `transfer_time` the wall time spent on the bus.
+    '''
+    def __init__(self, algorithm, original_size, wire_size, cpu_time, transfer_time):
+        self.algorithm = algorithm
+        self.original_size = original_size
+        self.wire_size = wire_size
+        self.cpu_time = cpu_time
+        self.transfer_time = transfer_time
+
+    @property
+    def saved_bytes(self):
+        return self.original_size - self.wire_size
+
+    @property
+    def ratio(self):
+        return self.wire_size / self.original_size if self.original_size else 1.0
+
+    def __str__(self):
+        name = next((name for (name, value) in ALGORITHMS.items() if value == self.algorithm), self.algorithm)
+        return (f"{name}: {self.original_size} -> {self.wire_size} bytes on the wire ({self.saved_bytes} saved, "
+                f"{100 * (1 - self.ratio):.1f}%), CPU {self.cpu_time * 1000:.1f} ms, bus {self.transfer_time * 1000:.1f} ms")
+
+def write_compressed(memory, offset, data, algorithm=ALGORITHM_ZLIB, level=None):
+    '''
+    Compress `data` and store it with its header at `offset` of `memory`, a MemoryDevice.
+    Returns CompressionStats. Raises ValueError if the compressed data does not fit.
+    '''
+    if isinstance(algorithm, str):
+        algorithm = ALGORITHMS[algorithm]
+    data = memoryview(bytes(data))
+    stream = compressor(algorithm, level)
+    crc = 0
+    cpu_time = 0.0
+    transfer_time = 0.0
+
+    # Invalidate any container already stored here before touching its payload
+    transfer_start = time.perf_counter()
+    memory.write(offset, INVALID_MAGIC)
+    transfer_time += time.perf_counter() - transfer_start
+
+    # The payload is written while it is compressed, the header once its fields are known
+    position = offset + CONTAINER_HEADER.size
+    pending = bytearray()
+    for start in range(0, max(len(data), 1), STREAM_CHUNK):
+        last = start + STREAM_CHUNK >= len(data)
+        cpu_start = time.process_time()
+        piece = data[start:start + STREAM_CHUNK]
+        crc = zlib.crc32(piece, crc)
+        pending += stream.compress(piece)
+        if last:
+            pending += stream.flush()
+        cpu_time += time.process_time() - cpu_start
+
+        if len(pending) >= STREAM_CHUNK or (last and pending):
+            transfer_start = time.perf_counter()
+            memory.write(position, pending)
+            transfer_time += time.perf_counter() - transfer_start
+            position += len(pending)
+            pending = bytearray()
+
+    payload_size = position - offset - CONTAINER_HEADER.size
+    header = CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, algorithm, 0, len(data), payload_size, crc)
+    transfer_start = time.perf_counter()
+    memory.write(offset, header)
+    transfer_time += time.perf_counter() - transfer_start
+
+    wire_size = len(INVALID_MAGIC) + CONTAINER_HEADER.size + payload_size
+    return CompressionStats(algorithm, len(data), wire_size, cpu_time, transfer_time)
+
+def read_compressed(memory, offset, cached=False):
+    '''
+    Read a container written by write_compressed at `offset` of `memory` and return
+    (data, CompressionStats). The memory itself is read unless `cached` is set. Raises
+    ValueError when there is no valid container or the data does not match its CRC.
+    '''
+    read = memory.read if cached else memory.read_uncached
+
+    transfer_start = time.perf_counter()
+    (magic, version, algorithm, _, original_size, payload_size, crc) = CONTAINER_HEADER.unpack(
+        bytes(read(offset, CONTAINER_HEADER.size)))
+    if magic != CONTAINER_MAGIC or version != CONTAINER_VERSION:
+        raise ValueError(f"No compressed container at offset {offset}")
+    payload = read(offset + CONTAINER_HEADER.size, payload_size)
+    transfer_time = time.perf_counter() - transfer_start
+
+    cpu_start = time.process_time()
+    try:
+        data = decompress(algorithm, bytes(payload))
+    except (zlib.error, lzma.LZMAError, OSError) as error:
+        raise ValueError(f"Compressed container at offset {offset} is corrupted: {error}") from error
+    cpu_time = time.process_time() - cpu_start
+
+    if len(data) != original_size or zlib.crc32(data) != crc:
+        raise ValueError(f"Compressed container at offset {offset} is corrupted")
+    return (data, CompressionStats(algorithm, original_size, CONTAINER_HEADER.size + payload_size, cpu_time, transfer_time))
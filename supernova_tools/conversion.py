@@ -0,0 +1,93 @@
+'''
+Compiled conversion plans from raw 16-bit IMU samples to physical units.
+
+A plan fuses the per-axis resolution, the calibration bias and an optional 3x3 correction
+matrix for each sensor into a single affine map:
+
+    accel = M_accel @ (raw_accel * accel_res - accel_bias)
+    gyro  = M_gyro  @ (raw_gyro  * gyro_res  - gyro_bias)
+
+which is precomputed as `values = W @ raw - c`, with the raw register order of the sensor
+folded into W. Plans are cached per configuration, so drivers only compile a new one when
+the full scale, the biases or the matrices change.
+
+Single samples are converted in pure Python to keep the per-read cost low; batches are
+converted with NumPy, which is only imported on the first batch.
+'''
+import functools
+
+# Position in the raw sample of accel X, Y, Z and gyro X, Y, Z for each register layout
+ACCEL_FIRST_LAYOUT = (0, 1, 2, 3, 4, 5)
+GYRO_FIRST_LAYOUT = (3, 4, 5, 0, 1, 2)
+
+IDENTITY_MATRIX = ((1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0))
+
+class ConversionPlan:
+    '''
+    Affine conversion of raw samples, see the module documentation. Converted values are
+    always ordered accel X, Y, Z then gyro X, Y, Z, whatever the raw layout.
+    '''
+    def __init__(self, layout, accel_res, gyro_res, accel_bias, gyro_bias, accel_matrix=None, gyro_matrix=None):
+        self.layout = tuple(layout)
+        scale = (accel_res,) * 3 + (gyro_res,) * 3
+        bias = tuple(accel_bias) + tuple(gyro_bias)
+        matrices = (accel_matrix or IDENTITY_MATRIX, gyro_matrix or IDENTITY_MATRIX)
+
+        # Fold resolutions, biases, matrices and register order into values = W @ raw - c
+        weights = [[0.0] * 6 for _ in range(6)]
+        offsets = [0.0] * 6
+        for (block, matrix) in enumerate(matrices):
+            for i in range(3):
+                output = 3 * block + i
+                for j in range(3):
+                    source = 3 * block + j
+                    weights[output][self.layout[source]] += matrix[i][j] * scale[source]
+                    offsets[output] += matrix[i][j] * bias[source]
+        self.weights = tuple(tuple(row) for row in weights)
+        self.offsets = tuple(offsets)
+
+        # Without matrices every output depends on a single raw value
+        self.diagonal = accel_matrix is None and gyro_matrix is None
+        self.terms = tuple((self.layout[k], scale[k], bias[k]) for k in range(6))
+
+        self.arrays = None
+
+    def convert(self, raw):
+        '''
+        Convert one raw sample. Returns ((ax, ay, az), (gx, gy, gz)).
+        '''
+        if self.diagonal:
+            v = [raw[i] * s - b for (i, s, b) in self.terms]
+        else:
+            v = [sum(w * r for (w, r) in zip(row, raw)) - c for (row, c) in zip(self.weights, self.offsets)]
+        return ((v[0], v[1], v[2]), (v[3], v[4], v[5]))
+
+    def convert_batch(self, raw):
+        '''
+        Convert an (N, 6) array-like of raw samples in one vectorized operation. Returns an
+        (N, 6) float64 NumPy array ordered accel X, Y, Z, gyro X, Y, Z.
+        '''
+        import numpy as np
+
+        if self.arrays is None:
+            self.arrays = (np.array(self.weights).T, np.array(self.offsets))
+        (weights, offsets) = self.arrays
+
+        raw = np.asarray(raw, dtype=np.float64).reshape(-1, 6)
+        return raw @ weights - offsets
+
+@functools.lru_cache(maxsize=32)
+def compile_plan(layout, accel_res, gyro_res, accel_bias, gyro_bias, accel_matrix=None, gyro_matrix=None):
+    '''
+    Return the plan of a configuration, reusing the cached one when it was already compiled.
+    All the arguments must be hashable: biases as tuples and matrices as tuples of tuples.
+    '''
+    return ConversionPlan(layout, accel_res, gyro_res, accel_bias, gyro_bias, accel_matrix, gyro_matrix)
+
+def as_matrix(matrix):
+    '''
+    Convert a 3x3 nested sequence (or NumPy array) to the hashable form used as cache key.
+    '''
+    if matrix is None:
+        return None
+    return tuple(tuple(float(value) for value in row) for row in matrix)
@@ -0,0 +1,232 @@
+'''
+Random-access driver for I2C memories (FRAM and EEPROM) behind a Supernova.
+
+A `MemoryProfile` describes a part: capacity, number of address bytes, write page size
+and write-cycle time. `MemoryDevice` uses it to split every transfer into the fewest
+transactions the part accepts:
+- writes never cross a page boundary, because an EEPROM wraps around inside the page
+  instead of moving to the next one. FRAMs have no pages, so only the controller
+  transfer limit applies.
+- reads are only limited by the controller transfer size, the address pointer of the
+  memory increments across pages.
+- after a write to a part with a write-cycle time, the next transaction to it waits for
+  the cycle to end instead of being NACKed.
+
+Reads go through a write-through cache of the memory contents, so reading the same area
+again costs no bus traffic.
+'''
+import time
+
+from supernova_tools.transport import TransferError
+
+# Largest transfers used with the Supernova, as in the FRAM file transfer example
+DEFAULT_MAX_WRITE_TRANSFER = 64
+DEFAULT_MAX_READ_TRANSFER = 250
+
+class MemoryProfile:
+    '''
+    Description of a memory part.
+    - capacity: size in bytes.
+    - address_width: number of subaddress bytes, sent MSB first.
+    - page_size: write page size in bytes, None when writes may cross any boundary (FRAM).
+    - write_cycle_time: time in seconds the part is busy after a write, 0 for FRAM.
+    '''
+    def __init__(self, name, capacity, address_width, page_size=None, write_cycle_time=0.0):
+        self.name = name
+        self.capacity = capacity
+        self.address_width = address_width
+        self.page_size = page_size
+        self.write_cycle_time = write_cycle_time
+
+    def __repr__(self):
+        return f"MemoryProfile({self.name})"
+
+# Common parts with a linear address space
+FRAM_MB85RC256V = MemoryProfile("MB85RC256V", 32 * 1024, 2)
+FRAM_FM24CL64B = MemoryProfile("FM24CL64B", 8 * 1024, 2)
+FRAM_FM24V10 = MemoryProfile("FM24V10 (lower 64 KB)", 64 * 1024, 2)
+EEPROM_24LC02 = MemoryProfile("24LC02", 256, 1, page_size=8, write_cycle_time=0.005)
+EEPROM_24LC256 = MemoryProfile("24LC256", 32 * 1024, 2, page_size=64, write_cycle_time=0.005)
+EEPROM_AT24C512 = MemoryProfile("AT24C512", 64 * 1024, 2, page_size=128, write_cycle_time=0.005)
+
+PROFILES = {profile.name: profile for profile in (FRAM_MB85RC256V, FRAM_FM24CL64B, FRAM_FM24V10,
+                                                  EEPROM_24LC02, EEPROM_24LC256, EEPROM_AT24C512)}
+
+def write_segments(offset, length, page_size, max_transfer):
+    '''
+    Split a write of `length` bytes at `offset` into (offset, size) segments that do not
+    cross a page boundary and do not exceed `max_transfer` bytes.
+    '''
+    end = offset + length
+    segments = []
+    while offset < end:
+        size = min(max_transfer, end - offset)
+        if page_size:
+            size = min(size, page_size - offset % page_size)
+        segments.append((offset, size))
+        offset += size
+    return segments
+
+class MemoryDevice:
+    '''
+    Memory part `profile` at I2C address `address` on an "i3c.controller" interface,
+    possibly wrapped in a RetryingI3C. Failed transfers raise TransferError with the offset
+    of the first byte that was not transferred.
+    '''
+    def __init__(self, i3c, address, profile, mode=None, cache=True, max_write_transfer=DEFAULT_MAX_WRITE_TRANSFER,
+                 max_read_transfer=DEFAULT_MAX_READ_TRANSFER, clock=time.perf_counter):
+        self.i3c = i3c
+        self.address = address
+        self.profile = profile
+        self.mode = i3c.TransferMode.I2C_MODE if mode is None else mode
+        self.max_write_transfer = max_write_transfer
+        self.max_read_transfer = max_read_transfer
+        self.clock = clock
+
+        # Time at which the current write cycle ends
+        self.ready_at = 0.0
+
+        # Copy of the memory contents and, per byte, whether it is valid
+        self.cache = bytearray(profile.capacity) if cache else None
+        self.valid = bytearray(profile.capacity) if cache else None
+
+        self.transactions = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def subaddress(self, offset):
+        return list(offset.to_bytes(self.profile.address_width, "big"))
+
+    def check_range(self, offset, length):
+        if offset < 0 or length < 0 or offset + length > self.profile.capacity:
+            raise ValueError(f"Range {offset}..{offset + length} is outside the {self.profile.capacity} bytes of {self.profile.name}")
+
+    def busy(self):
+        return self.clock() < self.ready_at
+
+    def wait_ready(self):
+        '''
+        Wait for the end of the current write cycle.
+        '''
+        remaining = self.ready_at - self.clock()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def write_segment(self, offset, data):
+        '''
+        Single write transaction, `data` must fit in one page. Does not wait for the write
+        cycle it starts, so writes to other devices can be issued in the meantime.
+        '''
+        self.wait_ready()
+        try:
+            (success, result) = self.i3c.write(self.address, self.mode, self.subaddress(offset), list(data))
+        except TransferError as error:
+            raise TransferError(str(error), self.address, offset) from error
+        if not success:
+            raise TransferError(f"Write to 0x{self.address:02x} failed at offset {offset}: {result}", self.address, offset)
+        self.transactions += 1
+        self.bytes_written += len(data)
+        if self.profile.write_cycle_time:
+            self.ready_at = self.clock() + self.profile.write_cycle_time
+
+        if self.cache is not None:
+            # Write-through
+            self.cache[offset:offset + len(data)] = data
+            self.valid[offset:offset + len(data)] = b"\x01" * len(data)
+
+    def write(self, offset, data):
+        '''
+        Write `data` at `offset` with page-aligned transactions.
+        '''
+        data = bytes(data)
+        self.check_range(offset, len(data))
+        view = memoryview(data)
+        for (start, size) in write_segments(offset, len(data), self.profile.page_size, self.max_write_transfer):
+            self.write_segment(start, view[start - offset:start - offset + size])
+
+    def read_uncached(self, offset, length, into=None):
+        '''
+        Read `length` bytes from the memory itself, in as few transactions as the controller
+        allows. The data is appended to `into` (a new bytearray by default), which is returned.
+        '''
+        self.check_range(offset, length)
+        data = bytearray() if into is None else into
+        self.wait_ready()
+        end = offset + length
+        for start in range(offset, end, self.max_read_transfer):
+            size = min(self.max_read_transfer, end - start)
+            try:
+                (success, chunk) = self.i3c.read(self.address, self.mode, self.subaddress(start), size)
+            except TransferError as error:
+                raise TransferError(str(error), self.address, start) from error
+            if not success:
+                raise TransferError(f"Read from 0x{self.address:02x} failed at offset {start}: {chunk}", self.address, start)
+            self.transactions += 1
+            self.bytes_read += size
+            data.extend(chunk)
+        return data
+
+    def read(self, offset, length):
+        '''
+        Read `length` bytes at `offset`. Only the bytes not cached yet are fetched, each
+        missing run with as few transactions as possible.
+        '''
+        self.check_range(offset, length)
+        if self.cache is None:
+            return bytes(self.read_uncached(offset, length))
+
+        end = offset + length
+        start = self.valid.find(0, offset, end)
+        while start != -1:
+            run_end = self.valid.find(1, start, end)
+            if run_end == -1:
+                run_end = end
+            self.cache[start:run_end] = self.read_uncached(start, run_end - start)
+            self.valid[start:run_end] = b"\x01" * (run_end - start)
+            start = self.valid.find(0, run_end, end)
+
+        return bytes(self.cache[offset:end])
+
+    def invalidate(self):
+        '''
+        Forget the cached contents, e.g. after the memory was written by someone else.
+        '''
+        if self.valid is not None:
+            self.valid[:] = bytes(len(self.valid))
+
+    def verify(self, offset, data):
+        '''
+        Compare the memory contents, bypassing the cache, with `data`. Returns the offset of
+        the first mismatching byte, or None when they are equal.
+        '''
+        actual = self.read_uncached(offset, len(data))
+        if actual == data:
+            return None
+        for (index, (expected, value)) in enumerate(zip(data, actual)):
+            if expected != value:
+                return offset + index
+        return offset + min(len(data), len(actual))
+
+def open_supernova(simulate, addresses, profile):
+    '''
+    Supernova device of the memory examples, not opened yet. The simulated one has a
+    simulated memory of `profile` at each of `addresses`.
+    '''
+    if simulate:
+        from supernova_tools.simulated import SimulatedMemory, SimulatedSupernovaDevice
+        device = SimulatedSupernovaDevice()
+        for address in addresses:
+            device.i3c.add_device(SimulatedMemory(address, profile))
+        return device
+    from supernovacontroller.sequential import SupernovaDevice
+    return SupernovaDevice()
+
+def transfer_rates(simulate):
+    '''
+    I3C push-pull and I2C rates of the memory examples, for `set_parameters()`.
+    '''
+    if simulate:
+        from supernova_tools.simulated import I2cTransferRate, I3cPushPullTransferRate
+    else:
+        from BinhoSupernova.commands.definitions import I2cTransferRate, I3cPushPullTransferRate
+    return (I3cPushPullTransferRate.PUSH_PULL_3_75_MHZ, I2cTransferRate._1MHz)
@@ -0,0 +1,302 @@
+'''
+Prometheus-style metrics for long-running acquisition.
+
+Metrics are plain Python objects updated in place from the acquisition loop, so the hot
+path only pays for an integer addition (counters) or a bisect plus two additions
+(histograms). Rendering to the Prometheus text format only happens when the HTTP endpoint
+is scraped, in a separate daemon thread.
+
+Updates are not locked: each metric is expected to be fed by a single acquisition thread,
+and a scrape may observe a histogram halfway through an update, which Prometheus tolerates.
+'''
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Default latency buckets in seconds, from 100 us up to 100 ms
+DEFAULT_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+# Content type expected by Prometheus for the text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def format_labels(labels):
+    '''
+    Format a tuple of (name, value) pairs as a Prometheus label set.
+    '''
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for (name, value) in labels) + "}"
+
+class Counter:
+    '''
+    Monotonically increasing value, e.g. number of samples or bus errors.
+    '''
+    type_name = "counter"
+
+    def __init__(self, labels=()):
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name):
+        return [(name, self.labels, self.value)]
+
+class Gauge:
+    '''
+    Value that can go up and down, e.g. the current calibration bias of an axis.
+    '''
+    type_name = "gauge"
+
+    def __init__(self, labels=()):
+        self.labels = labels
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name):
+        return [(name, self.labels, self.value)]
+
+class Histogram:
+    '''
+    Distribution of observed values over fixed buckets, e.g. transaction latencies.
+    Only per-bucket counts are kept; they are accumulated when rendered.
+    '''
+    type_name = "histogram"
+
+    def __init__(self, labels=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # One extra slot for the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name):
+        result = []
+        cumulative = 0
+        for (bound, count) in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            result.append((name + "_bucket", self.labels + (("le", le),), cumulative))
+        result.append((name + "_sum", self.labels, self.sum))
+        result.append((name + "_count", self.labels, self.count))
+        return result
+
+class MetricsRegistry:
+    '''
+    Collection of metrics rendered together by the exporter. Asking twice for the same
+    name and labels returns the same metric object.
+    '''
+    def __init__(self):
+        self.families = {}
+        self.lock = threading.Lock()
+
+    def __get_or_create(self, metric_class, name, help_text, labels, **kwargs):
+        labels = tuple(sorted((labels or {}).items()))
+        with self.lock:
+            family = self.families.get(name)
+            if family is None:
+                family = self.families[name] = {"type": metric_class, "help": help_text, "metrics": {}}
+            elif family["type"] is not metric_class:
+                raise ValueError(f"Metric {name} is already registered as a {family['type'].type_name}")
+            metric = family["metrics"].get(labels)
+            if metric is None:
+                metric = family["metrics"][labels] = metric_class(labels, **kwargs)
+        return metric
+
+    def counter(self, name, help_text, labels=None):
+        return self.__get_or_create(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=None):
+        return self.__get_or_create(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=None, buckets=DEFAULT_LATENCY_BUCKETS):
+        return self.__get_or_create(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self):
+        '''
+        Render every metric in the Prometheus text exposition format.
+        '''
+        lines = []
+        with self.lock:
+            families = [(name, family["type"], family["help"], list(family["metrics"].values()))
+                        for (name, family) in sorted(self.families.items())]
+        for (name, metric_class, help_text, metrics) in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_class.type_name}")
+            for metric in metrics:
+                for (sample_name, labels, value) in metric.samples(name):
+                    lines.append(f"{sample_name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+class MetricsExporter:
+    '''
+    Local HTTP endpoint serving the registry on /metrics from a daemon thread.
+    '''
+    def __init__(self, registry, host="127.0.0.1", port=9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Keep the acquisition console output clean
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        # Port 0 asks the OS for a free port, report the one actually bound
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+class InstrumentedI3C:
+    '''
+    Wrapper around a Supernova "i3c.controller" interface that counts transactions, bytes,
+    bus errors and latency per target address. Any other attribute is forwarded to the
+    wrapped interface, so it can be passed to the drivers in place of the original one.
+    '''
+    def __init__(self, i3c, registry):
+        self.i3c = i3c
+        self.registry = registry
+        self.metrics = {}
+
+    def __getattr__(self, name):
+        return getattr(self.i3c, name)
+
+    def __metrics_for(self, operation, target_address):
+        key = (operation, target_address)
+        metrics = self.metrics.get(key)
+        if metrics is None:
+            labels = {"operation": operation, "target": f"0x{target_address:02x}"}
+            metrics = self.metrics[key] = (
+                self.registry.counter("supernova_transactions_total", "Number of bus transactions", labels),
+                self.registry.counter("supernova_bus_errors_total", "Number of failed bus transactions", labels),
+                self.registry.counter("supernova_bytes_total", "Number of payload bytes transferred", labels),
+                self.registry.histogram("supernova_transaction_seconds", "Bus transaction latency", labels),
+            )
+        return metrics
+
+    def read(self, target_address, mode, subaddress, length):
+        (transactions, errors, transferred, latency) = self.__metrics_for("read", target_address)
+        start = time.perf_counter()
+        (success, data) = self.i3c.read(target_address, mode, subaddress, length)
+        latency.observe(time.perf_counter() - start)
+        transactions.inc()
+        if success:
+            transferred.inc(length)
+        else:
+            errors.inc()
+        return (success, data)
+
+    def write(self, target_address, mode, subaddress, buffer):
+        (transactions, errors, transferred, latency) = self.__metrics_for("write", target_address)
+        start = time.perf_counter()
+        (success, result) = self.i3c.write(target_address, mode, subaddress, buffer)
+        latency.observe(time.perf_counter() - start)
+        transactions.inc()
+        if success:
+            transferred.inc(len(buffer))
+        else:
+            errors.inc()
+        return (success, result)
+
+class InstrumentedSensor:
+    '''
+    Wrapper around a BMI323 or LSM6DSV driver configured at `odr` Hz that counts reads,
+    new samples, stale reads (the sensor had no new data when it was polled) and missed
+    samples (gaps longer than one sample period between new samples), and publishes the
+    calibration biases as gauges so their drift can be followed between calibrations.
+    Without `odr` missed samples are not counted.
+    '''
+    def __init__(self, sensor, registry, name=None, odr=None, clock=time.perf_counter):
+        self.sensor = sensor
+        self.clock = clock
+        self.registry = registry
+        labels = {"sensor": name or type(sensor).__name__}
+        self.labels = labels
+        self.period = None if not odr else 1.0 / odr
+        self.reads = registry.counter("imu_reads_total", "Number of sensor reads", labels)
+        self.samples = registry.counter("imu_samples_total", "Number of new samples read", labels)
+        self.stale = registry.counter("imu_stale_reads_total", "Number of reads without new data", labels)
+        self.missed = registry.counter("imu_missed_samples_total", "Number of samples produced but never read", labels)
+        self.latency = registry.histogram("imu_read_seconds", "Latency of a full sensor read", labels)
+        self.calibrations = registry.counter("imu_calibrations_total", "Number of calibrations run", labels)
+        self.last_sample_time = None
+
+    def __getattr__(self, name):
+        return getattr(self.sensor, name)
+
+    def read(self):
+        start = time.perf_counter()
+        sample = self.sensor.read()
+        self.latency.observe(time.perf_counter() - start)
+        self.reads.inc()
+        return sample
+
+    def poll(self):
+        '''
+        Read the data-ready flags and one sample in a single transaction, without waiting.
+        Returns the converted sample, or None when the sensor had no new data.
+        '''
+        start = self.clock()
+        (ready, raw) = self.sensor.read_raw_ready()
+        now = self.clock()
+        self.latency.observe(now - start)
+        self.reads.inc()
+        if not ready:
+            self.stale.inc()
+            return None
+
+        self.samples.inc()
+        if self.period is not None and self.last_sample_time is not None:
+            self.missed.inc(max(0, round((now - self.last_sample_time) / self.period) - 1))
+        self.last_sample_time = now
+        return self.sensor.conversion_plan().convert(raw)
+
+    def calibrate(self):
+        self.sensor.calibrate()
+        self.calibrations.inc()
+        self.publish_biases()
+
+    def set_calibration(self, accel_bias, gyro_bias, accel_matrix=None, gyro_matrix=None):
+        # Also reached through ImuCalibration.apply, so loaded calibrations are published too
+        self.sensor.set_calibration(accel_bias, gyro_bias, accel_matrix, gyro_matrix)
+        self.publish_biases()
+
+    def publish_biases(self):
+        for (kind, bias) in (("accel", self.sensor.accel_bias), ("gyro", self.sensor.gyro_bias)):
+            for (axis, value) in zip("xyz", bias):
+                labels = dict(self.labels, axis=axis)
+                self.registry.gauge(f"imu_{kind}_bias", f"Current {kind} calibration bias", labels).set(value)
@@ -0,0 +1,145 @@
+'''
+Adaptive data-ready polling for sensors without FIFO or interrupts.
+
+Reading a sensor as fast as possible re-reads the same sample many times and wastes bus
+transactions; reading at a fixed interval misses samples whenever the interval and the
+sensor ODR disagree. `AdaptivePoller` instead reads the data-ready flags together with the
+sample (`read_raw_ready()` of the drivers, a single transaction) and:
+- estimates the actual sample period from the arrival times of new samples, so it follows
+  the sensor oscillator rather than the nominal ODR,
+- sleeps until shortly before the next sample is due and then polls at a short retry
+  interval, never shorter than the measured transaction time so it does not saturate
+  the bus,
+- adapts how early it starts polling: a first poll that finds no data means it was early,
+  a first poll that finds data means the sample may have been waiting,
+- counts stale reads (the same sample read again) and missed samples (gaps longer than
+  one period),
+- gives up at an optional deadline, so a sensor that stops reporting data-ready cannot
+  block the caller forever.
+
+Waits use `precise_sleep`, which sleeps for most of the time and spins for the rest, as
+`time.sleep` alone overshoots by up to a millisecond or more depending on the OS.
+'''
+import math
+import time
+
+# Waits shorter than this are spun instead of slept, in seconds
+DEFAULT_SPIN_THRESHOLD = 0.002
+
+# Weight of a new measurement in the period and transaction time averages
+ESTIMATE_WEIGHT = 0.05
+
+# Number of retries per sample period once the next sample is due
+RETRIES_PER_PERIOD = 16
+
+def precise_sleep(deadline, clock=time.perf_counter, spin_threshold=DEFAULT_SPIN_THRESHOLD):
+    '''
+    Wait until `deadline` on `clock`: sleep while far from it, then spin.
+    '''
+    remaining = deadline - clock()
+    if remaining > spin_threshold:
+        time.sleep(remaining - spin_threshold)
+    while clock() < deadline:
+        pass
+
+class PollerStats:
+    def __init__(self):
+        self.samples = 0
+        self.transactions = 0
+        self.stale_reads = 0
+        self.missed = 0
+        # Polls that reached their deadline without a new sample
+        self.timeouts = 0
+
+    def efficiency(self):
+        '''
+        Fraction of the transactions that returned a new sample.
+        '''
+        return self.samples / self.transactions if self.transactions else 0.0
+
+    def __str__(self):
+        return (f"{self.samples} samples in {self.transactions} transactions ({100 * self.efficiency():.1f}% useful), "
+                f"{self.stale_reads} stale reads, {self.missed} samples missed, {self.timeouts} timeouts")
+
+class AdaptivePoller:
+    '''
+    Polls `read_ready`, a function returning (ready, data) such as a driver's read_raw_ready,
+    for a sensor with a nominal sample period of `period` seconds.
+    '''
+    def __init__(self, read_ready, period, clock=time.perf_counter, spin_threshold=DEFAULT_SPIN_THRESHOLD):
+        self.read_ready = read_ready
+        self.clock = clock
+        self.spin_threshold = spin_threshold
+        self.period = period
+        self.transaction_time = 0.0
+        # How long before the next sample is due polling starts, in seconds
+        self.lead = period / RETRIES_PER_PERIOD
+        self.last_sample_time = None
+        self.stats = PollerStats()
+
+    @classmethod
+    def for_sensor(cls, sensor, odr, **kwargs):
+        '''
+        Poller for a BMI323 or LSM6DSV driver configured at `odr` Hz.
+        '''
+        return cls(sensor.read_raw_ready, 1.0 / odr, **kwargs)
+
+    @property
+    def odr(self):
+        '''
+        Estimated actual output data rate in Hz.
+        '''
+        return 1.0 / self.period
+
+    def retry_interval(self):
+        return max(self.period / RETRIES_PER_PERIOD, 2 * self.transaction_time)
+
+    def read(self):
+        start = self.clock()
+        (ready, data) = self.read_ready()
+        now = self.clock()
+        self.transaction_time += ESTIMATE_WEIGHT * ((now - start) - self.transaction_time)
+        self.stats.transactions += 1
+        return (ready, data, now)
+
+    def poll(self, deadline=None):
+        '''
+        Wait for the next new sample and return (host_time, data), host_time being the time of
+        the read that found it. Returns None if `deadline`, a time on the poller clock, passes
+        before a new sample arrives.
+        '''
+        if deadline is None:
+            deadline = math.inf
+        if self.last_sample_time is not None:
+            precise_sleep(min(self.last_sample_time + self.period - self.lead, deadline), self.clock, self.spin_threshold)
+
+        (ready, data, now) = self.read()
+        first_poll = True
+        while not ready:
+            self.stats.stale_reads += 1
+            if now >= deadline:
+                self.stats.timeouts += 1
+                return None
+            if first_poll:
+                # Too early, start the next polls a bit later
+                self.lead = max(self.lead * 0.5, self.transaction_time)
+                first_poll = False
+            precise_sleep(min(now + self.retry_interval(), deadline), self.clock, self.spin_threshold)
+            (ready, data, now) = self.read()
+
+        if first_poll and self.last_sample_time is not None:
+            # The sample may have been waiting since before this poll, start earlier next time
+            self.lead = min(self.lead + self.retry_interval() * 0.25, self.period * 0.5)
+
+        self.update_period(now)
+        self.stats.samples += 1
+        return (now, data)
+
+    def update_period(self, now):
+        if self.last_sample_time is not None:
+            interval = now - self.last_sample_time
+            periods = max(1, round(interval / self.period))
+            self.stats.missed += periods - 1
+            # Gaps refine the estimate too, dropping them would bias it towards short intervals
+            self.period += ESTIMATE_WEIGHT * (interval / periods - self.period)
+        self.last_sample_time = now
@@ -0,0 +1,373 @@
+'''
+Segmented captures for long acquisitions.
+
+A capture of several days at kHz rates must neither grow in memory nor end up in a single
+huge file. This module provides:
+- `SegmentedCaptureWriter`, a writer that splits the capture into numbered segment files
+  in a directory, starting a new segment when the current one reaches a size or a time
+  span, and keeps an index of the segments (file, first and last time, rows, bytes),
+- `DoubleBufferedWriterThread`, which feeds any writer from two preallocated arrays: the
+  acquisition loop fills one while a background thread converts and writes the other,
+  so memory is fixed whatever the duration, and keeps the latest rows in a `SampleWindow`,
+- `SegmentIndex`, to read back a time range touching only the segments that overlap it.
+  Binary segments are memory-mapped and searched on their time column, so the query does
+  not read the whole segment.
+
+The index (`index.json`) is rewritten after every write, so a capture can be queried while
+it is still running.
+'''
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from supernova_tools.writers import CAPTURE_COLUMNS, CAPTURE_WRITERS, read_binary_header
+
+SEGMENT_INDEX = "index.json"
+
+# Rows of each of the two buffers of DoubleBufferedWriterThread
+DEFAULT_BUFFER_ROWS = 16384
+
+# Rows kept in the in-memory window
+DEFAULT_WINDOW_ROWS = 65536
+
+# Rows written to the first CSV or Parquet segment before its row size is known
+FIRST_CHUNK_ROWS = 64
+
+# A partly filled buffer is handed to the writer after this many seconds, in seconds
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+class SampleWindow:
+    '''
+    The last `rows` rows of a stream, in a preallocated (rows, columns) ring. Safe to read
+    from another thread than the one extending it.
+    '''
+    def __init__(self, rows, columns):
+        self.data = np.zeros((rows, columns))
+        # Next row to overwrite
+        self.position = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=np.float64)
+        size = len(self.data)
+        if len(rows) > size:
+            rows = rows[-size:]
+        with self.lock:
+            end = self.position + len(rows)
+            if end <= size:
+                self.data[self.position:end] = rows
+            else:
+                split = size - self.position
+                self.data[self.position:] = rows[:split]
+                self.data[:end - size] = rows[split:]
+            self.position = end % size
+            self.count = min(self.count + len(rows), size)
+
+    def clear(self):
+        with self.lock:
+            self.position = 0
+            self.count = 0
+
+    def latest(self, count=None):
+        '''
+        Copy of the last `count` rows (all the rows kept by default), oldest first.
+        '''
+        with self.lock:
+            count = self.count if count is None else min(count, self.count)
+            start = self.position - count
+            return np.take(self.data, np.arange(start, start + count), axis=0, mode="wrap")
+
+class SegmentedCaptureWriter:
+    '''
+    Writer storing the capture as segments `<prefix>_00000.<format>`, ... in `directory`. A
+    new segment starts when the current one reaches `max_segment_bytes` or spans
+    `max_segment_seconds` of the time column. Binary segments stop exactly at the size
+    limit, CSV and Parquet segments close to it, as their row size varies.
+    '''
+    def __init__(self, directory, format="bin", columns=CAPTURE_COLUMNS, max_segment_bytes=None,
+                 max_segment_seconds=None, time_column=0, prefix="segment"):
+        if format not in CAPTURE_WRITERS:
+            raise ValueError(f"Unknown capture format '{format}', use one of: {', '.join(CAPTURE_WRITERS)}")
+        self.path = directory
+        self.index_path = os.path.join(directory, SEGMENT_INDEX)
+        if os.path.exists(self.index_path):
+            raise ValueError(f"{directory} already contains a segmented capture")
+        os.makedirs(directory, exist_ok=True)
+
+        self.format = format
+        self.columns = tuple(columns)
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.time_column = time_column
+        self.prefix = prefix
+        self.segments = []
+        self.writer = None
+        # Size of the current segment before its first row
+        self.base_size = 0
+        # Average bytes per row measured on the last rows written, None before any
+        self.row_bytes = 8 * len(self.columns) if format == "bin" else None
+        self.write_index(complete=False)
+
+    @property
+    def segment(self):
+        return self.segments[-1]
+
+    def segment_size(self):
+        file = getattr(self.writer, "file", None)
+        return file.tell() if file is not None else os.path.getsize(self.writer.path)
+
+    def open_segment(self, first_time):
+        self.close_segment()
+        name = f"{self.prefix}_{len(self.segments):05d}.{self.format}"
+        self.writer = CAPTURE_WRITERS[self.format](os.path.join(self.path, name), self.columns)
+        self.base_size = self.segment_size()
+        self.segments.append({"file": name, "start": first_time, "end": first_time, "rows": 0, "bytes": self.base_size})
+
+    def close_segment(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.segment["bytes"] = os.path.getsize(self.writer.path)
+            self.writer = None
+
+    def row_size(self):
+        '''
+        Bytes per row, exact for binary segments. Otherwise the average of the current segment,
+        or of the previous one while the current one is empty; None before any row is written.
+        '''
+        return self.row_bytes
+
+    def segment_full(self, time):
+        segment = self.segment
+        if segment["rows"] == 0:
+            # A segment holds at least one row, whatever the limits
+            return False
+        return ((self.max_segment_bytes is not None and segment["bytes"] + self.row_size() > self.max_segment_bytes)
+                or (self.max_segment_seconds is not None and time - segment["start"] >= self.max_segment_seconds))
+
+    def rows_fitting(self, times):
+        '''
+        How many of the rows with `times` still go to the current segment, at least one.
+        '''
+        count = len(times)
+        segment = self.segment
+        if self.max_segment_seconds is not None:
+            count = min(count, int(np.searchsorted(times, segment["start"] + self.max_segment_seconds, side="left")))
+        if self.max_segment_bytes is not None:
+            row_size = self.row_size()
+            if row_size is None:
+                # Write a few rows first and measure them
+                count = min(count, FIRST_CHUNK_ROWS)
+            else:
+                count = min(count, int((self.max_segment_bytes - segment["bytes"]) // row_size))
+        return max(1, count)
+
+    def write_array(self, data):
+        '''
+        Write an (N, columns) float64 array, splitting it across segments as needed.
+        '''
+        times = data[:, self.time_column]
+        start = 0
+        while start < len(data):
+            if self.writer is None or self.segment_full(times[start]):
+                self.open_segment(float(times[start]))
+            end = start + self.rows_fitting(times[start:])
+            chunk = data[start:end]
+            self.writer.write_array(chunk)
+            segment = self.segment
+            segment["end"] = float(times[end - 1])
+            segment["rows"] += len(chunk)
+            segment["bytes"] = self.segment_size()
+            if self.format != "bin":
+                self.row_bytes = (segment["bytes"] - self.base_size) / segment["rows"]
+            start = end
+        self.write_index(complete=False)
+
+    def write_batch(self, rows):
+        self.write_array(np.asarray(rows, dtype=np.float64).reshape(-1, len(self.columns)))
+
+    def write_index(self, complete):
+        index = {
+            "format": self.format,
+            "columns": list(self.columns),
+            "time_column": self.time_column,
+            "complete": complete,
+            "segments": self.segments,
+        }
+        # Replace the index atomically, a reader never sees it half written
+        temporary = self.index_path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(index, file, indent=1)
+        os.replace(temporary, self.index_path)
+
+    def total_bytes(self):
+        return sum(segment["bytes"] for segment in self.segments)
+
+    def close(self):
+        self.close_segment()
+        self.write_index(complete=True)
+
+class DoubleBufferedWriterThread(threading.Thread):
+    '''
+    Background thread feeding a writer from two preallocated (buffer_rows, columns) arrays.
+    `submit` copies rows into the active buffer; when it is full, or `flush_interval`
+    seconds after the last hand-over, the buffer goes to the thread and acquisition
+    continues in the other one. `submit` only blocks when the thread is still writing the
+    other buffer, which is counted in `stalls`.
+
+    The optional `transform` is applied in the thread to the (N, columns) array of every
+    buffer, e.g. to convert raw samples in place, and the result is written with
+    `writer.write_array` when available and kept in `window`. An exception raised by the
+    writer is re-raised by `close`.
+    '''
+    def __init__(self, writer, columns=len(CAPTURE_COLUMNS), buffer_rows=DEFAULT_BUFFER_ROWS,
+                 window_rows=DEFAULT_WINDOW_ROWS, transform=None, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 clock=time.perf_counter):
+        super().__init__(daemon=True)
+        self.writer = writer
+        self.transform = transform
+        self.flush_interval = flush_interval
+        self.clock = clock
+        (self.active, spare) = (np.empty((buffer_rows, columns)), np.empty((buffer_rows, columns)))
+        self.fill = 0
+        self.free = queue.Queue()
+        self.free.put(spare)
+        self.full = queue.Queue()
+        self.window = SampleWindow(window_rows, columns)
+        self.last_flush = clock()
+        self.rows_written = 0
+        self.stalls = 0
+        self.error = None
+        self.start()
+
+    def submit(self, rows):
+        if self.error is not None:
+            raise self.error
+        start = 0
+        while start < len(rows):
+            count = min(len(rows) - start, len(self.active) - self.fill)
+            self.active[self.fill:self.fill + count] = rows[start:start + count]
+            self.fill += count
+            start += count
+            if self.fill == len(self.active):
+                self.swap()
+        if self.fill and self.clock() - self.last_flush >= self.flush_interval:
+            self.swap()
+
+    def swap(self):
+        self.full.put((self.active, self.fill))
+        try:
+            self.active = self.free.get_nowait()
+        except queue.Empty:
+            # The writer is still busy with the other buffer, the disk is not keeping up
+            self.stalls += 1
+            self.active = self.free.get()
+        self.fill = 0
+        self.last_flush = self.clock()
+
+    def run(self):
+        while True:
+            item = self.full.get()
+            if item is None:
+                break
+            (buffer, count) = item
+            if self.error is None:
+                try:
+                    data = buffer[:count]
+                    if self.transform is not None:
+                        data = self.transform(data)
+                    # A transform may keep nothing of a buffer
+                    if len(data):
+                        self.window.extend(data)
+                        write_array = getattr(self.writer, "write_array", None)
+                        if write_array is not None:
+                            write_array(data)
+                        else:
+                            self.writer.write_batch(data.tolist())
+                        self.rows_written += len(data)
+                except Exception as error:
+                    self.error = error
+            # Always give the buffer back so the acquisition loop never blocks
+            self.free.put(buffer)
+
+    def close(self):
+        if self.fill:
+            self.full.put((self.active, self.fill))
+        self.full.put(None)
+        self.join()
+        self.writer.close()
+        if self.error is not None:
+            raise self.error
+
+class SegmentIndex:
+    '''
+    Index of a segmented capture directory, for time-range queries.
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, SEGMENT_INDEX)) as file:
+            index = json.load(file)
+        self.format = index["format"]
+        self.columns = tuple(index["columns"])
+        self.time_column = index["time_column"]
+        self.complete = index["complete"]
+        self.segments = index["segments"]
+
+    @property
+    def start(self):
+        return self.segments[0]["start"] if self.segments else None
+
+    @property
+    def end(self):
+        return self.segments[-1]["end"] if self.segments else None
+
+    def segments_between(self, start=None, end=None):
+        '''
+        Segments holding rows with times in [start, end], either bound being optional.
+        '''
+        return [segment for segment in self.segments
+                if (start is None or segment["end"] >= start) and (end is None or segment["start"] <= end)]
+
+    def read_segment(self, segment, start=None, end=None):
+        '''
+        Rows of `segment` with times in [start, end], as an (N, columns) float64 array.
+        '''
+        path = os.path.join(self.directory, segment["file"])
+        if self.format == "bin":
+            with open(path, "rb") as file:
+                (_, header_size) = read_binary_header(file)
+            row_size = 8 * len(self.columns)
+            # Only complete rows, the segment may still be written
+            rows = (os.path.getsize(path) - header_size) // row_size
+            if rows == 0:
+                return np.empty((0, len(self.columns)))
+            data = np.memmap(path, dtype="<f8", mode="r", offset=header_size, shape=(rows, len(self.columns)))
+            times = data[:, self.time_column]
+            first = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+            last = rows if end is None else int(np.searchsorted(times, end, side="right"))
+            return np.array(data[first:last])
+
+        if self.format == "csv":
+            data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2).reshape(-1, len(self.columns))
+        else:
+            import pyarrow.parquet
+            table = pyarrow.parquet.read_table(path)
+            data = np.column_stack([table.column(name).to_numpy() for name in self.columns])
+        times = data[:, self.time_column]
+        mask = np.ones(len(data), dtype=bool)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times <= end
+        return data[mask]
+
+    def read_range(self, start=None, end=None):
+        '''
+        Rows with times in [start, end] across all the segments, as an (N, columns) array.
+        '''
+        parts = [self.read_segment(segment, start, end) for segment in self.segments_between(start, end)]
+        return np.concatenate(parts) if parts else np.empty((0, len(self.columns)))
@@ -0,0 +1,216 @@
+'''
+Shared-memory publish/subscribe bus for IMU samples.
+
+One process owns the bus and the sensors and publishes samples into a ring buffer in a
+named shared memory block. Any number of processes attach to it by name and read the
+samples in place, each one with its own cursor, so adding a consumer costs no bus traffic
+and no copy in the publisher.
+
+Memory layout, all little-endian:
+    header:  magic (8 bytes), version, capacity, columns (uint32 each), padding,
+             write count (uint64, number of records ever published),
+             reserve count (uint64, number of records published or being written)
+    records: capacity x columns float64 values
+
+The write count and the reserve count work like a sequence lock: the publisher increases
+the reserve count before it overwrites any slot, writes the records, and then increases
+the write count. A reader never sees a record before it is complete, and it checks the
+reserve count after copying, so a slot the publisher started overwriting in the meantime
+is dropped instead of returned half-written. A reader that falls more than `capacity`
+records behind loses the oldest ones; the loss is reported by `read()`.
+'''
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from supernova_tools.writers import CAPTURE_COLUMNS
+
+BUS_MAGIC = b"SNIMUBUS"
+BUS_VERSION = 2
+BUS_HEADER = struct.Struct("<8sIII")
+
+# The write and reserve counts live in their own 8-byte aligned slots after the header
+WRITE_COUNT_OFFSET = 32
+RESERVE_COUNT_OFFSET = 40
+RECORDS_OFFSET = 64
+
+# Default number of records kept in the ring, about 40 s at 1.6 kHz
+DEFAULT_CAPACITY = 65536
+
+def attach_shared_memory(name):
+    '''
+    Attach to an existing block without letting this process' resource tracker destroy
+    it on exit, which only the publisher is allowed to do.
+    '''
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers the block, skip the registration while attaching.
+        # Unregistering afterwards would also drop the publisher's registration when both
+        # live in the same process.
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+class RingView:
+    '''
+    NumPy views over a bus shared memory block.
+    '''
+    def __init__(self, block, capacity, columns):
+        self.block = block
+        self.capacity = capacity
+        self.columns = columns
+        self.write_count = np.ndarray((1,), dtype="<u8", buffer=block.buf, offset=WRITE_COUNT_OFFSET)
+        self.reserve_count = np.ndarray((1,), dtype="<u8", buffer=block.buf, offset=RESERVE_COUNT_OFFSET)
+        self.records = np.ndarray((capacity, columns), dtype="<f8", buffer=block.buf, offset=RECORDS_OFFSET)
+
+    def release(self):
+        # The views must be dropped before the block can be closed
+        self.write_count = None
+        self.reserve_count = None
+        self.records = None
+        self.block.close()
+
+class ImuPublisher:
+    '''
+    Owner of a bus. Creates the shared memory block `name` and publishes records of
+    `len(columns)` float64 values.
+    '''
+    def __init__(self, name, capacity=DEFAULT_CAPACITY, columns=CAPTURE_COLUMNS):
+        self.name = name
+        self.columns = tuple(columns)
+        size = RECORDS_OFFSET + capacity * len(self.columns) * 8
+        block = shared_memory.SharedMemory(name=name, create=True, size=size)
+        block.buf[:BUS_HEADER.size] = BUS_HEADER.pack(BUS_MAGIC, BUS_VERSION, capacity, len(self.columns))
+        self.ring = RingView(block, capacity, len(self.columns))
+        self.ring.write_count[0] = 0
+        self.ring.reserve_count[0] = 0
+        self.count = 0
+
+    def publish(self, rows):
+        '''
+        Publish an (N, columns) array-like of records.
+        '''
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.ring.columns)
+        capacity = self.ring.capacity
+        total = len(rows)
+        if total > capacity:
+            # Only the newest records fit, subscribers see the others as dropped
+            rows = rows[-capacity:]
+
+        # Announce the slots about to be overwritten before touching them
+        self.ring.reserve_count[0] = self.count + total
+
+        start = (self.count + total - len(rows)) % capacity
+        end = start + len(rows)
+        if end <= capacity:
+            self.ring.records[start:end] = rows
+        else:
+            split = capacity - start
+            self.ring.records[start:] = rows[:split]
+            self.ring.records[:end - capacity] = rows[split:]
+
+        # Make the records visible only once they are complete
+        self.count += total
+        self.ring.write_count[0] = self.count
+
+    def publish_sample(self, timestamp, acc, gyro):
+        '''
+        Publish a single (time, accel, gyro) record, as returned by the drivers' read().
+        '''
+        index = self.count % self.ring.capacity
+        self.ring.reserve_count[0] = self.count + 1
+        record = self.ring.records[index]
+        record[0] = timestamp
+        record[1:4] = acc
+        record[4:7] = gyro
+        self.count += 1
+        self.ring.write_count[0] = self.count
+
+    def close(self):
+        '''
+        Close and destroy the bus. Subscribers keep their mapping until they close it.
+        '''
+        block = self.ring.block
+        self.ring.release()
+        block.unlink()
+
+class ImuSubscriber:
+    '''
+    Reader attached to the bus `name`. Starts with the next published record, or with the
+    oldest one still in the ring if `from_start` is set.
+    '''
+    def __init__(self, name, from_start=False):
+        block = attach_shared_memory(name)
+        (magic, version, capacity, columns) = BUS_HEADER.unpack(bytes(block.buf[:BUS_HEADER.size]))
+        if magic != BUS_MAGIC or version != BUS_VERSION:
+            block.close()
+            raise ValueError(f"Shared memory block {name} is not an IMU bus")
+        self.ring = RingView(block, capacity, columns)
+
+        written = int(self.ring.write_count[0])
+        self.cursor = max(0, written - capacity) if from_start else written
+        self.dropped = 0
+
+    def read(self, max_records=None):
+        '''
+        Return the records published since the last call, as an (N, columns) array, and the
+        number of records lost because this reader fell too far behind.
+
+        The array is a view of the shared memory when the records are contiguous in the ring
+        and a copy when they wrap around. Views stay valid until the publisher writes
+        `capacity` more records, so consume or copy them before that.
+        '''
+        capacity = self.ring.capacity
+        written = int(self.ring.write_count[0])
+
+        dropped = 0
+        if written - self.cursor > capacity:
+            dropped = written - capacity - self.cursor
+            self.cursor = written - capacity
+
+        end = written if max_records is None else min(written, self.cursor + max_records)
+        start_index = self.cursor % capacity
+        count = end - self.cursor
+        if start_index + count <= capacity:
+            records = self.ring.records[start_index:start_index + count]
+        else:
+            records = np.concatenate((self.ring.records[start_index:], self.ring.records[:start_index + count - capacity]))
+
+        # Records overwritten, or being overwritten, while we were slicing them are lost as well
+        overwritten = min(int(self.ring.reserve_count[0]) - capacity - self.cursor, count)
+        if overwritten > 0:
+            records = records[overwritten:]
+            dropped += overwritten
+
+        self.cursor = end
+        self.dropped += dropped
+        return (records, dropped)
+
+    def close(self):
+        self.ring.release()
+
+class PublishingSensor:
+    '''
+    Wrapper around a BMI323 or LSM6DSV driver that publishes every sample it reads, with
+    the time elapsed since the wrapper was created. Other attributes are forwarded to the
+    wrapped driver.
+    '''
+    def __init__(self, sensor, publisher, clock):
+        self.sensor = sensor
+        self.publisher = publisher
+        self.clock = clock
+        self.start = clock()
+
+    def __getattr__(self, name):
+        return getattr(self.sensor, name)
+
+    def read(self):
+        sample = self.sensor.read()
+        self.publisher.publish_sample(self.clock() - self.start, sample[0], sample[1])
+        return sample
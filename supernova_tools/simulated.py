@@ -0,0 +1,299 @@
+'''
+Simulated Supernova controller for running the examples and tools without hardware.
+
+`SimulatedSupernovaDevice` mimics the parts of `supernovacontroller.sequential.SupernovaDevice`
+used in this repository: an "i3c.controller" interface with a BMI323 and an LSM6DSV on the
+bus, and optionally I2C memories. The sensors produce a new deterministic sample at their
+configured ODR (gravity on Z plus slow oscillations and noise), so reading faster than the
+ODR returns repeated data like the real parts. An optional fixed latency is added to every transaction.
+'''
+import math
+import random
+import struct
+import time
+
+from Bosch_BMI323 import BMI323_definitions as bmi323
+from STMicroelectronics_LSM6DSV import LSM6DSV_definitions as lsm6dsv
+
+class TransferMode:
+    I3C_SDR = "I3C_SDR"
+    I2C_MODE = "I2C_MODE"
+
+class I3cPushPullTransferRate:
+    PUSH_PULL_3_75_MHZ = "PUSH_PULL_3_75_MHZ"
+    PUSH_PULL_12_5_MHZ = "PUSH_PULL_12_5_MHZ"
+
+class I3cOpenDrainTransferRate:
+    OPEN_DRAIN_4_17_MHZ = "OPEN_DRAIN_4_17_MHZ"
+
+class I2cTransferRate:
+    _100KHz = "_100KHz"
+    _400KHz = "_400KHz"
+    _1MHz = "_1MHz"
+
+class SimulatedImu:
+    '''
+    Register model shared by the simulated sensors. Subclasses define the register layout.
+    The sensor clock runs `clock_drift` (relative) faster than the host clock, and the
+    samples are produced at the ODR of the sensor clock.
+    '''
+    pid = None
+    status_register = None
+    status_flags = 0
+    status_bytes = 1
+    data_register = None
+    temperature_register = None
+    time_register = None
+    time_resolution = None
+    register_bytes = 1
+    dummy_bytes = 0
+    accel_first = True
+
+    def __init__(self, dynamic_address, clock, seed, clock_drift=0.0):
+        self.dynamic_address = dynamic_address
+        self.clock = clock
+        self.seed = seed
+        self.clock_drift = clock_drift
+        self.start = clock()
+        self.registers = {}
+        # Index of the last sample read, which clears the data ready flags
+        self.last_read = -1
+
+    def odr(self):
+        raise NotImplementedError
+
+    def resolutions(self):
+        raise NotImplementedError
+
+    def sensor_time(self):
+        return (self.clock() - self.start) * (1.0 + self.clock_drift)
+
+    def sample_index(self):
+        return int(self.sensor_time() * self.odr())
+
+    def raw_sample(self, index):
+        '''
+        Deterministic raw sample number `index`, accelerometer then gyroscope.
+        '''
+        (accel_res, gyro_res) = self.resolutions()
+        rng = random.Random(self.seed * 1000003 + index)
+        t = index / self.odr()
+        accel = (0.05 * math.sin(2 * math.pi * 0.5 * t), 0.05 * math.cos(2 * math.pi * 0.5 * t), 1.0)
+        gyro = (2.0 * math.sin(2 * math.pi * 0.2 * t), 0.5, -0.3)
+        values = [a / accel_res + rng.gauss(0, 20) for a in accel] + [g / gyro_res + rng.gauss(0, 20) for g in gyro]
+        return [max(-32768, min(32767, int(round(v)))) for v in values]
+
+    def section(self, register):
+        '''
+        Bytes of the status, data, temperature or time registers starting at `register`,
+        None for the other registers.
+        '''
+        if register == self.status_register:
+            flags = self.status_flags if self.sample_index() > self.last_read else 0
+            return [flags] + [0] * (self.status_bytes - 1)
+        if register == self.data_register:
+            self.last_read = self.sample_index()
+            raw = self.raw_sample(self.last_read)
+            if not self.accel_first:
+                raw = raw[3:] + raw[:3]
+            return list(struct.pack("<6h", *raw))
+        if register == self.temperature_register:
+            return list(struct.pack("<h", self.raw_temperature()))
+        if register == self.time_register:
+            # Free-running counter, like on the real parts
+            ticks = int(self.sensor_time() / self.time_resolution)
+            return list(struct.pack("<I", ticks & 0xFFFFFFFF))
+        return None
+
+    def read(self, register, length):
+        # Reads continue into the next registers as long as they are modeled
+        section = self.section(register)
+        data = self.read_register(register) if section is None else []
+        while section is not None:
+            data += section
+            if len(data) >= length:
+                break
+            register += len(section) // self.register_bytes
+            section = self.section(register)
+        return ([0] * self.dummy_bytes + data + [0] * length)[:length]
+
+    def read_register(self, register):
+        return list(self.registers.get(register, [0, 0]))
+
+    def write(self, register, data):
+        self.registers[register] = list(data)
+
+    def acknowledge(self):
+        return True
+
+class SimulatedBMI323(SimulatedImu):
+    pid = [f"0x{num:02x}" for num in [0x07, 0x70, 0x10, 0x43, 0x10, 0x00]]
+    status_register = bmi323.BMI323_STATUS
+    status_flags = bmi323.BMI323_STATUS_DRDY_ACC | bmi323.BMI323_STATUS_DRDY_GYR
+    status_bytes = 2
+    data_register = bmi323.BMI323_ACCEL_DATA_X
+    temperature_register = bmi323.BMI323_TEMP_DATA
+    time_register = bmi323.BMI323_SENSOR_TIME
+    time_resolution = bmi323.BMI323_SENSOR_TIME_RESOLUTION
+    register_bytes = 2
+    dummy_bytes = 2
+    accel_first = True
+
+    def config(self, register):
+        return self.registers.get(register, [0x08, 0x00])
+
+    def odr(self):
+        return bmi323.BMI323_ACCEL_ODR_VALUES.get(self.config(bmi323.BMI323_ACCEL_CONFIG_REG)[0] & 0x0F, 100.0)
+
+    def resolutions(self):
+        accel_fs = self.config(bmi323.BMI323_ACCEL_CONFIG_REG)[0] & 0x70
+        gyro_fs = self.config(bmi323.BMI323_GYRO_CONFIG_REG)[0] & 0x70
+        return (bmi323.BMI323_ACCEL_RES_VALUES.get(accel_fs, 2.0 / 32768), bmi323.BMI323_GYRO_RES_VALUES.get(gyro_fs, 250.0 / 32768))
+
+    def raw_temperature(self):
+        return int((26.0 - bmi323.BMI323_TEMP_OFFSET) * bmi323.BMI323_TEMP_SENSITIVITY)
+
+class SimulatedLSM6DSV(SimulatedImu):
+    pid = [f"0x{num:02x}" for num in [0x02, 0x08, 0x00, 0x70, 0x92, 0x0B]]
+    status_register = lsm6dsv.LSM6DSV_STATUS_REG
+    status_flags = lsm6dsv.LSM6DSV_STATUS_XLDA | lsm6dsv.LSM6DSV_STATUS_GDA
+    # The status register is followed by an unused one before the temperature
+    status_bytes = 2
+    data_register = lsm6dsv.LSM6DSV_GYRO_DATA_X
+    temperature_register = lsm6dsv.LSM6DSV_TEMP_DATA
+    time_register = lsm6dsv.LSM6DSV_TIMESTAMP
+    time_resolution = lsm6dsv.LSM6DSV_TIMESTAMP_RESOLUTION
+    register_bytes = 1
+    dummy_bytes = 0
+    accel_first = False
+
+    def config(self, register, default):
+        return self.registers.get(register, [default])[0]
+
+    def odr(self):
+        return lsm6dsv.LSM6DSV_ACCEL_ODR_VALUES.get(self.config(lsm6dsv.LSM6DSV_ACCEL_CONFIG_1_REG, 0x07) & 0x0F) or 240.0
+
+    def resolutions(self):
+        accel_fs = self.config(lsm6dsv.LSM6DSV_ACCEL_CONFIG_2_REG, 0x00)
+        gyro_fs = self.config(lsm6dsv.LSM6DSV_GYRO_CONFIG_2_REG, 0x01)
+        return (lsm6dsv.LSM6DSV_ACCEL_RES_VALUES.get(accel_fs, 2.0 / 32768), lsm6dsv.LSM6DSV_GYRO_RES_VALUES.get(gyro_fs, 250.0 / 32768))
+
+    def raw_temperature(self):
+        return int((27.0 - lsm6dsv.LSM6DSV_TEMP_OFFSET) * lsm6dsv.LSM6DSV_TEMP_SENSITIVITY)
+
+class SimulatedMemory:
+    '''
+    I2C memory described by a `MemoryProfile`. Like the real parts, a write wraps around
+    inside its page and the memory NACKs every transaction during the write cycle.
+    '''
+    pid = None
+
+    def __init__(self, dynamic_address, profile, clock=time.perf_counter):
+        self.dynamic_address = dynamic_address
+        self.profile = profile
+        self.clock = clock
+        self.memory = bytearray(b"\xff" * profile.capacity)
+        self.ready_at = 0.0
+
+    def offset(self, subaddress):
+        subaddress = [subaddress] if isinstance(subaddress, int) else subaddress
+        return int.from_bytes(bytes(subaddress[-self.profile.address_width:]), "big") % self.profile.capacity
+
+    def acknowledge(self):
+        return self.clock() >= self.ready_at
+
+    def read(self, subaddress, length):
+        # The address pointer rolls over at the end of the memory
+        offset = self.offset(subaddress)
+        return [self.memory[(offset + index) % self.profile.capacity] for index in range(length)]
+
+    def write(self, subaddress, data):
+        offset = self.offset(subaddress)
+        page_size = self.profile.page_size or self.profile.capacity
+        page = offset - offset % page_size
+        for (index, value) in enumerate(data):
+            self.memory[page + (offset - page + index) % page_size] = value
+        if self.profile.write_cycle_time:
+            self.ready_at = self.clock() + self.profile.write_cycle_time
+
+class SimulatedI3C:
+    '''
+    Simulated "i3c.controller" interface. `devices` maps addresses to simulated targets.
+    '''
+    TransferMode = TransferMode
+    I3cPushPullTransferRate = I3cPushPullTransferRate
+    I3cOpenDrainTransferRate = I3cOpenDrainTransferRate
+    I2cTransferRate = I2cTransferRate
+
+    def __init__(self, latency=0.0, clock=time.perf_counter):
+        self.latency = latency
+        self.clock = clock
+        self.devices = {}
+        self.transactions = 0
+        # Sensor clocks a few hundred ppm off, as allowed by the datasheets
+        self.add_device(SimulatedBMI323(0x08, clock, seed=1, clock_drift=300e-6))
+        self.add_device(SimulatedLSM6DSV(0x09, clock, seed=2, clock_drift=-500e-6))
+
+    def add_device(self, device):
+        self.devices[device.dynamic_address] = device
+        return device
+
+    def wait(self):
+        self.transactions += 1
+        if self.latency:
+            # Sleep for most of the latency and spin for the rest, to stay accurate at the us scale
+            deadline = self.clock() + self.latency
+            if self.latency > 0.002:
+                time.sleep(self.latency - 0.001)
+            while self.clock() < deadline:
+                pass
+
+    def controller_init(self):
+        return (True, None)
+
+    def set_parameters(self, *args, **kwargs):
+        return (True, None)
+
+    def init_bus(self, voltage=None):
+        return (True, None)
+
+    def targets(self):
+        targets = [{"pid": device.pid, "dynamic_address": address}
+                   for (address, device) in self.devices.items() if device.pid is not None]
+        return (True, targets)
+
+    def read(self, target_address, mode, subaddress, length):
+        self.wait()
+        device = self.devices.get(target_address)
+        if device is None or not device.acknowledge():
+            return (False, "NACK")
+        register = subaddress[0] if len(subaddress) == 1 else subaddress
+        return (True, device.read(register, length))
+
+    def write(self, target_address, mode, subaddress, buffer):
+        self.wait()
+        device = self.devices.get(target_address)
+        if device is None or not device.acknowledge():
+            return (False, "NACK")
+        register = subaddress[0] if len(subaddress) == 1 else subaddress
+        device.write(register, buffer)
+        return (True, None)
+
+class SimulatedSupernovaDevice:
+    '''
+    Stand-in for `SupernovaDevice` returning a SimulatedI3C interface. More targets, e.g.
+    SimulatedMemory instances, can be added with `i3c.add_device()`.
+    '''
+    def __init__(self, latency=0.0):
+        self.i3c = SimulatedI3C(latency)
+
+    def open(self, usb_address=None):
+        return {"name": "Simulated Supernova"}
+
+    def create_interface(self, name):
+        if name != "i3c.controller":
+            raise ValueError(f"Interface {name} is not simulated")
+        return self.i3c
+
+    def close(self):
+        return True
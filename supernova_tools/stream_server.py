@@ -0,0 +1,333 @@
+'''
+Network streaming of IMU samples in batched binary frames.
+
+The server runs an asyncio loop in a background thread and accepts plain TCP clients and
+WebSocket clients (e.g. a browser dashboard). The acquisition thread hands batches of raw
+samples to the loop; each batch is encoded once and queued to every client. Every client
+has its own bounded queue: when a client is too slow its oldest frames are dropped, so it
+never slows down acquisition or the other clients.
+
+Frame format, all little-endian:
+    header:  FRAME_HEADER (see below)
+    payload: `count` float32 time offsets from t0 in seconds, then `count` x 6 int16 raw
+             samples ordered accel X, Y, Z, gyro X, Y, Z
+With FLAG_DELTA the samples after the first one hold the int16 (wrapping) difference with
+the previous sample, and with FLAG_ZLIB the payload is zlib compressed. Converted values
+are `W @ raw - c`, with the 6x6 weights W and the 6 offsets c of the conversion plan of the
+driver in the header, so they match `read()` of the driver whatever the resolution, the
+biases and the correction matrices of the calibration.
+
+Over TCP every frame is preceded by its length as an uint32. Over WebSocket every frame is
+one binary message.
+'''
+import asyncio
+import base64
+import hashlib
+import socket
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+FRAME_MAGIC = b"SNIF"
+FRAME_VERSION = 2
+
+# Frame flags
+FLAG_DELTA = 0x01
+FLAG_ZLIB = 0x02
+
+# magic, version, flags, stream id, sample count, sequence number of the first sample,
+# t0 (s), conversion weights (row-major, for samples ordered accel then gyro) and offsets
+FRAME_HEADER = struct.Struct("<4sBBHIQd36f6f")
+TCP_LENGTH = struct.Struct("<I")
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Frames queued per client before the oldest ones are dropped
+DEFAULT_MAX_QUEUED_FRAMES = 64
+
+def frame_conversion(plan):
+    '''
+    Weights (6x6) and offsets of a conversion plan for raw samples reordered accel then
+    gyro, as sent in the frame header.
+    '''
+    weights = tuple(tuple(row[plan.layout[k]] for k in range(6)) for row in plan.weights)
+    return (weights, plan.offsets)
+
+def encode_frame(stream_id, sequence, times, raw, weights, offsets, flags=0):
+    '''
+    Encode a batch: `times` are the host times of the samples, `raw` an (N, 6) array of
+    int16 samples ordered accel then gyro, and `weights` and `offsets` their conversion,
+    see frame_conversion.
+    '''
+    times = np.asarray(times, dtype=np.float64)
+    raw = np.asarray(raw, dtype=np.int16).reshape(-1, 6)
+    t0 = float(times[0]) if len(times) else 0.0
+
+    samples = raw
+    if flags & FLAG_DELTA and len(raw) > 1:
+        samples = raw.copy()
+        # int16 arithmetic wraps around, which the decoder's cumulative sum undoes
+        samples[1:] = raw[1:] - raw[:-1]
+
+    payload = (times - t0).astype("<f4").tobytes() + samples.astype("<i2").tobytes()
+    if flags & FLAG_ZLIB:
+        payload = zlib.compress(payload, 1)
+
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, flags, stream_id, len(raw), sequence,
+                               t0, *np.ravel(weights), *offsets)
+    return header + payload
+
+def decode_frame(frame):
+    '''
+    Decode a frame into a dict with the header fields, the sample `times` and the `raw`
+    (N, 6) int16 samples.
+    '''
+    (magic, version, flags, stream_id, count, sequence, t0, *conversion) = FRAME_HEADER.unpack_from(frame)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError("Not an IMU stream frame")
+
+    payload = frame[FRAME_HEADER.size:]
+    if flags & FLAG_ZLIB:
+        payload = zlib.decompress(payload)
+
+    times = t0 + np.frombuffer(payload, dtype="<f4", count=count).astype(np.float64)
+    raw = np.frombuffer(payload, dtype="<i2", offset=4 * count).reshape(count, 6)
+    if flags & FLAG_DELTA:
+        raw = np.cumsum(raw, axis=0, dtype=np.int16)
+
+    return {
+        "stream_id": stream_id,
+        "sequence": sequence,
+        "times": times,
+        "raw": raw,
+        "weights": np.array(conversion[:36]).reshape(6, 6),
+        "offsets": np.array(conversion[36:]),
+    }
+
+def convert_frame(frame):
+    '''
+    Physical values (N, 6) of a decoded frame: accel in g then gyro in dps.
+    '''
+    return frame["raw"] @ frame["weights"].T - frame["offsets"]
+
+class StreamClient:
+    '''
+    One connected client and its bounded frame queue.
+    '''
+    def __init__(self, writer, websocket, max_queued_frames):
+        self.writer = writer
+        self.websocket = websocket
+        self.frames = asyncio.Queue(max_queued_frames)
+        self.sender = None
+        self.sent = 0
+        self.dropped = 0
+
+    def enqueue(self, frame):
+        if self.frames.full():
+            # Drop the oldest frame, the client will see a gap in the sequence numbers
+            self.frames.get_nowait()
+            self.dropped += 1
+        self.frames.put_nowait(frame)
+
+    def wrap(self, frame):
+        if not self.websocket:
+            return TCP_LENGTH.pack(len(frame)) + frame
+        # Unmasked binary WebSocket message
+        length = len(frame)
+        if length < 126:
+            header = struct.pack("!BB", 0x82, length)
+        elif length < 65536:
+            header = struct.pack("!BBH", 0x82, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x82, 127, length)
+        return header + frame
+
+    async def send_loop(self):
+        while True:
+            frame = await self.frames.get()
+            self.writer.write(self.wrap(frame))
+            await self.writer.drain()
+            self.sent += 1
+
+class ImuStreamServer:
+    '''
+    Streaming server running in its own thread. `publish` is called from the acquisition
+    thread and returns immediately.
+    '''
+    def __init__(self, host="127.0.0.1", port=9470, websocket_port=None, max_queued_frames=DEFAULT_MAX_QUEUED_FRAMES,
+                 flags=0):
+        self.host = host
+        self.port = port
+        self.websocket_port = websocket_port
+        self.max_queued_frames = max_queued_frames
+        self.flags = flags
+        self.clients = set()
+        self.loop = None
+        self.thread = None
+        self.servers = []
+        self.frames_published = 0
+
+    def start(self):
+        ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        async def start_servers():
+            server = await asyncio.start_server(lambda r, w: self.handle(r, w, False), self.host, self.port)
+            self.port = server.sockets[0].getsockname()[1]
+            self.servers.append(server)
+            if self.websocket_port is not None:
+                server = await asyncio.start_server(lambda r, w: self.handle(r, w, True), self.host, self.websocket_port)
+                self.websocket_port = server.sockets[0].getsockname()[1]
+                self.servers.append(server)
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.run_until_complete(start_servers())
+            ready.set()
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        async def close():
+            for server in self.servers:
+                server.close()
+            senders = [client.sender for client in self.clients]
+            for client in list(self.clients):
+                client.sender.cancel()
+                client.writer.close()
+            await asyncio.gather(*senders, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def publish(self, stream_id, sequence, times, raw, weights, offsets):
+        '''
+        Queue a batch for every client. The frame is encoded once, in the server thread.
+        '''
+        self.loop.call_soon_threadsafe(self.broadcast, stream_id, sequence, times, raw, weights, offsets)
+
+    def broadcast(self, stream_id, sequence, times, raw, weights, offsets):
+        self.frames_published += 1
+        if not self.clients:
+            return
+        frame = encode_frame(stream_id, sequence, times, raw, weights, offsets, self.flags)
+        for client in self.clients:
+            client.enqueue(frame)
+
+    async def handle(self, reader, writer, websocket):
+        if websocket and not await self.websocket_handshake(reader, writer):
+            writer.close()
+            return
+
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        client = StreamClient(writer, websocket, self.max_queued_frames)
+        self.clients.add(client)
+        client.sender = asyncio.ensure_future(client.send_loop())
+        try:
+            # Clients only listen; reading detects when they disconnect
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            client.sender.cancel()
+            writer.close()
+
+    async def websocket_handshake(self, reader, writer):
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            return False
+        key = None
+        for line in request.decode("latin-1").split("\r\n"):
+            (name, _, value) = line.partition(":")
+            if name.strip().lower() == "sec-websocket-key":
+                key = value.strip().encode("ascii")
+        if key is None:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            return False
+        accept = base64.b64encode(hashlib.sha1(key + WEBSOCKET_GUID).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        await writer.drain()
+        return True
+
+class StreamingSensor:
+    '''
+    Wrapper around a BMI323 or LSM6DSV driver that streams the raw samples it reads in
+    batches of `batch_size`. read() still returns converted values; other attributes are
+    forwarded to the wrapped driver. A frame carries a single conversion, so a calibration
+    change ends the current frame.
+    '''
+    def __init__(self, sensor, server, stream_id, clock, batch_size=32):
+        self.sensor = sensor
+        self.server = server
+        self.stream_id = stream_id
+        self.clock = clock
+        self.batch_size = batch_size
+        self.times = []
+        self.raw = []
+        self.sequence = 0
+        self.plan = None
+
+    def __getattr__(self, name):
+        return getattr(self.sensor, name)
+
+    def read(self):
+        raw = self.sensor.read_raw()
+        plan = self.sensor.conversion_plan()
+        if plan is not self.plan:
+            self.flush()
+            self.plan = plan
+        self.times.append(self.clock())
+        self.raw.append(raw)
+        if len(self.raw) >= self.batch_size:
+            self.flush()
+        return plan.convert(raw)
+
+    def flush(self):
+        if not self.raw:
+            return
+        # Reorder the raw samples to accel then gyro, whatever the sensor register layout
+        raw = np.asarray(self.raw, dtype=np.int16)[:, list(self.plan.layout)]
+        (weights, offsets) = frame_conversion(self.plan)
+        self.server.publish(self.stream_id, self.sequence, self.times, raw, weights, offsets)
+        self.sequence += len(self.raw)
+        self.times = []
+        self.raw = []
+
+class ImuStreamClient:
+    '''
+    Blocking TCP client returning decoded frames.
+    '''
+    def __init__(self, host="127.0.0.1", port=9470):
+        self.socket = socket.create_connection((host, port))
+        self.file = self.socket.makefile("rb")
+
+    def receive(self):
+        header = self.file.read(TCP_LENGTH.size)
+        if len(header) < TCP_LENGTH.size:
+            return None
+        (length,) = TCP_LENGTH.unpack(header)
+        return decode_frame(self.file.read(length))
+
+    def close(self):
+        # Shutting the socket down first wakes up a thread blocked in receive()
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+        self.file.close()
@@ -0,0 +1,167 @@
+'''
+Retry and error-recovery layer for Supernova I3C/I2C transfers.
+
+`RetryingI3C` wraps an "i3c.controller" interface. A successful transfer costs one extra
+tuple check compared to calling the interface directly; only failures pay for the retry
+bookkeeping. Failure state is kept per target address, so a misbehaving target backs off
+without delaying transfers to other targets issued from other threads, and the whole bus
+is only re-initialized after repeated consecutive failures. `ReaderThreads` gives every
+target of an acquisition loop its own thread, so the backoff of a failing sensor never
+delays the reads of the others.
+'''
+import threading
+import time
+
+class TransferError(IOError):
+    '''
+    Raised when a transfer still fails after all the retries. `offset` is the position of
+    the first byte that was not transferred when the error comes from a chunked transfer.
+    '''
+    def __init__(self, message, target_address=None, offset=None):
+        super().__init__(message)
+        self.target_address = target_address
+        self.offset = offset
+
+class RetryPolicy:
+    '''
+    Bounded retries with exponential backoff.
+    - max_attempts: total number of attempts per transfer, including the first one.
+    - base_delay, max_delay: backoff before the n-th retry is min(base_delay * 2^(n-1), max_delay) seconds.
+    - reinit_after: consecutive failures on a target before the bus is re-initialized.
+    '''
+    def __init__(self, max_attempts=4, base_delay=0.001, max_delay=0.05, reinit_after=3):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.reinit_after = reinit_after
+
+    def delay(self, retry):
+        return min(self.base_delay * (2 ** (retry - 1)), self.max_delay)
+
+class RetryingI3C:
+    '''
+    Drop-in wrapper around an "i3c.controller" interface that retries failed reads and
+    writes. On success it returns the same (success, data) tuple as the interface, after
+    exhausting the retries it raises TransferError instead of returning invalid data.
+    Any other attribute is forwarded to the wrapped interface.
+    '''
+    def __init__(self, i3c, policy=None, bus_voltage=3300):
+        self.i3c = i3c
+        self.policy = policy or RetryPolicy()
+        self.bus_voltage = bus_voltage
+        self.consecutive_failures = {}
+        self.bus_generation = 0
+        self.reinit_lock = threading.Lock()
+        self.retries = 0
+        self.bus_reinits = 0
+
+    def __getattr__(self, name):
+        return getattr(self.i3c, name)
+
+    def read(self, target_address, mode, subaddress, length):
+        (success, data) = self.i3c.read(target_address, mode, subaddress, length)
+        if success:
+            if self.consecutive_failures.get(target_address):
+                self.consecutive_failures[target_address] = 0
+            return (success, data)
+        return self.__retry(self.i3c.read, "read", target_address, mode, subaddress, length)
+
+    def write(self, target_address, mode, subaddress, buffer):
+        (success, result) = self.i3c.write(target_address, mode, subaddress, buffer)
+        if success:
+            if self.consecutive_failures.get(target_address):
+                self.consecutive_failures[target_address] = 0
+            return (success, result)
+        return self.__retry(self.i3c.write, "write", target_address, mode, subaddress, buffer)
+
+    def __retry(self, transfer, operation, target_address, mode, subaddress, payload):
+        '''
+        Slow path, only entered after a failed transfer.
+        '''
+        result = None
+        for retry in range(1, self.policy.max_attempts):
+            failures = self.consecutive_failures.get(target_address, 0) + 1
+            self.consecutive_failures[target_address] = failures
+            if failures >= self.policy.reinit_after:
+                self.__reinit_bus()
+                self.consecutive_failures[target_address] = 0
+
+            # Only the thread talking to this target sleeps
+            time.sleep(self.policy.delay(retry))
+            self.retries += 1
+
+            (success, result) = transfer(target_address, mode, subaddress, payload)
+            if success:
+                self.consecutive_failures[target_address] = 0
+                return (success, result)
+
+        self.consecutive_failures[target_address] = self.consecutive_failures.get(target_address, 0) + 1
+        raise TransferError(f"I3C {operation} to target 0x{target_address:02x} failed after "
+                            f"{self.policy.max_attempts} attempts: {result}", target_address)
+
+    def __reinit_bus(self):
+        '''
+        Re-initialize the bus once, even if several threads detect failures at the same time.
+        '''
+        generation = self.bus_generation
+        with self.reinit_lock:
+            if generation != self.bus_generation:
+                # Another thread already re-initialized the bus while we were waiting
+                return
+            self.i3c.init_bus(self.bus_voltage)
+            self.bus_generation += 1
+            self.bus_reinits += 1
+
+class ReaderThreads:
+    '''
+    Call every function of `reads`, typically the read() of one sensor each, in a loop of
+    its own daemon thread until `stop` is called. An IOError (retries exhausted) is passed
+    to `on_error` and the loop continues; without `on_error`, or on any other exception,
+    every loop stops and `stop` re-raises the error.
+    '''
+    def __init__(self, reads, on_error=None):
+        self.on_error = on_error
+        self.stopping = threading.Event()
+        self.error = None
+        self.threads = [threading.Thread(target=self.__loop, args=(read,), daemon=True) for read in reads]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __loop(self, read):
+        stopping = self.stopping
+        while not stopping.is_set():
+            try:
+                read()
+            except IOError as error:
+                if self.on_error is None:
+                    self.__fail(error)
+                else:
+                    self.on_error(error)
+            except Exception as error:
+                self.__fail(error)
+
+    def __fail(self, error):
+        if self.error is None:
+            self.error = error
+        self.stopping.set()
+
+    def wait(self):
+        '''
+        Block until a loop fails or Ctrl+C is pressed. The main thread keeps handling
+        KeyboardInterrupt because it only waits with a timeout.
+        '''
+        try:
+            while not self.stopping.wait(0.2):
+                pass
+        except KeyboardInterrupt:
+            pass
+
+    def stop(self):
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
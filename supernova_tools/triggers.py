@@ -0,0 +1,194 @@
+'''
+Event triggers on the capture path.
+
+Shock and vibration tests only need the data around events, but the events are short and
+need the maximum ODR. `TriggerEngine` evaluates thresholds on every batch of converted
+rows (time, accel X/Y/Z in g, gyro X/Y/Z in dps) with a few vectorized NumPy operations
+and returns only the rows around the rows that fired:
+- `accel`: magnitude of the acceleration, in g,
+- `jerk`: magnitude of the derivative of the acceleration, in g/s,
+- `gyro`: magnitude of the angular rate, in dps.
+
+Windows are measured on the time column: a window starts `pre` seconds before the first
+row that fired and ends `post` seconds after the last one, across batch boundaries, so they
+do not depend on how regularly the samples were read. The rows not saved yet are kept in a
+preallocated circular buffer of `pending_rows` rows, which must hold `pre` seconds of
+samples. Overlapping windows are merged. Consecutive rows that fire count as one event.
+'''
+import numpy as np
+
+from supernova_tools.segments import SampleWindow
+
+TIME_COLUMN = 0
+ACCEL_COLUMNS = slice(1, 4)
+GYRO_COLUMNS = slice(4, 7)
+
+class AccelMagnitude:
+    unit = "g"
+
+    def __call__(self, data):
+        return np.sqrt(np.sum(data[:, ACCEL_COLUMNS] ** 2, axis=1))
+
+class JerkMagnitude:
+    '''
+    Change of acceleration between consecutive distinct samples divided by the time between
+    their first reads. Reading faster than the ODR returns the same sample several times;
+    the repeats are skipped rather than seen as no change followed by a jump over a single
+    read interval. State carries over from one batch to the next.
+    '''
+    unit = "g/s"
+
+    def __init__(self):
+        self.previous_accel = None
+        # First read of the last distinct sample
+        self.previous_time = None
+
+    def __call__(self, data):
+        accel = data[:, ACCEL_COLUMNS]
+        times = data[:, TIME_COLUMN]
+        if self.previous_accel is None:
+            (self.previous_accel, self.previous_time) = (accel[0], times[0])
+
+        steps = np.diff(accel, axis=0, prepend=self.previous_accel[None, :])
+        changed = np.any(steps != 0, axis=1)
+        change_times = np.where(changed, times, -np.inf)
+        # Time of the previous distinct sample, for every row
+        last_change = np.maximum.accumulate(np.concatenate(([self.previous_time], change_times[:-1])))
+        intervals = times - last_change
+        with np.errstate(divide="ignore", invalid="ignore"):
+            jerk = np.sqrt(np.sum(steps ** 2, axis=1)) / intervals
+
+        self.previous_accel = accel[-1].copy()
+        self.previous_time = max(self.previous_time, float(change_times.max()))
+        return np.where(changed & (intervals > 0), jerk, 0.0)
+
+class GyroMagnitude:
+    unit = "dps"
+
+    def __call__(self, data):
+        return np.sqrt(np.sum(data[:, GYRO_COLUMNS] ** 2, axis=1))
+
+TRIGGER_METRICS = {
+    "accel": AccelMagnitude,
+    "jerk": JerkMagnitude,
+    "gyro": GyroMagnitude,
+}
+
+class Trigger:
+    '''
+    Fires on the rows where `metric` exceeds `threshold`.
+    '''
+    def __init__(self, metric, threshold):
+        if metric not in TRIGGER_METRICS:
+            raise ValueError(f"Unknown trigger metric '{metric}', use one of: {', '.join(TRIGGER_METRICS)}")
+        self.metric = metric
+        self.threshold = threshold
+        self.function = TRIGGER_METRICS[metric]()
+        self.unit = self.function.unit
+        self.events = 0
+
+    @classmethod
+    def parse(cls, specification):
+        '''
+        Trigger from a "metric:threshold" string, e.g. "accel:4" or "gyro:500".
+        '''
+        (metric, _, threshold) = specification.partition(":")
+        try:
+            threshold = float(threshold)
+        except ValueError:
+            raise ValueError(f"Invalid trigger '{specification}', expected metric:threshold, e.g. accel:4") from None
+        return cls(metric, threshold)
+
+    def __str__(self):
+        return f"{self.metric} > {self.threshold:g} {self.unit}"
+
+class TriggerEvent:
+    def __init__(self, time, trigger, value):
+        self.time = time
+        self.trigger = trigger
+        self.value = value
+
+class TriggerEngine:
+    '''
+    Keeps the rows of (N, columns) batches whose time is within `pre` seconds before and
+    `post` seconds after a row where any of `triggers` fires. `pending_rows` bounds the
+    rows kept for the pre-trigger data, e.g. twice `pre` times the ODR.
+    '''
+    def __init__(self, triggers, pre, post, pending_rows, columns=7):
+        self.triggers = list(triggers)
+        self.pre = pre
+        self.post = post
+        self.columns = columns
+        # Rows not saved yet that may still start a window
+        self.pending = SampleWindow(pending_rows, columns) if pre > 0 and pending_rows else None
+        # Time until which the rows are kept because of earlier batches
+        self.window_end = -np.inf
+        self.previous_fired = np.zeros(len(self.triggers), dtype=bool)
+        self.events = []
+        self.rows_seen = 0
+        self.rows_kept = 0
+
+    def detect(self, data):
+        '''
+        Mask of the rows where any trigger fires, recording an event on every rising edge.
+        '''
+        fired_any = np.zeros(len(data), dtype=bool)
+        for (number, trigger) in enumerate(self.triggers):
+            values = trigger.function(data)
+            fired = values > trigger.threshold
+            fired_any |= fired
+            if not fired.any():
+                self.previous_fired[number] = False
+                continue
+            rising = np.flatnonzero(fired & ~np.concatenate(([self.previous_fired[number]], fired[:-1])))
+            for row in rising:
+                self.events.append(TriggerEvent(float(data[row, TIME_COLUMN]), trigger, float(values[row])))
+            trigger.events += len(rising)
+            self.previous_fired[number] = fired[-1]
+        return fired_any
+
+    def process(self, data):
+        '''
+        Evaluate the triggers on a batch and return the rows to save, as an (M, columns) array
+        in time order, possibly including pending rows of previous batches.
+        '''
+        data = np.asarray(data, dtype=np.float64).reshape(-1, self.columns)
+        if not len(data):
+            return data
+        self.rows_seen += len(data)
+        fired = self.detect(data)
+
+        pending = self.pending.latest() if self.pending is not None else np.empty((0, self.columns))
+        rows = np.concatenate((pending, data)) if len(pending) else data
+        times = rows[:, TIME_COLUMN]
+
+        # A row is inside a window when more windows started than ended before its time;
+        # the windows have the same length, so their starts and ends are in the same order
+        fired_times = data[fired, TIME_COLUMN]
+        started = np.searchsorted(fired_times - self.pre, times, side="right")
+        ended = np.searchsorted(fired_times + self.post, times, side="left")
+        keep = (started > ended) | (times <= self.window_end)
+        if len(fired_times):
+            self.window_end = max(self.window_end, float(fired_times[-1]) + self.post)
+
+        if self.pending is not None:
+            kept = np.flatnonzero(keep)
+            if len(kept):
+                # Only the rows after the last saved one can start the next window
+                self.pending.clear()
+                self.pending.extend(rows[kept[-1] + 1:])
+            else:
+                self.pending.extend(data)
+
+        saved = rows[keep]
+        self.rows_kept += len(saved)
+        return saved
+
+    def kept_fraction(self):
+        return self.rows_kept / self.rows_seen if self.rows_seen else 0.0
+
+    def summary(self):
+        lines = [f"{len(self.events)} trigger events, kept {self.rows_kept} of {self.rows_seen} samples "
+                 f"({100 * self.kept_fraction():.2f}%)"]
+        lines += [f"  {trigger}: {trigger.events} events" for trigger in self.triggers]
+        return "\n".join(lines)
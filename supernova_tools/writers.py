@@ -0,0 +1,191 @@
+'''
+Batch writers for headless IMU captures.
+
+Every writer receives batches of rows (tuples with one value per column) and is driven
+from a `BatchWriterThread`, so encoding and disk I/O never run in the acquisition loop.
+The Parquet writer imports pyarrow lazily, only when that format is requested.
+'''
+import csv
+import os
+import queue
+import struct
+import sys
+import threading
+from array import array
+
+# Columns of a capture row: host time in seconds followed by the converted sensor data
+CAPTURE_COLUMNS = ("time", "accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")
+
+# Binary capture header: magic, format version and number of float64 columns per row,
+# followed by the column names separated by commas
+BINARY_MAGIC = b"SNIMU\x00"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<6sHH")
+
+class CsvCaptureWriter:
+    '''
+    Plain text output, one row per sample.
+    '''
+    def __init__(self, path, columns=CAPTURE_COLUMNS):
+        self.path = path
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write_batch(self, rows):
+        self.writer.writerows(rows)
+
+    def write_array(self, data):
+        self.writer.writerows(data.tolist())
+
+    def close(self):
+        self.file.close()
+
+class BinaryCaptureWriter:
+    '''
+    Compact output made of little-endian float64 rows after a small header. It can be read
+    back with `read_binary_capture` or with `numpy.fromfile(path, "<f8", offset=header_size)`.
+    '''
+    def __init__(self, path, columns=CAPTURE_COLUMNS):
+        self.path = path
+        self.file = open(path, "wb")
+        names = ",".join(columns).encode("ascii")
+        self.file.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(columns)))
+        self.file.write(struct.pack("<H", len(names)) + names)
+        self.header_size = self.file.tell()
+
+    def write_batch(self, rows):
+        values = array("d", [value for row in rows for value in row])
+        if sys.byteorder == "big":
+            values.byteswap()
+        values.tofile(self.file)
+
+    def write_array(self, data):
+        '''
+        Write an (N, columns) NumPy array without going through Python floats.
+        '''
+        data.astype("<f8", copy=False).tofile(self.file)
+
+    def close(self):
+        self.file.close()
+
+def read_binary_header(file):
+    '''
+    Read the header of a binary capture open in `file`. Returns the column names and the
+    header size, which is the offset of the first row.
+    '''
+    (magic, version, column_count) = BINARY_HEADER.unpack(file.read(BINARY_HEADER.size))
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"{file.name} is not a binary capture file")
+    (names_length,) = struct.unpack("<H", file.read(2))
+    columns = tuple(file.read(names_length).decode("ascii").split(","))
+    return (columns, file.tell())
+
+def read_binary_capture(path):
+    '''
+    Read a binary capture back. Returns the column names and the list of rows.
+    '''
+    with open(path, "rb") as file:
+        (columns, _) = read_binary_header(file)
+        column_count = len(columns)
+        values = array("d")
+        values.frombytes(file.read())
+    if sys.byteorder == "big":
+        values.byteswap()
+    rows = [tuple(values[i:i + column_count]) for i in range(0, len(values), column_count)]
+    return (columns, rows)
+
+class ParquetCaptureWriter:
+    '''
+    Columnar output, one row group per batch. Requires pyarrow.
+    '''
+    def __init__(self, path, columns=CAPTURE_COLUMNS):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ImportError("Parquet output requires pyarrow, install it with 'pip install pyarrow'") from error
+        self.pyarrow = pyarrow
+        self.path = path
+        self.columns = columns
+        self.schema = pyarrow.schema([(name, pyarrow.float64()) for name in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_batch(self, rows):
+        if not len(rows):
+            return
+        arrays = [self.pyarrow.array(column, type=self.pyarrow.float64()) for column in zip(*rows)]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def write_array(self, data):
+        if not len(data):
+            return
+        arrays = [self.pyarrow.array(data[:, i], type=self.pyarrow.float64()) for i in range(len(self.columns))]
+        self.writer.write_table(self.pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+CAPTURE_WRITERS = {
+    "csv": CsvCaptureWriter,
+    "bin": BinaryCaptureWriter,
+    "parquet": ParquetCaptureWriter,
+}
+
+def open_capture_writer(path, format=None, columns=CAPTURE_COLUMNS):
+    '''
+    Open a writer for `path`. The format is taken from the file extension unless given.
+    '''
+    if format is None:
+        format = os.path.splitext(path)[1].lstrip(".").lower()
+    writer_class = CAPTURE_WRITERS.get(format)
+    if writer_class is None:
+        raise ValueError(f"Unknown capture format '{format}', use one of: {', '.join(CAPTURE_WRITERS)}")
+    return writer_class(path, columns)
+
+class BatchWriterThread(threading.Thread):
+    '''
+    Background thread feeding batches to a writer. `submit` only blocks when `max_batches`
+    batches are already waiting, which means the disk cannot keep up with acquisition.
+    The optional `transform` is applied to every batch in this thread before writing it,
+    e.g. to convert raw samples. An exception raised by the writer is re-raised by `close`.
+    '''
+    def __init__(self, writer, max_batches=64, transform=None):
+        super().__init__(daemon=True)
+        self.writer = writer
+        self.transform = transform
+        self.batches = queue.Queue(max_batches)
+        self.rows_written = 0
+        self.error = None
+        self.start()
+
+    def submit(self, rows):
+        if self.error is not None:
+            raise self.error
+        self.batches.put(rows)
+
+    def run(self):
+        while True:
+            rows = self.batches.get()
+            if rows is None:
+                break
+            if self.error is not None:
+                # Keep draining the queue so the acquisition loop never blocks
+                continue
+            try:
+                if self.transform is not None:
+                    rows = self.transform(rows)
+                if not len(rows):
+                    # A transform may keep nothing of a batch
+                    continue
+                self.writer.write_batch(rows)
+                self.rows_written += len(rows)
+            except Exception as error:
+                self.error = error
+
+    def close(self):
+        self.batches.put(None)
+        self.join()
+        self.writer.close()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from supernova_tools.alignment import StreamAligner
+
+RESOLUTION = 1e-6
+
+def reads(count, reads_per_sample):
+    '''
+    Reads of a 100 Hz stream polled `reads_per_sample` times per sample, with a free-running
+    sensor time counter: (ticks, values, host times, data-ready flags).
+    '''
+    read_times = np.arange(count * reads_per_sample) * (0.01 / reads_per_sample)
+    samples = np.arange(len(read_times)) // reads_per_sample
+    values = np.column_stack([np.sin(samples * 0.01 * 2 * np.pi)] * 6)
+    ready = np.arange(len(read_times)) % reads_per_sample == 0
+    return (np.round(read_times / RESOLUTION).astype(np.int64), values, read_times + 0.001, ready)
+
+@pytest.mark.parametrize("use_flags", [True, False])
+def test_repeated_reads_are_dropped_with_free_running_counters(use_flags):
+    aligner = StreamAligner([RESOLUTION], 100.0)
+    (ticks, values, host_times, ready) = reads(200, 4)
+    for start in range(0, len(ticks), 64):
+        part = slice(start, start + 64)
+        aligner.push(0, ticks[part], values[part], host_times[part], ready[part] if use_flags else None)
+
+    assert aligner.duplicates() == [600]
+    rows = aligner.pop()
+    # Every sample is timed by its first read, so the output grid falls on the samples
+    assert len(rows) == 200
+    np.testing.assert_allclose(np.diff(rows[:, 0]), 0.01)
+    np.testing.assert_allclose(rows[:, 1], np.sin(np.arange(200) * 0.01 * 2 * np.pi), atol=1e-9)
@@ -0,0 +1,29 @@
+import pytest
+
+from supernova_tools.benchmark import BenchmarkResult, ResultsStore, compare, run_to_run_noise
+
+def result(median, spread=0.0):
+    return BenchmarkResult("fram_read", "bytes/s", True, [median * (1 + spread * k) for k in (-1, 0, 1)])
+
+def test_run_to_run_noise_ignores_a_single_step():
+    # Alternating runs of +-4% around the median, then a 30% step between two commits
+    medians = [100.0, 104.0, 96.0, 104.0, 96.0, 130.0, 126.0, 134.0]
+    assert run_to_run_noise(medians[:5]) == pytest.approx(1.4826 * 8 / 2 ** 0.5 / 100, rel=1e-6)
+    assert run_to_run_noise(medians) < 0.1
+    assert run_to_run_noise(medians[:2]) == 0.0
+
+def test_run_to_run_noise_prevents_false_regressions():
+    baseline = {"fram_read": result(100.0)}
+    current = {"fram_read": result(93.0)}
+    assert compare(baseline, current)[0].regression
+    assert not compare(baseline, current, run_noise={"fram_read": 0.04})[0].regression
+
+def test_store_run_noise_uses_clean_runs(tmp_path):
+    store = ResultsStore(str(tmp_path / "benchmarks.sqlite"))
+    for (number, median) in enumerate([100.0, 104.0, 96.0, 104.0]):
+        store.save(f"commit{number}", False, [result(median)])
+    store.save("dirty", True, [result(10.0)])
+    noise = store.run_noise(["fram_read", "decode_batch"])
+    store.close()
+    assert noise["fram_read"] == pytest.approx(1.4826 * 8 / 2 ** 0.5 / 102, rel=1e-6)
+    assert noise["decode_batch"] == 0.0
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from supernova_tools.calibration import (SIX_POSITIONS, StationaryWindow, fit_accel_ellipsoid, fit_accel_six_position,
+                                         fit_gyro_temperature)
+
+BIAS = np.array([0.02, -0.03, 0.05])
+
+def windows_for(gravities, matrix, noise=0.001, samples=200, temperature=25.0):
+    '''
+    Stationary windows of an accelerometer with `BIAS` and correction `matrix`: the
+    calibrated value matrix @ (measured - BIAS) is the gravity vector of each window.
+    '''
+    rng = np.random.default_rng(3)
+    inverse = np.linalg.inv(matrix)
+    windows = []
+    for gravity in gravities:
+        measured = inverse @ np.asarray(gravity, dtype=np.float64) + BIAS
+        accel = measured + rng.normal(0, noise, (samples, 3))
+        windows.append(StationaryWindow(accel, rng.normal(0, 0.01, (samples, 3)), temperature))
+    return windows
+
+def test_six_position_recovers_bias_and_matrix():
+    matrix = np.array([[1.02, 0.01, -0.004], [0.006, 0.97, 0.008], [-0.01, 0.003, 1.01]])
+    references = [reference for (_, reference) in SIX_POSITIONS]
+
+    (bias, fitted, residual) = fit_accel_six_position(windows_for(references, matrix), references)
+
+    np.testing.assert_allclose(bias, BIAS, atol=1e-3)
+    np.testing.assert_allclose(fitted, matrix, atol=1e-3)
+    assert residual < 0.002
+
+def test_six_position_needs_three_axes():
+    references = [(0.0, 0.0, 1.0), (0.0, 0.0, -1.0)]
+    with pytest.raises(ValueError):
+        fit_accel_six_position(windows_for(references, np.eye(3)), references)
+
+def test_ellipsoid_recovers_bias_and_symmetric_matrix():
+    # Only the symmetric part of the correction is observable without known orientations
+    matrix = np.array([[1.03, 0.01, -0.005], [0.01, 0.98, 0.007], [-0.005, 0.007, 1.01]])
+    directions = np.random.default_rng(4).normal(size=(12, 3))
+    gravities = directions / np.linalg.norm(directions, axis=1)[:, None]
+
+    (bias, fitted, residual) = fit_accel_ellipsoid(windows_for(gravities, matrix))
+
+    np.testing.assert_allclose(bias, BIAS, atol=2e-3)
+    np.testing.assert_allclose(fitted, matrix, atol=2e-3)
+    assert residual < 0.002
+
+def test_gyro_bias_follows_temperature():
+    windows = []
+    for temperature in (20.0, 25.0, 30.0, 35.0):
+        gyro = np.tile([0.1 + 0.02 * temperature, -0.3, 0.05 * temperature], (100, 1))
+        windows.append(StationaryWindow(np.zeros((100, 3)), gyro, temperature))
+
+    model = fit_gyro_temperature(windows)
+    np.testing.assert_allclose(model.bias_at(40.0), [0.9, -0.3, 2.0], atol=1e-9)
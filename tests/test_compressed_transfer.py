@@ -0,0 +1,45 @@
+import pytest
+
+from supernova_tools.compressed_transfer import read_compressed, write_compressed
+from supernova_tools.memory_device import FRAM_MB85RC256V, MemoryDevice, open_supernova
+from supernova_tools.transport import RetryingI3C, TransferError
+
+ADDRESS = 0x50
+
+class InterruptedMemory:
+    '''
+    MemoryDevice proxy whose writes fail after `writes` successful ones.
+    '''
+    def __init__(self, memory, writes):
+        self.memory = memory
+        self.writes = writes
+
+    def write(self, offset, data):
+        if self.writes == 0:
+            raise TransferError("Interrupted", ADDRESS, offset)
+        self.writes -= 1
+        self.memory.write(offset, data)
+
+@pytest.fixture
+def memory():
+    device = open_supernova(True, [ADDRESS], FRAM_MB85RC256V)
+    device.open()
+    i3c = RetryingI3C(device.create_interface("i3c.controller"))
+    i3c.init_bus(3300)
+    yield MemoryDevice(i3c, ADDRESS, FRAM_MB85RC256V)
+    device.close()
+
+def test_round_trip(memory):
+    data = b"Binho Supernova " * 500
+    write_compressed(memory, 16, data, "lzma")
+    assert read_compressed(memory, 16)[0] == data
+
+@pytest.mark.parametrize("writes", [1, 2, 4])
+def test_interrupted_rewrite_leaves_no_valid_container(memory, writes):
+    write_compressed(memory, 0, b"old container " * 400, "none")
+
+    with pytest.raises(TransferError):
+        write_compressed(InterruptedMemory(memory, writes), 0, bytes(range(256)) * 40, "none")
+
+    with pytest.raises(ValueError, match="No compressed container"):
+        read_compressed(memory, 0)
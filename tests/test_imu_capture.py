@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "IMU_headless_capture"))
+import imu_capture
+
+@pytest.mark.parametrize("sensor", ["bmi323", "lsm6dsv"])
+def test_power_down_odr_is_rejected(tmp_path, capsys, sensor):
+    out = str(tmp_path / "capture.bin")
+    assert imu_capture.main(["--sensor", sensor, "--odr", "0", "--duration", "0.1", "--out", out, "--simulate"]) == 2
+    assert "Unsupported accelerometer ODR 0" in capsys.readouterr().out
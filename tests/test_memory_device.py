@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from supernova_tools.memory_device import EEPROM_24LC256, FRAM_MB85RC256V, MemoryDevice, write_segments
+from supernova_tools.simulated import SimulatedMemory, SimulatedSupernovaDevice
+from supernova_tools.transport import TransferError
+
+ADDRESS = 0x50
+
+def open_memory(profile, **kwargs):
+    '''
+    MemoryDevice on the simulated interface without retries, so a transaction issued during
+    a write cycle fails instead of being retried.
+    '''
+    device = SimulatedSupernovaDevice()
+    device.open()
+    i3c = device.create_interface("i3c.controller")
+    simulated = i3c.add_device(SimulatedMemory(ADDRESS, profile))
+    return (MemoryDevice(i3c, ADDRESS, profile, **kwargs), simulated)
+
+def test_write_segments_stop_at_page_boundaries():
+    assert write_segments(60, 100, 64, 64) == [(60, 4), (64, 64), (128, 32)]
+    assert write_segments(60, 100, None, 64) == [(60, 64), (124, 36)]
+    assert write_segments(0, 0, 64, 64) == []
+
+def test_unaligned_write_across_pages():
+    (memory, simulated) = open_memory(EEPROM_24LC256)
+    data = bytes(range(256)) * 2
+    offset = 1000
+
+    start = time.perf_counter()
+    memory.write(offset, data)
+    elapsed = time.perf_counter() - start
+
+    segments = write_segments(offset, len(data), EEPROM_24LC256.page_size, memory.max_write_transfer)
+    assert memory.transactions == len(segments) == 9
+    # Every write after the first one waited for the write cycle of the previous one
+    assert elapsed >= (len(segments) - 1) * EEPROM_24LC256.write_cycle_time
+    assert simulated.memory[offset:offset + len(data)] == data
+    assert memory.verify(offset, data) is None
+
+def test_transaction_during_write_cycle_fails_without_waiting():
+    (memory, _) = open_memory(EEPROM_24LC256)
+    memory.write(0, b"\x01")
+    memory.ready_at = 0.0
+    with pytest.raises(TransferError) as error:
+        memory.write(64, b"\x02")
+    assert error.value.offset == 64
+
+def test_partially_cached_read():
+    (memory, simulated) = open_memory(FRAM_MB85RC256V)
+    simulated.memory[:600] = bytes(range(200)) * 3
+
+    assert memory.read(100, 50) == simulated.memory[100:150]
+    assert memory.transactions == 1
+
+    # Only the two missing runs are fetched, [0, 100) and [150, 600) in two reads of 250 bytes
+    assert memory.read(0, 600) == simulated.memory[:600]
+    assert memory.transactions == 1 + 1 + 2
+
+    # Everything is cached now
+    assert memory.read(0, 600) == simulated.memory[:600]
+    assert memory.transactions == 4
+
+def test_verify_after_out_of_band_change():
+    (memory, simulated) = open_memory(FRAM_MB85RC256V)
+    data = b"Binho Supernova" * 10
+    memory.write(20, data)
+
+    simulated.memory[25] ^= 0xFF
+
+    # The cache still holds the written data, verify reads the memory itself
+    assert memory.read(20, len(data)) == data
+    assert memory.verify(20, data) == 25
+
+    memory.invalidate()
+    assert memory.read(20, len(data)) == bytes(simulated.memory[20:20 + len(data)])
@@ -0,0 +1,43 @@
+from supernova_tools.metrics import InstrumentedSensor, MetricsRegistry
+
+class ScriptedSensor:
+    '''
+    read_raw_ready returning the scripted data-ready flags, one per read.
+    '''
+    def __init__(self, flags):
+        self.flags = list(flags)
+
+    def read_raw_ready(self):
+        return (self.flags.pop(0), [0] * 6)
+
+    def conversion_plan(self):
+        return self
+
+    def convert(self, raw):
+        return ([0.0] * 3, [0.0] * 3)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_poll_counts_stale_reads_and_missed_samples():
+    registry = MetricsRegistry()
+    clock = FakeClock()
+    sensor = InstrumentedSensor(ScriptedSensor([True, False, True, True]), registry, "imu", odr=100.0, clock=clock)
+
+    assert sensor.poll() is not None
+    assert sensor.poll() is None
+    clock.now += 0.0102
+    sensor.poll()
+    # Three sample periods without a read, two samples were never read
+    clock.now += 0.0297
+    sensor.poll()
+
+    assert sensor.reads.value == 4
+    assert sensor.samples.value == 3
+    assert sensor.stale.value == 1
+    assert sensor.missed.value == 2
+    assert 'imu_missed_samples_total{sensor="imu"} 2' in registry.render()
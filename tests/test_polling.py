@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+
+from supernova_tools.polling import AdaptivePoller
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "IMU_headless_capture"))
+import imu_capture
+
+class StuckSensor:
+    '''
+    read_raw_ready of a sensor that reports `samples` new samples and then stops.
+    '''
+    def __init__(self, samples):
+        self.samples = samples
+
+    def read_raw_ready(self):
+        if self.samples == 0:
+            return (False, [0] * 6)
+        self.samples -= 1
+        return (True, [self.samples] * 6)
+
+class CollectingWriterThread:
+    def __init__(self):
+        self.rows = []
+
+    def submit(self, batch):
+        self.rows.extend(batch)
+
+def test_poll_returns_none_at_deadline():
+    poller = AdaptivePoller(StuckSensor(0).read_raw_ready, 0.01)
+    start = time.perf_counter()
+    assert poller.poll(start + 0.05) is None
+    assert time.perf_counter() - start < 1.0
+    assert poller.stats.timeouts == 1
+    assert poller.stats.samples == 0
+
+def test_poll_without_deadline_returns_sample():
+    poller = AdaptivePoller(StuckSensor(1).read_raw_ready, 0.01)
+    (_, data) = poller.poll()
+    assert data == [0] * 6
+    assert poller.stats.samples == 1
+
+def test_capture_stops_when_sensor_stops():
+    poller = AdaptivePoller.for_sensor(StuckSensor(10), 1000.0)
+    writer_thread = CollectingWriterThread()
+    start = time.perf_counter()
+    (samples, _, elapsed) = imu_capture.capture_data_ready(poller, writer_thread, 0.2, 4)
+    assert time.perf_counter() - start < 2.0
+    assert samples == len(writer_thread.rows) == 10
+    assert poller.stats.timeouts == 1
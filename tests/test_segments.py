@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from supernova_tools.segments import SegmentIndex, SegmentedCaptureWriter
+
+def capture_rows(count):
+    data = np.random.default_rng(1).normal(size=(count, 7))
+    data[:, 0] = np.arange(count) / 1600.0
+    return data
+
+@pytest.mark.parametrize("format", ["bin", "csv"])
+def test_segments_close_to_size_limit(tmp_path, format):
+    limit = 52000
+    data = capture_rows(20000)
+    writer = SegmentedCaptureWriter(str(tmp_path), format, max_segment_bytes=limit)
+    for start in range(0, len(data), 4096):
+        writer.write_array(data[start:start + 4096])
+    writer.close()
+
+    sizes = [segment["bytes"] for segment in writer.segments]
+    assert len(sizes) > 2
+    assert all(size <= limit * 1.05 for size in sizes)
+    assert all(size >= limit * 0.9 for size in sizes[:-1])
+
+    index = SegmentIndex(str(tmp_path))
+    np.testing.assert_allclose(index.read_range(), data)
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+
+from supernova_tools.shm_bus import ImuPublisher, ImuSubscriber
+
+class InterruptedRecords:
+    '''
+    Records proxy of a publisher that stops right after writing the records, as if the
+    subscriber read while the publisher was between writing a slot and publishing it.
+    '''
+    def __init__(self, records):
+        self.records = records
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def __setitem__(self, index, value):
+        self.records[index] = value
+        raise KeyboardInterrupt
+
+@pytest.fixture
+def bus():
+    publisher = ImuPublisher(f"test_bus_{os.getpid()}", capacity=4)
+    subscriber = ImuSubscriber(publisher.name)
+    yield (publisher, subscriber)
+    subscriber.close()
+    publisher.close()
+
+def test_read_in_order(bus):
+    (publisher, subscriber) = bus
+    publisher.publish(np.arange(21.0).reshape(3, 7))
+    (records, dropped) = subscriber.read()
+    assert records[:, 0].tolist() == [0.0, 7.0, 14.0]
+    assert dropped == 0
+
+def test_lagging_reader_reports_dropped(bus):
+    (publisher, subscriber) = bus
+    for i in range(6):
+        publisher.publish_sample(float(i), [i] * 3, [i] * 3)
+    (records, dropped) = subscriber.read()
+    assert records[:, 0].tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert dropped == 2
+
+def test_record_being_overwritten_is_dropped(bus):
+    (publisher, subscriber) = bus
+    publisher.publish(np.arange(28.0).reshape(4, 7))
+
+    # The publisher wrote the fifth record over the first one but did not publish it yet
+    publisher.ring.records = InterruptedRecords(publisher.ring.records)
+    with pytest.raises(KeyboardInterrupt):
+        publisher.publish(np.full((1, 7), -1.0))
+
+    (records, dropped) = subscriber.read()
+    assert records[:, 0].tolist() == [7.0, 14.0, 21.0]
+    assert dropped == 1
+    assert not (records == -1.0).any()
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+import pytest
+
+from Bosch_BMI323.BMI323 import BMI323
+from STMicroelectronics_LSM6DSV.LSM6DSV import LSM6DSV
+from supernova_tools.simulated import SimulatedSupernovaDevice
+from supernova_tools.stream_server import FLAG_DELTA, FLAG_ZLIB, ImuStreamClient, ImuStreamServer, StreamingSensor, convert_frame
+from supernova_tools.transport import RetryingI3C
+
+ACCEL_MATRIX = ((1.01, 0.02, -0.01), (0.0, 0.98, 0.03), (0.01, -0.02, 1.02))
+GYRO_MATRIX = ((0.99, 0.01, 0.0), (-0.02, 1.01, 0.01), (0.0, 0.03, 1.0))
+
+@pytest.fixture
+def i3c():
+    device = SimulatedSupernovaDevice()
+    device.open()
+    i3c = RetryingI3C(device.create_interface("i3c.controller"))
+    i3c.init_bus(3300)
+    yield i3c
+    device.close()
+
+@pytest.fixture
+def server():
+    server = ImuStreamServer(port=0, flags=FLAG_DELTA | FLAG_ZLIB).start()
+    yield server
+    server.stop()
+
+def connect(server):
+    client = ImuStreamClient(port=server.port)
+    deadline = time.monotonic() + 5
+    while not server.clients and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert server.clients
+    return client
+
+def read_frames(client, count):
+    frames = []
+    while sum(len(frame["raw"]) for frame in frames) < count:
+        frames.append(client.receive())
+    return frames
+
+@pytest.mark.parametrize("sensor_class", [BMI323, LSM6DSV])
+def test_frames_convert_like_the_driver_with_calibration_matrices(i3c, server, sensor_class):
+    sensor = sensor_class(i3c)
+    sensor.init_device()
+    sensor.set_calibration([0.01, -0.02, 0.03], [0.5, -0.4, 0.3], ACCEL_MATRIX, GYRO_MATRIX)
+    streaming = StreamingSensor(sensor, server, 1, time.perf_counter, batch_size=8)
+    client = connect(server)
+    try:
+        expected = [sum(streaming.read(), ()) for _ in range(32)]
+        received = np.concatenate([convert_frame(frame) for frame in read_frames(client, 32)])
+    finally:
+        client.close()
+
+    np.testing.assert_allclose(received, expected, rtol=1e-5, atol=1e-6)
+
+def test_calibration_change_starts_a_new_frame(i3c, server):
+    sensor = BMI323(i3c)
+    sensor.init_device()
+    sensor.set_calibration([0.0, 0.0, 0.0], [0.0, 0.0, 0.0])
+    streaming = StreamingSensor(sensor, server, 1, time.perf_counter, batch_size=8)
+    client = connect(server)
+    try:
+        expected = [sum(streaming.read(), ()) for _ in range(4)]
+        sensor.set_calibration([0.01, -0.02, 0.03], [0.5, -0.4, 0.3], ACCEL_MATRIX, GYRO_MATRIX)
+        expected += [sum(streaming.read(), ()) for _ in range(8)]
+        frames = read_frames(client, 12)
+    finally:
+        client.close()
+
+    assert [len(frame["raw"]) for frame in frames] == [4, 8]
+    np.testing.assert_allclose(np.concatenate([convert_frame(frame) for frame in frames]), expected, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from supernova_tools.transport import ReaderThreads, RetryingI3C, RetryPolicy, TransferError
+
+class FlakyI3C:
+    '''
+    I3C interface whose transfers fail `failures` times in a row, then succeed.
+    '''
+    def __init__(self, failures):
+        self.failures = failures
+        self.transfers = 0
+        self.bus_inits = 0
+
+    def read(self, target_address, mode, subaddress, length):
+        self.transfers += 1
+        if self.failures > 0:
+            self.failures -= 1
+            return (False, "NACK")
+        return (True, [0] * length)
+
+    def write(self, target_address, mode, subaddress, buffer):
+        (success, result) = self.read(target_address, mode, subaddress, len(buffer))
+        return (success, None if success else result)
+
+    def init_bus(self, voltage):
+        self.bus_inits += 1
+        return (True, None)
+
+def retrying(failures, **kwargs):
+    policy = RetryPolicy(base_delay=0.0001, max_delay=0.0001, **kwargs)
+    interface = FlakyI3C(failures)
+    return (interface, RetryingI3C(interface, policy))
+
+def test_success_after_retries():
+    (interface, i3c) = retrying(2)
+    assert i3c.read(0x08, None, [0x00], 4) == (True, [0, 0, 0, 0])
+    assert interface.transfers == 3
+    assert i3c.retries == 2
+    assert i3c.bus_reinits == 0
+
+def test_bus_reinitialized_after_consecutive_failures():
+    (interface, i3c) = retrying(3, max_attempts=5, reinit_after=3)
+    assert i3c.write(0x08, None, [0x00], [1, 2])[0]
+    assert interface.bus_inits == 1
+    assert i3c.bus_reinits == 1
+
+def test_transfer_error_after_exhausting_retries():
+    (interface, i3c) = retrying(10, max_attempts=4, reinit_after=100)
+    with pytest.raises(TransferError) as error:
+        i3c.read(0x08, None, [0x00], 4)
+    assert error.value.target_address == 0x08
+    assert interface.transfers == 4
+
+def test_failing_reader_does_not_delay_the_others():
+    reads = {"good": 0}
+
+    def failing():
+        # A read stuck in its retries and backoff
+        time.sleep(0.05)
+        raise TransferError("failed", 0x08)
+
+    def good():
+        reads["good"] += 1
+        time.sleep(0.001)
+
+    errors = []
+    readers = ReaderThreads([failing, good], on_error=errors.append).start()
+    time.sleep(0.2)
+    readers.stop()
+    assert reads["good"] > 50
+    assert errors and all(isinstance(error, TransferError) for error in errors)
+
+def test_reader_error_stops_every_loop():
+    def failing():
+        raise TransferError("failed", 0x08)
+
+    def other():
+        time.sleep(0.001)
+
+    readers = ReaderThreads([failing, other]).start()
+    readers.wait()
+    with pytest.raises(TransferError):
+        readers.stop()
+    assert not any(thread.is_alive() for thread in readers.threads)
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from supernova_tools.triggers import Trigger, TriggerEngine
+from supernova_tools.writers import read_binary_capture
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "IMU_headless_capture"))
+import imu_capture
+
+def rows(times, shocks=()):
+    data = np.zeros((len(times), 7))
+    data[:, 0] = times
+    data[:, 3] = 1.0
+    for time in shocks:
+        data[np.argmin(np.abs(data[:, 0] - time)), 3] = 8.0
+    return data
+
+def process(engine, data, batch_size):
+    return np.concatenate([engine.process(data[start:start + batch_size]) for start in range(0, len(data), batch_size)])
+
+@pytest.mark.parametrize("batch_size", [7, 64, 1000])
+def test_windows_are_measured_on_the_time_column(batch_size):
+    # Irregular read times, as in continuous polling
+    times = np.cumsum(np.random.default_rng(0).uniform(0.0002, 0.002, 2000))
+    engine = TriggerEngine([Trigger("accel", 4.0)], 0.05, 0.1, pending_rows=1000)
+    saved = process(engine, rows(times, shocks=[1.0]), batch_size)
+
+    shock = times[np.argmin(np.abs(times - 1.0))]
+    expected = times[(times >= shock - 0.05) & (times <= shock + 0.1)]
+    np.testing.assert_array_equal(saved[:, 0], expected)
+    assert len(engine.events) == 1
+
+def test_no_event_keeps_nothing():
+    engine = TriggerEngine([Trigger("accel", 4.0)], 0.05, 0.1, pending_rows=100)
+    assert len(engine.process(rows(np.arange(100) * 0.001))) == 0
+
+@pytest.mark.parametrize("extra", [[], ["--segment-size", "1"]])
+def test_triggered_capture_without_events(tmp_path, extra):
+    out = str(tmp_path / ("run" if extra else "run.bin"))
+    assert imu_capture.main(["--sensor", "bmi323", "--odr", "1600", "--duration", "0.5", "--out", out, "--simulate",
+                             "--skip-calibration", "--batch-size", "64", "--trigger", "accel:4"] + extra) == 0
+    if not extra:
+        assert read_binary_capture(out)[1] == []
+
+def test_triggered_parquet_capture(tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    out = str(tmp_path / "run.parquet")
+    # The simulated sensor rests: accel:1.01 fires now and then, accel:4 never
+    for trigger in ("accel:4", "accel:1.01"):
+        assert imu_capture.main(["--sensor", "bmi323", "--odr", "1600", "--duration", "0.5", "--out", out, "--simulate",
+                                 "--skip-calibration", "--batch-size", "64", "--trigger", trigger]) == 0
+        table = parquet.read_table(out)
+        assert table.column_names == ["time", "accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z"]